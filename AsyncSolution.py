@@ -0,0 +1,701 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Iterable, List, Union
+from Utility.AsyncDBConnector import AsyncDBConnector
+from Utility import Backend
+from Utility.Backend import assert_exists
+from Utility.Status import Status
+from Utility.Exceptions import DatabaseException
+from Business.File import File
+from Business.RAM import RAM
+from Business.Disk import Disk
+from Business.FileBatch import FileBatch
+from Business.RAMBatch import RAMBatch
+from Business.DiskBatch import DiskBatch
+from Solution import disk_cache, file_cache, ram_cache, clear_caches, invalidate_deleted_file, first_row_attributes
+import Solution
+import asyncpg
+import itertools
+
+# The asyncio API: a coroutine for each Solution function, with the same Statements, Statuses and Business objects
+# (await AsyncSolution.addFile(file)). Calls share a pool of asyncpg connections per event loop, so any number of
+# them can be awaited concurrently without a thread each. Reads go through the same entity caches as Solution.
+# Await closePool() before the event loop ends.
+
+DATABASE_ERRORS = Backend.DATABASE_ERRORS + (asyncpg.PostgresError, asyncpg.InterfaceError)
+
+# values a column can't hold, rejected by the server or already by asyncpg when it encodes them
+INVALID_VALUE_ERRORS = (asyncpg.DataError, OverflowError, TypeError)
+
+
+# Decorators (see Utility.Backend)
+
+def perform_sql_txn(cmd_constructor):
+    # Solution.perform_sql_txn: the raw SQL or bound Statements returned by cmd_constructor are executed in order
+    # in a single transaction; the result of the last one is returned
+    async def inner(*args, **kwargs):
+        cmd = cmd_constructor(*args, **kwargs)
+        async with transaction() as conn:
+            return await execute_cmd(conn, cmd)
+
+    return inner
+
+
+def perform_sql_read(cmd_constructor):
+    # Solution.perform_sql_read: the single bound Statement runs outside of a transaction block
+    async def inner(*args, **kwargs):
+        cmd = cmd_constructor(*args, **kwargs)
+        async with transaction(read_only=True) as conn:
+            return await execute_cmd(conn, cmd)
+
+    return inner
+
+
+async def execute_cmd(conn, cmd):
+    if isinstance(cmd, str):
+        return await conn.execute(cmd)
+    for statement, params in ([cmd] if isinstance(cmd, tuple) else cmd):
+        num_results, result = await conn.execute(statement, params=params)
+    return num_results, result
+
+
+@asynccontextmanager
+async def transaction(read_only=False):
+    # Solution.transaction: a pooled connection, committed when the block ends and rolled back if it raises (with
+    # no transaction block for read_only ones). Inside a session, the session's connection, with the block undone
+    # to a savepoint if it raises
+    session = current_session()
+    if session is not None:
+        async with session.savepoint() as conn:
+            yield conn
+        return
+    conn = await AsyncDBConnector.connect()
+    try:
+        if read_only:
+            yield conn
+        else:
+            async with conn.transaction():
+                yield conn
+    finally:
+        await conn.close()
+
+
+def assert_no_database_error(sql_func):
+    # catches database and connection errors
+    return Backend.assert_no_database_error(sql_func, DATABASE_ERRORS)
+
+
+def return_status(sql_func):
+    # Catch exceptions thrown by an SQL query and return the appropriate Status
+    return Backend.return_status(sql_func, DATABASE_ERRORS)
+
+
+def invalidate_cache(invalidate):
+    # Solution.invalidate_cache for coroutines
+    return Backend.invalidate_cache(invalidate, current_session)
+
+
+def invalidate_after_write(invalidate):
+    Backend.invalidate_after_write(invalidate, current_session())
+
+
+async def closePool():
+    # close the connections of the running event loop, the next call opens new ones
+    await AsyncDBConnector.close_pool()
+
+
+# ----------------------------------------
+# Unit of work
+
+def current_session():
+    # the session opened (or being used) by the calling task, None outside of one
+    return Session.current()
+
+
+class Session(Backend.UnitOfWork):
+    # Solution.Session for coroutines: calls awaited through the session, or inside its async with block by the task
+    # that opened it, share one connection and are committed together when the block ends (rolled back if it
+    # raises). Each call keeps its own Status: a call that fails is undone to a savepoint taken before it.
+    # A session opened inside another one is a savepoint of the outer session.
+    # A session must only be used by one task at a time, tasks started inside the block inherit it
+    active = ContextVar("filez_async_session", default=None)
+    functions = globals()
+
+    def __init__(self):
+        super().__init__()
+        self.conn = None
+        self.__transaction = None
+
+    @classmethod
+    def current(cls):
+        return cls.active.get()
+
+    @classmethod
+    def set_current(cls, session):
+        cls.active.set(session)
+
+    async def __aenter__(self):
+        self.outer = self.current()
+        await self.begin()
+        self.set_current(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        try:
+            await self.end(commit=exc_type is None)
+        finally:
+            if self.leave():
+                await self.close()
+                self.ended()
+        return False
+
+    async def begin(self):
+        self.conn = await AsyncDBConnector.connect() if self.outer is None else self.outer.conn
+        self.__transaction = self.conn.transaction()  # a savepoint when nested
+        try:
+            await self.__transaction.start()
+        except BaseException:
+            if self.outer is None:
+                await self.conn.close()
+            raise
+
+    async def end(self, commit: bool):
+        if commit:
+            await self.__transaction.commit()
+        else:
+            await self.__transaction.rollback()
+
+    async def close(self):
+        await self.conn.close()
+
+    @asynccontextmanager
+    async def savepoint(self):
+        async with self.conn.transaction():
+            yield self.conn
+
+
+def session() -> Session:
+    # async with AsyncSolution.session() as s: await s.addDisk(...); await s.addFileToDisk(...)
+    return Session()
+
+
+async def read_through(cache, key, load):
+    # a session sees its own uncommitted writes, which must not reach the cache shared with other tasks
+    if current_session() is not None:
+        return await load()
+    return await cache.get_or_load_async(key, load)
+
+
+# ----------------------------------------
+
+@invalidate_cache(clear_caches)
+@return_status
+@perform_sql_txn
+def createTables():
+    return Solution.get_create_tables_cmd()
+
+
+@invalidate_cache(clear_caches)
+@return_status
+@perform_sql_txn
+def clearTables():
+    return Solution.get_clear_tables_cmd()
+
+
+@invalidate_cache(clear_caches)
+@return_status
+@perform_sql_txn
+def dropTables():
+    return Solution.get_drop_tables_cmd()
+
+
+# ----------------------------------------
+
+@return_status
+@perform_sql_txn
+def addFile(file: File) -> Status:
+    return Solution.ADD_FILE.bind(file.getFileID(), file.getType(), file.getSize())
+
+
+@assert_no_database_error
+@assert_exists
+@perform_sql_read
+def getFileAttributesByID(fileID: int):
+    return Solution.GET_FILE.bind(*Solution.required_ids(fileID))
+
+
+async def getFileByID(fileID: int) -> File:
+    async def load():
+        return first_row_attributes(await getFileAttributesByID(fileID), "fileID")
+
+    file_attributes = await read_through(file_cache, fileID, load)
+    if file_attributes is None:
+        return File.badFile()
+    return File(**file_attributes)
+
+
+@invalidate_cache(invalidate_deleted_file)
+@return_status
+@perform_sql_txn
+def deleteFile(file: File) -> Status:
+    return [Solution.RELEASE_FILE_SPACE.bind(file.getFileID(), file.getSize()),
+            Solution.DELETE_FILE.bind(file.getFileID())]
+
+
+# ----------------------------------------
+
+@return_status
+@perform_sql_txn
+def addDisk(disk: Disk) -> Status:
+    return Solution.bind_add_disk(disk)
+
+
+@assert_no_database_error
+@assert_exists
+@perform_sql_read
+def getDiskAttributesByID(diskID: int):
+    return Solution.GET_DISK.bind(*Solution.required_ids(diskID))
+
+
+async def getDiskByID(diskID: int) -> Disk:
+    async def load():
+        return first_row_attributes(await getDiskAttributesByID(diskID), "diskID")
+
+    disk_attributes = await read_through(disk_cache, diskID, load)
+    if disk_attributes is None:
+        return Disk.badDisk()
+    return Disk(**disk_attributes)
+
+
+@invalidate_cache(lambda diskID: disk_cache.invalidate(diskID))
+@return_status
+@assert_exists
+@perform_sql_txn
+def deleteDisk(diskID: int) -> Status:
+    return Solution.DELETE_DISK.bind(*Solution.required_ids(diskID))
+
+
+# ----------------------------------------
+
+@return_status
+@perform_sql_txn
+def addRAM(ram: RAM) -> Status:
+    return Solution.ADD_RAM.bind(ram.getRamID(), ram.getCompany(), ram.getSize())
+
+
+@assert_no_database_error
+@assert_exists
+@perform_sql_read
+def getRAMAttributesByID(ramID: int):
+    return Solution.GET_RAM.bind(*Solution.required_ids(ramID))
+
+
+async def getRAMByID(ramID: int) -> RAM:
+    async def load():
+        return first_row_attributes(await getRAMAttributesByID(ramID), "ramID")
+
+    ram_attributes = await read_through(ram_cache, ramID, load)
+    if ram_attributes is None:
+        return RAM.badRAM()
+    return RAM(**ram_attributes)
+
+
+@invalidate_cache(lambda ramID: ram_cache.invalidate(ramID))
+@return_status
+@assert_exists
+@perform_sql_txn
+def deleteRAM(ramID: int) -> Status:
+    return Solution.DELETE_RAM.bind(*Solution.required_ids(ramID))
+
+
+# ----------------------------------------
+
+@return_status
+@perform_sql_txn
+def addDiskAndFile(disk: Disk, file: File) -> Status:
+    return [Solution.bind_add_disk(disk),
+            Solution.ADD_FILE.bind(file.getFileID(), file.getType(), file.getSize())]
+
+
+# ----------------------------------------
+
+async def insert_isolating_bad_rows(conn, table, columns, rows, statuses, offset):
+    # Solution.insert_isolating_bad_rows, with a binary COPY
+    try:
+        async with conn.transaction():  # a savepoint
+            await conn.insert_rows(table, columns, rows)
+    except (DatabaseException.CHECK_VIOLATION, DatabaseException.NOT_NULL_VIOLATION,
+            DatabaseException.UNIQUE_VIOLATION) + INVALID_VALUE_ERRORS as e:
+        if len(rows) == 1:
+            if isinstance(e, DatabaseException.UNIQUE_VIOLATION):
+                statuses[offset] = Status.ALREADY_EXISTS
+            elif isinstance(e, INVALID_VALUE_ERRORS):
+                statuses[offset] = Status.ERROR  # e.g. a value out of the column's range
+            else:
+                statuses[offset] = Status.BAD_PARAMS
+            return
+        middle = len(rows) // 2
+        # earlier rows go first, so a duplicate ID inside the batch is reported on its later occurrence
+        await insert_isolating_bad_rows(conn, table, columns, rows[:middle], statuses, offset)
+        await insert_isolating_bad_rows(conn, table, columns, rows[middle:], statuses, offset + middle)
+
+
+async def bulk_insert(table, columns, rows: Iterable[tuple], chunk_size) -> List[Status]:
+    statuses = []
+    rows = iter(rows)
+    for chunk in iter(lambda: list(itertools.islice(rows, chunk_size)), []):
+        chunk_statuses = [Status.OK] * len(chunk)
+        try:
+            async with transaction() as conn:
+                await insert_isolating_bad_rows(conn, table, columns, chunk, chunk_statuses, 0)
+        except DATABASE_ERRORS:
+            chunk_statuses = [Status.ERROR] * len(chunk)
+        statuses += chunk_statuses
+    return statuses
+
+
+async def addFiles(files: Union[Iterable[File], FileBatch], chunk_size=Solution.BULK_CHUNK_SIZE) -> List[Status]:
+    return await bulk_insert("public.file", ("fileID", "type", "size"), FileBatch.rows_of(files), chunk_size)
+
+
+async def addDisks(disks: Union[Iterable[Disk], DiskBatch], chunk_size=Solution.BULK_CHUNK_SIZE) -> List[Status]:
+    return await bulk_insert("public.disk", ("diskID", "company", "speed", "free_space", "cost"),
+                             DiskBatch.rows_of(disks), chunk_size)
+
+
+async def addRAMs(rams: Union[Iterable[RAM], RAMBatch], chunk_size=Solution.BULK_CHUNK_SIZE) -> List[Status]:
+    return await bulk_insert("public.ram", ("ramID", "company", "size"), RAMBatch.rows_of(rams), chunk_size)
+
+
+# ----------------------------------------
+
+@invalidate_cache(lambda file, diskID: disk_cache.invalidate(diskID))
+@return_status
+@assert_exists
+@perform_sql_txn
+def addFileToDisk(file: File, diskID: int) -> Status:
+    Solution.required_ids(diskID)
+    return [Solution.ADD_FILE_TO_DISK.bind(file.getFileID(), diskID),
+            Solution.TAKE_DISK_SPACE.bind(diskID, file.getSize())]
+
+
+# ----------------------------------------
+
+async def placeFiles(placements: Iterable[tuple]) -> List[Status]:
+    # Solution.placeFiles: statuses match awaiting addFileToDisk for each (file, diskID) pair in order
+    return await place_file_rows([(file.getFileID(), file.getSize(), diskID) for file, diskID in placements])
+
+
+async def place_file_rows(placements: List[tuple]) -> List[Status]:
+    if len(placements) == 0:
+        return []
+    disk_ids = sorted({diskID for _, _, diskID in placements if diskID is not None})
+    try:
+        return await place_files(placements, disk_ids)
+    finally:
+        invalidate_after_write(lambda: disk_cache.invalidate(*disk_ids))
+
+
+async def place_files(placements, disk_ids) -> List[Status]:
+    file_ids = sorted({fileID for fileID, _, _ in placements if fileID is not None})
+    try:
+        async with transaction() as conn:
+            _, disks = await conn.execute(Solution.LOCK_DISKS_SPACE, params=(disk_ids,))
+            free_space = dict(zip(disks.column("diskID"), disks.column("free_space")))
+            _, files = await conn.execute(Solution.LOCK_FILES, params=(file_ids,))
+            existing_files = set(files.column("fileID"))
+            _, mapped = await conn.execute(Solution.EXISTING_PLACEMENTS,
+                                           params=([fileID for fileID, _, _ in placements],
+                                                   [diskID for _, _, diskID in placements]))
+            existing_placements = set(zip(mapped.column("fileID"), mapped.column("diskID")))
+            statuses, accepted, taken = Backend.placement_statuses(placements, free_space, existing_files,
+                                                                   existing_placements)
+            await conn.insert_rows("public.file_on_disk", ("fileID", "diskID"), accepted)
+            if len(taken) > 0:
+                await conn.execute(Solution.TAKE_DISKS_SPACE, params=(list(taken.keys()), list(taken.values())))
+    except DATABASE_ERRORS + (DatabaseException.CHECK_VIOLATION, DatabaseException.NOT_NULL_VIOLATION,
+                              DatabaseException.UNIQUE_VIOLATION, DatabaseException.FOREIGN_KEY_VIOLATION):
+        return [Status.ERROR] * len(placements)
+    return statuses
+
+
+async def addFilesToDisk(files: Union[Iterable[File], FileBatch], diskID: int) -> List[Status]:
+    return await place_file_rows([(fileID, size, diskID) for fileID, _, size in FileBatch.rows_of(files)])
+
+
+# ----------------------------------------
+
+@invalidate_cache(lambda file, diskID: disk_cache.invalidate(diskID))
+@return_status
+@perform_sql_txn
+def removeFileFromDisk(file: File, diskID: int) -> Status:
+    Solution.required_ids(diskID)
+    return [Solution.RETURN_DISK_SPACE.bind(file.getFileID(), diskID, file.getSize()),
+            Solution.REMOVE_FILE_FROM_DISK.bind(file.getFileID(), diskID)]
+
+
+# ----------------------------------------
+
+@return_status
+@assert_exists
+@perform_sql_txn
+def addRAMToDisk(ramID: int, diskID: int) -> Status:
+    return Solution.ADD_RAM_TO_DISK.bind(*Solution.required_ids(ramID, diskID))
+
+
+@return_status
+@assert_exists
+@perform_sql_txn
+def removeRAMFromDisk(ramID: int, diskID: int) -> Status:
+    return Solution.REMOVE_RAM_FROM_DISK.bind(*Solution.required_ids(ramID, diskID))
+
+
+# ----------------------------------------
+
+@assert_no_database_error
+@assert_exists
+@perform_sql_read
+def _averageFileSizeOnDisk(diskID: int):
+    return Solution.AVERAGE_FILE_SIZE_ON_DISK.bind(*Solution.required_ids(diskID))
+
+
+async def averageFileSizeOnDisk(diskID: int) -> float:
+    averages = await _averageFileSizeOnDisk(diskID)
+    if averages == Status.ERROR:
+        return -1
+    if averages == Status.NOT_EXISTS:
+        return 0
+    return float(averages[0]["avg"])
+
+
+@assert_no_database_error
+@assert_exists
+@perform_sql_read
+def _diskTotalRAM(diskID: int):
+    return Solution.DISK_TOTAL_RAM.bind(*Solution.required_ids(diskID))
+
+
+async def diskTotalRAM(diskID: int) -> int:
+    sums = await _diskTotalRAM(diskID)
+    if sums == Status.ERROR:
+        return -1
+    if sums == Status.NOT_EXISTS:
+        return 0
+    return sums[0]["sum"]
+
+
+@assert_no_database_error
+@assert_exists
+@perform_sql_read
+def _getCostForType(type: str):
+    return Solution.COST_FOR_TYPE.bind(type)
+
+
+async def getCostForType(type: str) -> int:
+    total_cost = await _getCostForType(type)
+    if total_cost == Status.ERROR:
+        return -1
+    if total_cost == Status.NOT_EXISTS:
+        return 0
+    return total_cost[0]["sum"]
+
+
+@assert_no_database_error
+@perform_sql_read
+def _getCostForTypes(types: List[str]):
+    return Solution.COSTS_FOR_TYPES.bind(types)
+
+
+async def getCostForTypes(types: Iterable[str]) -> dict:
+    types = list(types)
+    if len(types) == 0:
+        return {}
+    total_costs = await _getCostForTypes(types)
+    if total_costs == Status.ERROR:
+        return {type: -1 for type in types}
+    _, totals = total_costs
+    costs = {type: 0 for type in types}
+    costs.update(zip(totals.column("type"), totals.column("total_cost")))
+    return costs
+
+
+# ----------------------------------------
+
+@assert_no_database_error
+@perform_sql_read
+def _getFilesCanBeAddedToDisk(diskID: int):
+    return Solution.FILES_CAN_BE_ADDED_TO_DISK.bind(*Solution.required_ids(diskID))
+
+
+async def getFilesCanBeAddedToDisk(diskID: int) -> List[int]:
+    suggested_files = await _getFilesCanBeAddedToDisk(diskID)
+    if type(suggested_files) == Status:
+        return []
+    _, suggested = suggested_files
+    return suggested.column("fileID")
+
+
+@assert_no_database_error
+@perform_sql_read
+def _getFilesCanBeAddedToDiskAndRAM(diskID: int):
+    return Solution.FILES_CAN_BE_ADDED_TO_DISK_AND_RAM.bind(*Solution.required_ids(diskID))
+
+
+async def getFilesCanBeAddedToDiskAndRAM(diskID: int) -> List[int]:
+    canBeAdded = await _getFilesCanBeAddedToDiskAndRAM(diskID)
+    if type(canBeAdded) == Status:
+        return []
+    _, filesCanBeAdded = canBeAdded
+    return filesCanBeAdded.column("fileID")
+
+
+# ----------------------------------------
+
+@assert_no_database_error
+@assert_exists
+@perform_sql_read
+def _isCompanyExclusive(diskID: int):
+    return Solution.IS_COMPANY_EXCLUSIVE.bind(*Solution.required_ids(diskID))
+
+
+async def isCompanyExclusive(diskID: int) -> bool:
+    return type(await _isCompanyExclusive(diskID)) != Status
+
+
+@assert_no_database_error
+@perform_sql_read
+def _isCompanyExclusiveMany(diskIDs: List[int]):
+    return Solution.IS_COMPANY_EXCLUSIVE_MANY.bind(diskIDs)
+
+
+async def isCompanyExclusiveMany(diskIDs: Iterable[int]) -> dict:
+    exclusive = {diskID: False for diskID in diskIDs}
+    if len(exclusive) == 0:
+        return exclusive
+    result = await _isCompanyExclusiveMany(list(exclusive))
+    if type(result) == Status:
+        return exclusive
+    _, disks = result
+    exclusive.update(zip(disks.column("diskID"), disks.column("exclusive")))
+    return exclusive
+
+
+# ----------------------------------------
+
+@assert_no_database_error
+@perform_sql_read
+def _getConflictingDisks():
+    return Solution.CONFLICTING_DISKS.bind()
+
+
+async def getConflictingDisks() -> List[int]:
+    conflicting_disks = await _getConflictingDisks()
+    if type(conflicting_disks) == Status:
+        return []
+    _, conflicting = conflicting_disks
+    return conflicting.column("diskID")
+
+
+@assert_no_database_error
+@perform_sql_read
+def _mostAvailableDisks():
+    return Solution.MOST_AVAILABLE_DISKS.bind()
+
+
+async def mostAvailableDisks() -> List[int]:
+    most_available_disk = await _mostAvailableDisks()
+    if type(most_available_disk) == Status:
+        return []
+    _, most_available = most_available_disk
+    return most_available.column("diskID")
+
+
+# ----------------------------------------
+
+@assert_no_database_error
+@perform_sql_read
+def _getCloseFiles(fileID: int):
+    return Solution.CLOSE_FILES.bind(*Solution.required_ids(fileID))
+
+
+async def getCloseFiles(fileID: int) -> List[int]:
+    result = await _getCloseFiles(fileID)
+    if type(result) == Status:
+        return []
+    _, closest_files = result
+    return closest_files.column("fileID")
+
+
+@assert_no_database_error
+@perform_sql_read
+def _getCloseFilesMany(fileIDs: List[int]):
+    return Solution.CLOSE_FILES_MANY.bind(fileIDs)
+
+
+async def getCloseFilesMany(fileIDs: Iterable[int]) -> dict:
+    fileIDs = list(fileIDs)
+    closest = {fileID: [] for fileID in fileIDs}
+    if len(fileIDs) == 0:
+        return closest
+    result = await _getCloseFilesMany(fileIDs)
+    if type(result) == Status:
+        return closest
+    _, close_files = result
+    for target, fileID in zip(close_files.column("target"), close_files.column("fileID")):
+        closest[target].append(fileID)
+    return closest
+
+
+# ----------------------------------------
+
+@assert_no_database_error
+@perform_sql_read
+def _getFilesByIDs(fileIDs: List[int]):
+    return Solution.GET_FILES.bind(fileIDs)
+
+
+async def getFilesByIDs(fileIDs: Iterable[int]) -> FileBatch:
+    return Solution.result_batch(FileBatch, await _getFilesByIDs(list(fileIDs)))
+
+
+@assert_no_database_error
+@perform_sql_read
+def _getDisksByIDs(diskIDs: List[int]):
+    return Solution.GET_DISKS.bind(diskIDs)
+
+
+async def getDisksByIDs(diskIDs: Iterable[int]) -> DiskBatch:
+    return Solution.result_batch(DiskBatch, await _getDisksByIDs(list(diskIDs)))
+
+
+@assert_no_database_error
+@perform_sql_read
+def _getRAMsByIDs(ramIDs: List[int]):
+    return Solution.GET_RAMS.bind(ramIDs)
+
+
+async def getRAMsByIDs(ramIDs: Iterable[int]) -> RAMBatch:
+    return Solution.result_batch(RAMBatch, await _getRAMsByIDs(list(ramIDs)))
+
+
+# ----------------------------------------
+
+async def export_columns(statement, attributes, binary) -> dict:
+    try:
+        async with transaction(read_only=True) as conn:
+            columns = await conn.fetch_columns(statement, binary=binary)
+    except DATABASE_ERRORS:
+        return {}
+    return dict(zip(attributes, columns.values()))
+
+
+async def exportFiles(binary=None) -> dict:
+    return await export_columns(Solution.EXPORT_FILES, ("fileID", "type", "size"), binary)
+
+
+async def exportDisks(binary=None) -> dict:
+    return await export_columns(Solution.EXPORT_DISKS, ("diskID", "company", "speed", "free_space", "cost"), binary)
+
+
+async def exportPlacements(binary=None) -> dict:
+    return await export_columns(Solution.EXPORT_PLACEMENTS, ("fileID", "diskID"), binary)
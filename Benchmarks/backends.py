@@ -0,0 +1,126 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import Solution
+from Tests import SimpleTestSharon
+import Utility.DBConnector as Connector
+from Business.File import File
+from Business.Disk import Disk
+from Business.RAM import RAM
+
+'''
+    Compares the backends of Solution (see Solution.useBackend): the time to run Tests/SimpleTestSharon.py on
+    each, and the median latency of single calls on a data set loaded with the bulk functions, with the speedup of
+    each backend over PostgreSQL.
+    Runs against the database in Utility/database.ini, DROPPING AND RECREATING the tables. SQLite runs on
+    ":memory:" unless --sqlite-database names a file (in WAL mode, as it would be deployed).
+
+        python Benchmarks/backends.py --files 100000 --sqlite-database /tmp/filez.db
+'''
+
+BACKENDS = ("postgres", "memory", "sqlite")
+
+
+def suite_time(repeat):
+    timings = []
+    for _ in range(repeat):
+        suite = unittest.defaultTestLoader.loadTestsFromTestCase(SimpleTestSharon.Test)
+        start = time.perf_counter()
+        result = unittest.TextTestRunner(stream=open(os.devnull, "w")).run(suite)
+        timings.append(time.perf_counter() - start)
+        assert result.wasSuccessful(), result.failures + result.errors
+    return statistics.median(timings)
+
+
+def load(files, disks, seed):
+    rng = random.Random(seed)
+    Solution.addDisks([Disk(d, f"company{d % 5}", rng.randint(1, 100), 10 ** 9, rng.randint(1, 50))
+                       for d in range(1, disks + 1)])
+    Solution.addRAMs([RAM(d, f"company{d % 5}", rng.randint(1, 1000)) for d in range(1, disks + 1)])
+    for d in range(1, disks + 1):
+        Solution.addRAMToDisk(d, d)
+    Solution.addFiles([File(f, f"type{f % 10}", rng.randint(0, 10 ** 4)) for f in range(1, files + 1)])
+    Solution.placeFiles([(File(f, f"type{f % 10}", 0), rng.randint(1, disks)) for f in range(1, files + 1)])
+
+
+def latency(call, repeat):
+    call(0)  # prepares the statements
+    timings = []
+    for i in range(1, repeat + 1):
+        start = time.perf_counter()
+        call(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calls(files, disks, rng):
+    # (label, call(i)): writes use fresh IDs above the loaded ones
+    return (
+        ("addFile", lambda i: Solution.addFile(File(files + i, "new", 10))),
+        ("addFileToDisk", lambda i: Solution.addFileToDisk(File(files + i, "new", 10), i % disks + 1)),
+        ("removeFileFromDisk", lambda i: Solution.removeFileFromDisk(File(files + i, "new", 10), i % disks + 1)),
+        ("getFileByID", lambda i: Solution.getFileByID(rng.randint(1, files))),
+        ("averageFileSizeOnDisk", lambda i: Solution.averageFileSizeOnDisk(rng.randint(1, disks))),
+        ("getCostForType", lambda i: Solution.getCostForType(f"type{i % 10}")),
+        ("getFilesCanBeAddedToDiskAndRAM", lambda i: Solution.getFilesCanBeAddedToDiskAndRAM(rng.randint(1, disks))),
+        ("isCompanyExclusive", lambda i: Solution.isCompanyExclusive(rng.randint(1, disks))),
+        ("mostAvailableDisks", lambda i: Solution.mostAvailableDisks()),
+        ("getCloseFiles", lambda i: Solution.getCloseFiles(rng.randint(1, files))),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--disks", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--suite-repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--sqlite-database", default=":memory:")
+    args = parser.parse_args()
+    backends = ["postgres"] + [backend for backend in args.backends if backend != "postgres"]
+    Connector.SQLiteConnector.configure(database=args.sqlite_database)
+
+    suite = {}
+    latencies = {}
+    loads = {}
+    try:
+        for backend in backends:
+            Solution.useBackend(backend)
+            Solution.dropTables()  # SimpleTestSharon creates its own
+            suite[backend] = suite_time(args.suite_repeat)
+            Solution.createTables()
+            start = time.perf_counter()
+            load(args.files, args.disks, args.seed)
+            loads[backend] = time.perf_counter() - start
+            rng = random.Random(args.seed)
+            latencies[backend] = [(label, latency(call, args.repeat))
+                                  for label, call in calls(args.files, args.disks, rng)]
+            Solution.dropTables()
+    finally:
+        Solution.useBackend("postgres")
+        Solution.createTables()
+        Solution.dropTables()
+
+    others = backends[1:]
+    print(f"{'':36}" + "".join(f" {backend:>10}" for backend in backends) +
+          "".join(f" {backend + ' x':>10}" for backend in others))
+
+    def row(label, timings):
+        print(f"{label:36}" + "".join(f" {timings[backend]:10.3f}" for backend in backends) +
+              "".join(f" {timings['postgres'] / timings[backend]:9.1f}x" for backend in others))
+
+    row("SimpleTestSharon (s)", suite)
+    row(f"load {args.files} files (s)", loads)
+    for index, (label, _) in enumerate(latencies["postgres"]):
+        row(label + " (ms)", {backend: latencies[backend][index][1] for backend in backends})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import Solution
+import Utility.DBConnector as Connector
+from indexes import explain
+
+'''
+    Latency of getFilesCanBeAddedToDisk and getFilesCanBeAddedToDiskAndRAM as the file table grows
+    (10k, 100k, 1M, ... files up to --max-files). The top-5 walks should stay flat: the share of files that
+    fit a disk doesn't change with the table size, so neither does the length of the walk.
+    Runs against the database in Utility/database.ini, DROPPING AND RECREATING the tables.
+
+        python Benchmarks/files_can_be_added.py --max-files 10000000
+'''
+
+LOAD_CHUNK = 1000000
+
+# (label, free space, RAM sizes): about half of the files fit the roomy disk, 1 in 1000 fits the tight one
+DISKS = (
+    ("roomy disk", 10 ** 9, (500000, 500000)),
+    ("tight disk", 1000, (1000,)),
+)
+MAX_FILE_SIZE = 10 ** 6
+
+
+def load_disks():
+    conn = Connector.DBConnector()
+    try:
+        conn.insert_rows("public.disk", ("diskID", "company", "speed", "free_space", "cost"),
+                         [(diskID, "DELL", 10, free_space, 10)
+                          for diskID, (_, free_space, _) in enumerate(DISKS, start=1)])
+        rams = [(diskID, size) for diskID, (_, _, sizes) in enumerate(DISKS, start=1) for size in sizes]
+        conn.insert_rows("public.ram", ("ramID", "company", "size"),
+                         [(ramID, "Kingston", size) for ramID, (_, size) in enumerate(rams, start=1)])
+        conn.insert_rows("public.ram_on_disk", ("ramID", "diskID"),
+                         [(ramID, diskID) for ramID, (diskID, _) in enumerate(rams, start=1)])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_files(first, last, rng):
+    conn = Connector.DBConnector()
+    try:
+        for start in range(first, last + 1, LOAD_CHUNK):
+            end = min(start + LOAD_CHUNK - 1, last)
+            conn.insert_rows("public.file", ("fileID", "type", "size"),
+                             [(f, "mp3", rng.randint(0, MAX_FILE_SIZE)) for f in range(start, end + 1)])
+            conn.commit()
+        conn.execute("ANALYZE public.file")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def latency(function, diskID, repeat):
+    function(diskID)  # prepares the statement
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(diskID)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-files", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    queries = (
+        ("getFilesCanBeAddedToDisk", Solution.getFilesCanBeAddedToDisk, Solution.FILES_CAN_BE_ADDED_TO_DISK),
+        ("getFilesCanBeAddedToDiskAndRAM", Solution.getFilesCanBeAddedToDiskAndRAM,
+         Solution.FILES_CAN_BE_ADDED_TO_DISK_AND_RAM),
+    )
+    rng = random.Random(args.seed)
+    Solution.dropTables()
+    Solution.createTables()
+    try:
+        load_disks()
+        loaded = 0
+        files = 10000
+        while files <= args.max_files:
+            start = time.perf_counter()
+            load_files(loaded + 1, files, rng)
+            loaded = files
+            print(f"\n{files} files (loaded in {time.perf_counter() - start:.1f}s)")
+            for label, function, statement in queries:
+                for diskID, (disk_label, _, _) in enumerate(DISKS, start=1):
+                    ms = latency(function, diskID, args.repeat)
+                    conn = Connector.DBConnector()
+                    try:
+                        _, plan_scans = explain(conn, statement, (diskID,))
+                    finally:
+                        conn.close()
+                    print(f"  {label:32} {disk_label:11} {ms:8.2f} ms   {', '.join(plan_scans)}")
+            files *= 10
+    finally:
+        Solution.dropTables()
+
+
+if __name__ == '__main__':
+    main()
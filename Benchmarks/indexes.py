@@ -0,0 +1,141 @@
+import argparse
+import os
+import random
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import Solution
+import Utility.DBConnector as Connector
+
+'''
+    Shows the plan and execution time of the queries that look placements up by disk or walk the files by ID or
+    size, and of the writes whose cascades and triggers look placements up by disk, with and without
+    Solution.INDEXES, on a generated data set (1M files by default). The per-disk and per-type aggregates are read
+    from the tables their triggers keep (disk_stats, type_cost, disk_conflicts), which these indexes don't serve.
+    EXPLAIN ANALYZE times a write with its triggers and cascades, the scans listed are the statement's own.
+    Runs against the database in Utility/database.ini, DROPPING AND RECREATING the tables.
+
+        python Benchmarks/indexes.py --files 1000000
+'''
+
+
+def load(files, disks, rams, types, seed):
+    rng = random.Random(seed)
+    conn = Connector.DBConnector()
+    try:
+        conn.insert_rows("public.disk", ("diskID", "company", "speed", "free_space", "cost"),
+                         [(d, f"company{d % 10}", rng.randint(1, 100), rng.randint(0, 10 ** 9), rng.randint(1, 50))
+                          for d in range(1, disks + 1)])
+        conn.insert_rows("public.file", ("fileID", "type", "size"),
+                         [(f, f"type{rng.randrange(types)}", rng.randint(0, 10 ** 6)) for f in range(1, files + 1)])
+        # every file on one or two random disks
+        placements = set()
+        for f in range(1, files + 1):
+            for _ in range(rng.randint(1, 2)):
+                placements.add((f, rng.randint(1, disks)))
+        conn.insert_rows("public.file_on_disk", ("fileID", "diskID"), list(placements))
+        conn.insert_rows("public.ram", ("ramID", "company", "size"),
+                         [(r, f"company{r % 10}", rng.randint(1, 64)) for r in range(1, rams + 1)])
+        conn.insert_rows("public.ram_on_disk", ("ramID", "diskID"),
+                         [(r, rng.randint(1, disks)) for r in range(1, rams + 1)])
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.commit()  # a connection goes back to the pool rolled back
+    finally:
+        conn.close()
+
+
+def scans(plan):
+    # "Seq Scan on file_on_disk", "Index Only Scan using file_on_disk_disk_file_idx", ...
+    found = []
+    target = plan.get("Index Name") or plan.get("Relation Name")
+    if "Scan" in plan["Node Type"] and target is not None:
+        found.append(f"{plan['Node Type']} {'using' if 'Index Name' in plan else 'on'} {target}")
+    for child in plan.get("Plans", []):
+        found += scans(child)
+    return found
+
+
+def explain(conn, statement, params, repeat):
+    # the fastest of repeat runs
+    conn.execute(statement, params=params)  # prepares it on this connection
+    conn.rollback()  # PREPARE outlives the rollback, a write is explained on the rows it first ran on
+    times = []
+    for _ in range(repeat):
+        _, result = conn.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + statement.execute_cmd, params=params)
+        plan = result.rows[0][0][0]
+        conn.rollback()  # EXPLAIN ANALYZE really runs writes such as deleteFile's UPDATE
+        times.append(plan["Execution Time"])
+    return min(times), scans(plan["Plan"])
+
+
+# a disk's cost changes: the type_cost trigger reads the disk's placements
+UPDATE_DISK_COST = Connector.Statement("filez_benchmark_update_disk_cost", " \
+    UPDATE public.disk \
+    SET cost = cost + 1 \
+    WHERE diskID = $1")
+
+
+def measure(queries, repeat):
+    conn = Connector.DBConnector()
+    try:
+        return {label: explain(conn, statement, params, repeat) for label, statement, params in queries}
+    finally:
+        conn.close()
+
+
+def set_indexes(create):
+    conn = Connector.DBConnector()
+    try:
+        for name, table, columns in Solution.INDEXES:
+            conn.execute(Solution.get_create_index_cmd(name, table, columns) if create else f"DROP INDEX {name}")
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.commit()  # a connection goes back to the pool rolled back
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=1000000)
+    parser.add_argument("--disks", type=int, default=1000)
+    parser.add_argument("--rams", type=int, default=10000)
+    parser.add_argument("--types", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    Solution.dropTables()
+    Solution.createTables()
+    start = time.perf_counter()
+    load(args.files, args.disks, args.rams, args.types, args.seed)
+    print(f"loaded {args.files} files in {time.perf_counter() - start:.1f}s")
+
+    disk, file = args.disks // 2, args.files // 2
+    queries = [
+        ("deleteFile (disks of file)", Solution.RELEASE_FILE_SPACE, (file, 1)),
+        ("deleteFile (triggers, cascade)", Solution.DELETE_FILE, (file,)),
+        ("deleteDisk (triggers, cascades)", Solution.DELETE_DISK, (disk,)),
+        ("disk cost update (type_cost trigger)", UPDATE_DISK_COST, (disk,)),
+        ("getCloseFiles", Solution.CLOSE_FILES, (file,)),
+        ("getCloseFilesMany", Solution.CLOSE_FILES_MANY, (list(range(file, file + 100)),)),
+        ("getFilesCanBeAddedToDisk", Solution.FILES_CAN_BE_ADDED_TO_DISK, (disk,)),
+        ("mostAvailableDisks", Solution.MOST_AVAILABLE_DISKS, ()),
+    ]
+    try:
+        set_indexes(False)
+        without = measure(queries, args.repeat)
+        set_indexes(True)
+        with_indexes = measure(queries, args.repeat)
+    finally:
+        Solution.dropTables()
+
+    for label, _, _ in queries:
+        print(f"\n{label}")
+        for heading, (ms, plan_scans) in (("without indexes", without[label]), ("with indexes", with_indexes[label])):
+            print(f"  {heading:16} {ms:10.2f} ms   {', '.join(plan_scans)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+from array import array
+import itertools
+
+EXTEND_CHUNK_SIZE = 10000
+
+
+class Batch:
+    # Many entities of one kind, held as a column per attribute instead of an object per entity: integer
+    # attributes in an array("q"), text ones in a list. Subclasses list their entity's attributes as
+    #   (name, typecode or None for text, getter)
+    # in the order of the entity's constructor. Columns are given by attribute name, so a batch can be made
+    # from the dict of an export, e.g. FileBatch(**Solution.exportFiles())
+    __slots__ = ("_columns",)
+    entity = None
+    attributes = ()
+
+    def __init__(self, **columns):
+        unknown = set(columns) - {name for name, _, _ in self.attributes}
+        if unknown:
+            raise TypeError("unknown attributes: " + ", ".join(sorted(unknown)))
+        self._columns = [as_column(columns.get(name, ()), typecode) for name, typecode, _ in self.attributes]
+        if len({len(column) for column in self._columns}) > 1:
+            raise ValueError("columns of different lengths")
+
+    @classmethod
+    def of(cls, entities) -> "Batch":
+        batch = cls()
+        batch.extend(entities)
+        return batch
+
+    # the rows of a batch, or of an iterable of entities, as tuples of attribute values
+    @classmethod
+    def rows_of(cls, entities):
+        if isinstance(entities, cls):
+            return entities.rows()
+        getters = [getter for _, _, getter in cls.attributes]
+        return (tuple(getter(entity) for getter in getters) for entity in entities)
+
+    def append(self, entity):
+        self.extend((entity,))
+
+    def extend(self, entities):
+        # a chunk of rows at a time, so a row that can't be stored (an integer attribute that is None or not an
+        # int) leaves the batch as it was before that chunk
+        rows = iter(self.rows_of(entities))
+        for chunk in iter(lambda: list(itertools.islice(rows, EXTEND_CHUNK_SIZE)), []):
+            chunk = [as_column(values, typecode) for (_, typecode, _), values in zip(self.attributes, zip(*chunk))]
+            for column, values in zip(self._columns, chunk):
+                column.extend(values)
+
+    def rows(self):
+        return zip(*self._columns)
+
+    def column(self, name: str):
+        for (attribute, _, _), column in zip(self.attributes, self._columns):
+            if attribute == name:
+                return column
+        raise KeyError(name)
+
+    # {attribute: numpy array}, integer columns are views of the batch's arrays (numpy is imported on first use)
+    def to_numpy(self) -> dict:
+        import numpy
+        return {name: numpy.frombuffer(column, dtype="int64") if typecode is not None else numpy.array(column)
+                for (name, typecode, _), column in zip(self.attributes, self._columns)}
+
+    def __len__(self):
+        return len(self._columns[0])
+
+    def __getitem__(self, index: int):
+        return self.entity(*(column[index] for column in self._columns))
+
+    def __iter__(self):
+        return (self.entity(*row) for row in self.rows())
+
+    def __eq__(self, other):
+        return type(self) == type(other) and all(list(mine) == list(theirs)
+                                                 for mine, theirs in zip(self._columns, other._columns))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({len(self)} rows)"
+
+
+def as_column(values, typecode):
+    # numpy arrays are copied as raw bytes, without an int object per value
+    if typecode is None:
+        return values.tolist() if hasattr(values, "tolist") else list(values)
+    if hasattr(values, "dtype"):
+        return array(typecode, values.astype("int64").tobytes())
+    return array(typecode, values)
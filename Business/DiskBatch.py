@@ -0,0 +1,9 @@
+from Business.Batch import Batch
+from Business.Disk import Disk
+
+
+class DiskBatch(Batch):
+    __slots__ = ()
+    entity = Disk
+    attributes = (("diskID", "q", Disk.getDiskID), ("company", None, Disk.getCompany), ("speed", "q", Disk.getSpeed),
+                  ("free_space", "q", Disk.getFreeSpace), ("cost", "q", Disk.getCost))
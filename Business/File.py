@@ -1,4 +1,6 @@
 class File:
+    __slots__ = ("__fileID", "__type", "__size")
+
     def __init__(self, fileID=None, type=None, size=None):
         self.__fileID = fileID
         self.__type = type
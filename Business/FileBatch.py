@@ -0,0 +1,8 @@
+from Business.Batch import Batch
+from Business.File import File
+
+
+class FileBatch(Batch):
+    __slots__ = ()
+    entity = File
+    attributes = (("fileID", "q", File.getFileID), ("type", None, File.getType), ("size", "q", File.getSize))
@@ -1,4 +1,6 @@
 class RAM:
+    __slots__ = ("__ramID", "__company", "__size")
+
     def __init__(self, ramID=None, company=None, size=None):
         self.__ramID = ramID
         self.__company = company
@@ -0,0 +1,8 @@
+from Business.Batch import Batch
+from Business.RAM import RAM
+
+
+class RAMBatch(Batch):
+    __slots__ = ()
+    entity = RAM
+    attributes = (("ramID", "q", RAM.getRamID), ("company", None, RAM.getCompany), ("size", "q", RAM.getSize))
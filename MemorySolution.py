@@ -0,0 +1,537 @@
+from contextlib import contextmanager
+from typing import Iterable, List, Union
+from Utility.MemoryDatabase import MemoryDatabase, check_value
+from Utility.Status import Status
+from Utility.Exceptions import DatabaseException
+from Utility import Backend, Columns
+from Business.File import File
+from Business.RAM import RAM
+from Business.Disk import Disk
+from Business.FileBatch import FileBatch
+from Business.RAMBatch import RAMBatch
+from Business.DiskBatch import DiskBatch
+from collections import Counter
+import bisect
+import heapq
+import threading
+
+# The Solution API on an in-memory database (Utility.MemoryDatabase) instead of PostgreSQL, for unit tests,
+# simulations and capacity planning: the same constraints, cascades, Statuses and results, in pure Python. Select it
+# with Solution.useBackend("memory") or FILEZ_BACKEND=memory. The data lives as long as the process.
+# Calls are serialized by a lock; a session holds it until it ends
+
+database = MemoryDatabase()
+database_lock = threading.RLock()
+
+BULK_CHUNK_SIZE = 10000
+
+
+@contextmanager
+def locked():
+    # the database lock, unless the calling session holds it already
+    if current_session() is not None:
+        yield
+        return
+    with database_lock:
+        yield
+
+
+@contextmanager
+def transaction():
+    # the database, with the block's changes undone if it raises (inside a session, a savepoint of the session)
+    with locked(), database.transaction() as db:
+        yield db
+
+
+def return_status(write_func):
+    # no database driver here, its errors are all DatabaseException.UNKNOWN_ERROR
+    return Backend.return_status(write_func)
+
+
+def on_database_error(default):
+    # the value a read returns in case of a database error (the tables don't exist, a parameter of the wrong type)
+    def decorator(read_func):
+        def inner(*args, **kwargs):
+            try:
+                return read_func(*args, **kwargs)
+            except DatabaseException.UNKNOWN_ERROR:
+                return default(*args, **kwargs)
+
+        return inner
+
+    return decorator
+
+
+def check_integers(*values):
+    for value in values:
+        check_value(value, int)
+
+
+def check_ids(*ids):
+    check_integers(*Backend.required_ids(*ids))
+
+
+# ----------------------------------------
+# Unit of work
+
+def current_session():
+    return Session.current()
+
+
+class Session(Backend.UnitOfWork):
+    # Solution.Session: the calls made through the session, or inside its with block on the thread that opened it,
+    # are undone together if the block raises, each call keeping its own Status. A session opened inside another
+    # one is a savepoint of the outer session. Calls from other threads wait until the session ends
+    active = threading.local()
+    functions = globals()
+
+    def __init__(self):
+        super().__init__()
+        self.__mark = None
+
+    def begin(self):
+        if self.outer is None:
+            database_lock.acquire()
+        self.__mark = database.begin()
+
+    def end(self, commit: bool):
+        if commit:
+            database.commit(self.__mark)
+        else:
+            database.rollback(self.__mark)
+
+    def close(self):
+        database_lock.release()
+
+
+def session() -> Session:
+    return Session()
+
+
+# ----------------------------------------
+
+@return_status
+def createTables():
+    with transaction() as db:
+        db.create()
+
+
+@return_status
+def clearTables():
+    with transaction() as db:
+        db.clear()
+
+
+@return_status
+def dropTables():
+    with transaction() as db:
+        db.drop()
+
+
+# ----------------------------------------
+
+@return_status
+def addFile(file: File) -> Status:
+    with transaction() as db:
+        db.insert_file(file.getFileID(), file.getType(), file.getSize())
+
+
+@on_database_error(lambda fileID: File.badFile())
+def getFileByID(fileID: int) -> File:
+    check_ids(fileID)
+    with transaction() as db:
+        attributes = db.tables.files.get(fileID)
+    return File.badFile() if attributes is None else File(fileID, *attributes)
+
+
+@return_status
+def deleteFile(file: File) -> Status:
+    # like Solution.deleteFile, the disks the file is on get back the size of the given file
+    check_integers(file.getFileID(), file.getSize())
+    with transaction() as db:
+        tables = db.tables
+        for diskID in sorted(tables.file_disks.get(file.getFileID(), ())):
+            db.set_free_space(diskID, plus(tables.disks[diskID][2], file.getSize()))
+        if file.getFileID() in tables.files:
+            db.delete_file(file.getFileID())
+
+
+def plus(free_space, size):
+    # free_space + size in SQL: NULL if size is
+    return None if size is None else free_space + size
+
+
+# ----------------------------------------
+
+@return_status
+def addDisk(disk: Disk) -> Status:
+    with transaction() as db:
+        db.insert_disk(disk.getDiskID(), disk.getCompany(), disk.getSpeed(), disk.getFreeSpace(), disk.getCost())
+
+
+@on_database_error(lambda diskID: Disk.badDisk())
+def getDiskByID(diskID: int) -> Disk:
+    check_ids(diskID)
+    with transaction() as db:
+        attributes = db.tables.disks.get(diskID)
+    return Disk.badDisk() if attributes is None else Disk(diskID, *attributes)
+
+
+@return_status
+def deleteDisk(diskID: int) -> Status:
+    check_ids(diskID)
+    with transaction() as db:
+        if diskID not in db.tables.disks:
+            return Status.NOT_EXISTS
+        db.delete_disk(diskID)
+
+
+# ----------------------------------------
+
+@return_status
+def addRAM(ram: RAM) -> Status:
+    with transaction() as db:
+        db.insert_ram(ram.getRamID(), ram.getCompany(), ram.getSize())
+
+
+@on_database_error(lambda ramID: RAM.badRAM())
+def getRAMByID(ramID: int) -> RAM:
+    check_ids(ramID)
+    with transaction() as db:
+        attributes = db.tables.rams.get(ramID)
+    return RAM.badRAM() if attributes is None else RAM(ramID, *attributes)
+
+
+@return_status
+def deleteRAM(ramID: int) -> Status:
+    check_ids(ramID)
+    with transaction() as db:
+        if ramID not in db.tables.rams:
+            return Status.NOT_EXISTS
+        db.delete_ram(ramID)
+
+
+# ----------------------------------------
+
+@return_status
+def addDiskAndFile(disk: Disk, file: File) -> Status:
+    with transaction() as db:
+        db.insert_disk(disk.getDiskID(), disk.getCompany(), disk.getSpeed(), disk.getFreeSpace(), disk.getCost())
+        db.insert_file(file.getFileID(), file.getType(), file.getSize())
+
+
+# ----------------------------------------
+# Every row is added as addFile/addDisk/addRAM would, so the statuses are theirs; chunk_size is accepted for
+# compatibility with Solution (there are no round-trips to save)
+
+@return_status
+def insert_row(insert, row) -> Status:
+    # the insert primitives check a row before changing anything, so a refused row leaves nothing to undo
+    insert(*row)
+
+
+def insert_rows(insert, rows) -> List[Status]:
+    with transaction():
+        return [insert_row(insert, row) for row in rows]
+
+
+def addFiles(files: Union[Iterable[File], FileBatch], chunk_size=BULK_CHUNK_SIZE) -> List[Status]:
+    return insert_rows(database.insert_file, FileBatch.rows_of(files))
+
+
+def addDisks(disks: Union[Iterable[Disk], DiskBatch], chunk_size=BULK_CHUNK_SIZE) -> List[Status]:
+    return insert_rows(database.insert_disk, DiskBatch.rows_of(disks))
+
+
+def addRAMs(rams: Union[Iterable[RAM], RAMBatch], chunk_size=BULK_CHUNK_SIZE) -> List[Status]:
+    return insert_rows(database.insert_ram, RAMBatch.rows_of(rams))
+
+
+# ----------------------------------------
+
+@return_status
+def addFileToDisk(file: File, diskID: int) -> Status:
+    # like Solution.addFileToDisk, the disk loses the size of the given file
+    check_ids(diskID)
+    check_integers(file.getFileID())
+    with transaction() as db:
+        db.insert_placement(file.getFileID(), diskID)
+        check_integers(file.getSize())
+        disk = db.tables.disks.get(diskID)
+        if disk is None:
+            return Status.NOT_EXISTS
+        db.set_free_space(diskID, plus(disk[2], None if file.getSize() is None else -file.getSize()))
+
+
+def placeFiles(placements: Iterable[tuple]) -> List[Status]:
+    # Solution.placeFiles: statuses match calling addFileToDisk for each (file, diskID) pair in order
+    return place_file_rows([(file.getFileID(), file.getSize(), diskID) for file, diskID in placements])
+
+
+@on_database_error(lambda placements: [Status.ERROR] * len(placements))
+def place_file_rows(placements: List[tuple]) -> List[Status]:
+    for fileID, _, diskID in placements:
+        check_integers(fileID, diskID)
+    with transaction() as db:
+        tables = db.tables
+        free_space = {diskID: tables.disks[diskID][2] for _, _, diskID in placements if diskID in tables.disks}
+        existing_placements = {(fileID, diskID) for fileID, _, diskID in placements
+                               if diskID in tables.file_disks.get(fileID, ())}
+        statuses, accepted, taken = Backend.placement_statuses(placements, free_space, tables.files,
+                                                               existing_placements)
+        for fileID, diskID in accepted:
+            db.insert_placement(fileID, diskID)
+        for diskID, size in taken.items():
+            db.set_free_space(diskID, tables.disks[diskID][2] - size)
+    return statuses
+
+
+def addFilesToDisk(files: Union[Iterable[File], FileBatch], diskID: int) -> List[Status]:
+    return place_file_rows([(fileID, size, diskID) for fileID, _, size in FileBatch.rows_of(files)])
+
+
+# ----------------------------------------
+
+@return_status
+def removeFileFromDisk(file: File, diskID: int) -> Status:
+    # like Solution.removeFileFromDisk, the disk gets back the size of the given file, and a file that isn't on it
+    # is OK
+    check_ids(diskID)
+    check_integers(file.getFileID(), file.getSize())
+    with transaction() as db:
+        tables = db.tables
+        if diskID in tables.file_disks.get(file.getFileID(), ()):
+            db.set_free_space(diskID, plus(tables.disks[diskID][2], file.getSize()))
+            db.delete_placement(file.getFileID(), diskID)
+
+
+# ----------------------------------------
+
+@return_status
+def addRAMToDisk(ramID: int, diskID: int) -> Status:
+    check_ids(ramID, diskID)
+    with transaction() as db:
+        if ramID not in db.tables.rams or diskID not in db.tables.disks:
+            return Status.NOT_EXISTS
+        db.insert_ram_placement(ramID, diskID)
+
+
+@return_status
+def removeRAMFromDisk(ramID: int, diskID: int) -> Status:
+    check_ids(ramID, diskID)
+    with transaction() as db:
+        if diskID not in db.tables.ram_disks.get(ramID, ()):
+            return Status.NOT_EXISTS
+        db.delete_ram_placement(ramID, diskID)
+
+
+# ----------------------------------------
+
+@on_database_error(lambda diskID: -1)
+def averageFileSizeOnDisk(diskID: int) -> float:
+    check_ids(diskID)
+    with transaction() as db:
+        file_count, file_size_sum, _ = db.tables.disk_stats.get(diskID, (0, 0, 0))
+    return 0 if file_count == 0 else float(file_size_sum) / file_count
+
+
+@on_database_error(lambda diskID: -1)
+def diskTotalRAM(diskID: int) -> int:
+    check_ids(diskID)
+    with transaction() as db:
+        _, _, ram_size_sum = db.tables.disk_stats.get(diskID, (0, 0, 0))
+    return ram_size_sum
+
+
+@on_database_error(lambda type: -1)
+def getCostForType(type: str) -> int:
+    check_value(type, str)
+    with transaction() as db:
+        return db.tables.type_costs.get(type, 0)
+
+
+@on_database_error(lambda types: {type: -1 for type in types})
+def getCostForTypes(types: Iterable[str]) -> dict:
+    types = list(types)
+    for type in types:
+        check_value(type, str)
+    with transaction() as db:
+        type_costs = db.tables.type_costs
+        return {type: type_costs.get(type, 0) for type in types}
+
+
+# ----------------------------------------
+
+@on_database_error(lambda diskID: [])
+def getFilesCanBeAddedToDisk(diskID: int) -> List[int]:
+    # the 5 highest file IDs of the files that fit in the disk's free space
+    check_ids(diskID)
+    with transaction() as db:
+        tables = db.tables
+        if diskID not in tables.disks:
+            return []
+        return first_fitting(tables, reversed(tables.file_ids), tables.disks[diskID][2])
+
+
+@on_database_error(lambda diskID: [])
+def getFilesCanBeAddedToDiskAndRAM(diskID: int) -> List[int]:
+    # the 5 lowest file IDs of the files that fit in both the disk's free space and its total RAM
+    check_ids(diskID)
+    with transaction() as db:
+        tables = db.tables
+        if diskID not in tables.disks:
+            return []
+        bound = min(tables.disks[diskID][2], tables.disk_stats[diskID][2])
+        return first_fitting(tables, tables.file_ids, bound)
+
+
+def first_fitting(tables, fileIDs, bound, limit=5) -> List[int]:
+    fitting = []
+    files = tables.files
+    for fileID in fileIDs:
+        if files[fileID][1] <= bound:
+            fitting.append(fileID)
+            if len(fitting) == limit:
+                break
+    return fitting
+
+
+# ----------------------------------------
+
+@on_database_error(lambda diskID: False)
+def isCompanyExclusive(diskID: int) -> bool:
+    check_ids(diskID)
+    with transaction() as db:
+        return company_exclusive(db.tables, diskID)
+
+
+@on_database_error(lambda diskIDs: {diskID: False for diskID in diskIDs})
+def isCompanyExclusiveMany(diskIDs: Iterable[int]) -> dict:
+    diskIDs = list(diskIDs)
+    check_integers(*diskIDs)
+    with transaction() as db:
+        return {diskID: company_exclusive(db.tables, diskID) for diskID in diskIDs}
+
+
+def company_exclusive(tables, diskID) -> bool:
+    # the disk exists and every RAM on it is of its company
+    disk = tables.disks.get(diskID)
+    return disk is not None and all(company == disk[0] for company in tables.disk_ram_companies.get(diskID, ()))
+
+
+# ----------------------------------------
+
+@on_database_error(lambda: [])
+def getConflictingDisks() -> List[int]:
+    with transaction() as db:
+        return sorted(db.tables.disk_conflicts)
+
+
+@on_database_error(lambda: [])
+def mostAvailableDisks() -> List[int]:
+    # the 5 disks the most files fit in, the faster and then the lower ID first. The number of files that fit in
+    # a disk is the number of file sizes up to its free space, a binary search in the sorted sizes
+    with transaction() as db:
+        tables = db.tables
+        sizes = tables.file_sizes
+        return [diskID for _, _, diskID in heapq.nsmallest(5, (
+            (-bisect.bisect_right(sizes, free_space), -speed, diskID)
+            for diskID, (_, speed, free_space, _) in tables.disks.items()))]
+
+
+# ----------------------------------------
+
+@on_database_error(lambda fileID: [])
+def getCloseFiles(fileID: int) -> List[int]:
+    check_ids(fileID)
+    with transaction() as db:
+        return close_files(db.tables, fileID)
+
+
+@on_database_error(lambda fileIDs: {fileID: [] for fileID in fileIDs})
+def getCloseFilesMany(fileIDs: Iterable[int]) -> dict:
+    fileIDs = list(fileIDs)
+    check_integers(*fileIDs)
+    with transaction() as db:
+        return {fileID: close_files(db.tables, fileID) for fileID in fileIDs}
+
+
+def close_files(tables, fileID) -> List[int]:
+    # the (up to) 10 files sharing at least half of the file's disks, the ones sharing the most and then the lowest
+    # IDs first, in ID order. A file on no disk is close to every other file, so then the 10 lowest IDs
+    if fileID is None:
+        return []
+    disks = tables.file_disks.get(fileID, ())
+    replicas = len(disks)
+    if replicas == 0:
+        return first_fitting(tables, (other for other in tables.file_ids if other != fileID), float("inf"), 10)
+    shared = Counter(other for diskID in disks for other in tables.disk_files[diskID] if other != fileID)
+    close = [(-count, other) for other, count in shared.items() if 2 * count >= replicas]
+    return sorted(other for _, other in heapq.nsmallest(10, close))
+
+
+# ----------------------------------------
+# Bulk reads, in ID order and without the IDs that don't exist; an empty batch in case of a database error
+
+def entities_batch(batch_type, table, ids):
+    ids = list(ids)
+    check_integers(*ids)
+    with transaction() as db:
+        rows = getattr(db.tables, table)
+        found = sorted({id for id in ids if id in rows})
+        return batch_type.of(batch_type.entity(id, *rows[id]) for id in found)
+
+
+@on_database_error(lambda fileIDs: FileBatch())
+def getFilesByIDs(fileIDs: Iterable[int]) -> FileBatch:
+    return entities_batch(FileBatch, "files", fileIDs)
+
+
+@on_database_error(lambda diskIDs: DiskBatch())
+def getDisksByIDs(diskIDs: Iterable[int]) -> DiskBatch:
+    return entities_batch(DiskBatch, "disks", diskIDs)
+
+
+@on_database_error(lambda ramIDs: RAMBatch())
+def getRAMsByIDs(ramIDs: Iterable[int]) -> RAMBatch:
+    return entities_batch(RAMBatch, "rams", ramIDs)
+
+
+# ----------------------------------------
+# Bulk exports, as the columns Solution's exports return ({attribute: numpy array}); binary is accepted for
+# compatibility. {} in case of a database error. They need numpy
+
+INTEGER_TYPE, TEXT_TYPE = 23, 25  # the PostgreSQL types of the columns, see Columns.numpy_column
+
+
+def export_columns(attributes, types, rows) -> dict:
+    columns = list(zip(*rows)) if len(rows) > 0 else [()] * len(attributes)
+    return {attribute: Columns.numpy_column(list(values), type_code)
+            for attribute, type_code, values in zip(attributes, types, columns)}
+
+
+@on_database_error(lambda binary=None: {})
+def exportFiles(binary=None) -> dict:
+    Columns.require_numpy()
+    with transaction() as db:
+        files = db.tables.files
+        rows = [(fileID,) + files[fileID] for fileID in db.tables.file_ids]
+    return export_columns(("fileID", "type", "size"), (INTEGER_TYPE, TEXT_TYPE, INTEGER_TYPE), rows)
+
+
+@on_database_error(lambda binary=None: {})
+def exportDisks(binary=None) -> dict:
+    Columns.require_numpy()
+    with transaction() as db:
+        rows = [(diskID, *disk) for diskID, disk in sorted(db.tables.disks.items())]
+    return export_columns(("diskID", "company", "speed", "free_space", "cost"),
+                          (INTEGER_TYPE, TEXT_TYPE, INTEGER_TYPE, INTEGER_TYPE, INTEGER_TYPE), rows)
+
+
+@on_database_error(lambda binary=None: {})
+def exportPlacements(binary=None) -> dict:
+    Columns.require_numpy()
+    with transaction() as db:
+        tables = db.tables
+        rows = sorted((fileID, diskID) for fileID, disks in tables.file_disks.items() for diskID in disks)
+    return export_columns(("fileID", "diskID"), (INTEGER_TYPE, INTEGER_TYPE), rows)
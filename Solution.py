@@ -1,91 +1,271 @@
-from typing import List
+from contextlib import contextmanager
+from typing import Iterable, List, Union
 import Utility.DBConnector as Connector
+from Utility import Backend
+from Utility.Backend import assert_exists, required_ids
+from Utility.Cache import LRUCache
+from Utility.MemoryDatabase import INTEGER_RANGE
+from Utility.Notifications import InvalidationListener
 from Utility.Status import Status
 from Utility.Exceptions import DatabaseException
 from Business.File import File
 from Business.RAM import RAM
 from Business.Disk import Disk
+from Business.FileBatch import FileBatch
+from Business.RAMBatch import RAMBatch
+from Business.DiskBatch import DiskBatch
 from psycopg2 import sql
 import psycopg2
+import importlib
+import itertools
+import os
+import threading
 
 
-# Decorators
+# Decorators (see Utility.Backend)
+
+# the errors Solution's calls report as Status.ERROR
+DATABASE_ERRORS = Backend.DATABASE_ERRORS + (psycopg2.DatabaseError,)
+
 
 def perform_sql_txn(cmd_constructor):
     # Send an SQL query to the server and return the result
     # Input to decorator (output of decorated function): SQL query: str
     # Output: Result of SQL query to the database
+    # The query is either a DDL Script or one or more bound Statements (see Statement.bind), which are
+    # executed in order in a single transaction; the result of the last one is returned
     def inner(*args, **kwargs):
-        conn = Connector.DBConnector()
         cmd = cmd_constructor(*args, **kwargs)
-
-        try:
-            num_results, result = conn.execute(f"BEGIN; {cmd}")
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            e.conn = conn
-            raise e
-        finally:
-            conn.close()
-        return num_results, result
+        with transaction() as conn:
+            return execute_cmd(conn, cmd)
 
     return inner
 
 
-def assert_exists(sql_func):
-    # Ensures at least 1 tuple was returned from sql_func, else returns Status.NOT_EXISTS
+def perform_sql_read(cmd_constructor=None, serves=(), execute=None, replica=False):
+    # perform_sql_txn for queries that only read. The bound Statement runs in autocommit mode, in a transaction
+    # of its own with no BEGIN/COMMIT round-trips, so the query must be a single statement.
+    # The query is registered in READ_ONLY_FUNCTIONS under the public function it answers (its own name without the
+    # leading underscore) and the ones in serves, which only call it. execute runs it, execute_cmd by default.
+    # replica queries run on a read replica when DBConnector has a usable one; the rest, whose results may be
+    # cached or read back right after a write, stay on the primary
+    if cmd_constructor is None:
+        return lambda constructor: perform_sql_read(constructor, serves, execute, replica)
+    read_only_functions.update([cmd_constructor.__name__.lstrip("_"), *serves])
+
     def inner(*args, **kwargs):
-        try:
-            num_results, attributes = sql_func(*args, **kwargs)
-        except DatabaseException.FOREIGN_KEY_VIOLATION:
-            return Status.NOT_EXISTS
-        if num_results == 0 or (not attributes.isEmpty() and bool(attributes[0]) and all(elem is None for elem in attributes[0].values())):
-            return Status.NOT_EXISTS
-        return attributes
+        cmd = cmd_constructor(*args, **kwargs)
+        with transaction(read_only=True, replica=replica) as conn:
+            return (execute or execute_cmd)(conn, cmd)
 
     return inner
 
 
-def assert_no_database_error(sql_func):
-    # catches DatabaseException.UNKNOWN_ERROR
-    def inner(*args, **kwargs):
+def execute_cmd(conn, cmd):
+    if isinstance(cmd, Connector.Script):
+        return conn.execute(cmd)
+    for statement, params in ([cmd] if isinstance(cmd, tuple) else cmd):
+        num_results, result = conn.execute(statement, params=params)
+    return num_results, result
+
+
+# The Solution functions that never write, as registered by perform_sql_read (frozen in READ_ONLY_FUNCTIONS once
+# every query is defined)
+read_only_functions = set()
+
+
+# the database engine the functions of this module run on, a backend of Connector.connect (see useBackend)
+engine = "postgres"
+
+
+@contextmanager
+def transaction(read_only=False, replica=False):
+    # The connection a Solution function runs on: a pooled one, committed when the block ends and rolled back
+    # if it raises (in autocommit mode for read_only blocks, on a replica for replica ones). Inside a session, the
+    # session's connection, with the block undone to a savepoint if it raises
+    session = current_session()
+    if session is not None:
+        with session.savepoint() as conn:
+            yield conn
+        return
+    conn = Connector.connect(engine, read_only=read_only, replica=replica)
+    if read_only:
         try:
-            result = sql_func(*args, **kwargs)
-        except (DatabaseException.UNKNOWN_ERROR, DatabaseException.ConnectionInvalid, psycopg2.DatabaseError) as e:
-            return Status.ERROR
-        return result
+            conn.set_autocommit(True)
+            yield conn
+        finally:
+            conn.close()
+        return
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
-    return inner
+
+def assert_no_database_error(sql_func):
+    # catches DatabaseException.UNKNOWN_ERROR
+    return Backend.assert_no_database_error(sql_func, DATABASE_ERRORS)
 
 
 def return_status(sql_func):
     # Catch exceptions thrown by an SQL query and return the appropriate Status
-    def inner(*args, **kwargs):
+    return Backend.return_status(sql_func, DATABASE_ERRORS)
+
+
+def invalidate_cache(invalidate):
+    # Drop the cache entries a write may have changed, once it is over (successful or not)
+    # Input to decorator: function taking the same arguments as the decorated write
+    return Backend.invalidate_cache(invalidate, current_session)
+
+
+def invalidate_after_write(invalidate):
+    Backend.invalidate_after_write(invalidate, current_session())
+
+
+# ----------------------------------------
+# Unit of work
+
+def current_session():
+    # the session opened (or being used) by the calling thread, None outside of one
+    return Session.current()
+
+
+class Session(Backend.UnitOfWork):
+    # Solution functions called through the session, or inside its with block on the thread that opened it, share
+    # one connection and are committed together when the block ends (rolled back if it raises). Each call keeps its
+    # own Status: a call that fails is undone to a savepoint taken before it, and the session goes on.
+    # A session opened inside another one is a savepoint of the outer session.
+    # A session must only be used by one thread at a time
+    active = threading.local()
+    functions = globals()
+
+    def __init__(self):
+        super().__init__()
+        self.conn = None
+        self.__root = self  # the outermost session, which owns the connection
+        self.__calls = 0  # calls in progress, a Solution function may run inside another one
+        self.__unreleased = False  # the savepoint of the last call, released together with the next command
+
+    def begin(self):
+        if self.outer is None:
+            self.conn = Connector.connect(engine)
+        else:
+            self.__root = self.outer.__root
+            self.conn = self.outer.conn
+            self.conn.execute(self.__root.__after_release("SAVEPOINT filez_session"))
+
+    def end(self, commit: bool):
+        if self.outer is not None:
+            # either also ends the savepoint of the session's last call
+            if commit:
+                self.conn.execute("RELEASE SAVEPOINT filez_session")
+            else:
+                self.conn.execute("ROLLBACK TO SAVEPOINT filez_session; RELEASE SAVEPOINT filez_session")
+            self.__root.__unreleased = False
+        elif commit:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def savepoint(self):
+        root = self.__root
+        outermost = root.__calls == 0
+        self.conn.execute(root.__after_release("SAVEPOINT filez_session_call") if outermost
+                          else "SAVEPOINT filez_session_call")
+        root.__calls += 1
         try:
-            result = sql_func(*args, **kwargs)
-        except (DatabaseException.CHECK_VIOLATION, DatabaseException.NOT_NULL_VIOLATION) as e:
-            e.conn.close()
-            return Status.BAD_PARAMS  # in case of illegal parameters.
-        except DatabaseException.UNIQUE_VIOLATION as e:
-            e.conn.close()
-            return Status.ALREADY_EXISTS  # if a file/disk/ram with the same ID already exists. *
-        except (DatabaseException.UNKNOWN_ERROR, DatabaseException.ConnectionInvalid, psycopg2.DatabaseError) as e:
-            e.conn.close()
-            return Status.ERROR  # in case of a database error
-        if result == Status.NOT_EXISTS:  # output overriden by assert_exists decorator
-            return Status.NOT_EXISTS
-        return Status.OK
+            yield self.conn
+        except Exception:
+            self.conn.execute("ROLLBACK TO SAVEPOINT filez_session_call; RELEASE SAVEPOINT filez_session_call")
+            raise
+        else:
+            if outermost:
+                root.__unreleased = True  # saves a round-trip per call
+            else:
+                self.conn.execute("RELEASE SAVEPOINT filez_session_call")
+        finally:
+            root.__calls -= 1
+
+    def __after_release(self, command):
+        if not self.__unreleased:
+            return command
+        self.__unreleased = False
+        return "RELEASE SAVEPOINT filez_session_call; " + command
+
+
+def session() -> Session:
+    # with Solution.session() as s: s.addDisk(...); s.addFileToDisk(...)
+    return Session()
+
+
+def read_through(cache: LRUCache, key, load):
+    # a session sees its own uncommitted writes, which must not reach the cache shared with other threads
+    if current_session() is not None:
+        return load()
+    return cache.get_or_load(key, load)
+
+
+# Read-through caches for getFileByID / getDiskByID / getRAMByID, keyed by ID
+# They hold the constructor arguments of the entity, so every call still returns a fresh object.
+# They are disabled until configureEntityCache enables them: the writes of this process invalidate them, but another
+# process's writes only do through startInvalidationListener, until then they are served stale for up to ttl
+
+file_cache = LRUCache(maxsize=0)
+disk_cache = LRUCache(maxsize=0)
+ram_cache = LRUCache(maxsize=0)
+
+
+def configureEntityCache(maxsize=4096, ttl=60.0):
+    # enables the caches, maxsize=0 disables them again, ttl=None keeps entries until they are evicted or invalidated
+    for cache in (file_cache, disk_cache, ram_cache):
+        cache.configure(maxsize, ttl)
+
+
+def entityCacheStats() -> dict:
+    return {"file": file_cache.stats(), "disk": disk_cache.stats(), "ram": ram_cache.stats()}
 
-    return inner
 
+def clear_caches(*args, **kwargs):
+    for cache in (file_cache, disk_cache, ram_cache):
+        cache.clear()
 
-# Helper functions
 
-def none_to_null(input, is_str=False):
-    if input is None:
-        return "NULL"
-    return input if not is_str else f"'{input}'"
+def startInvalidationListener() -> InvalidationListener:
+    # Keep the caches above consistent with writes made by other processes, using the NOTIFY triggers
+    # installed by createTables. Returns the (already running) listener, stop() it to unsubscribe
+    listener = InvalidationListener(INVALIDATION_CHANNEL)
+    listener.register("file", cache_invalidator(file_cache, "fileid"))
+    listener.register("disk", cache_invalidator(disk_cache, "diskid"))
+    listener.register("ram", cache_invalidator(ram_cache, "ramid"))
+    listener.start()
+    return listener
+
+
+def cache_invalidator(cache: LRUCache, id_column):
+    def invalidate(ids):
+        if ids is None:  # too many changes to list, or notifications may have been missed
+            cache.clear()
+        else:
+            cache.invalidate(*ids.get(id_column, []))
+
+    return invalidate
+
+
+def first_row_attributes(selected, id_attribute):
+    # constructor arguments from the result of a get*AttributesByID, None if it failed or found nothing
+    if type(selected) == Status:
+        return None
+    attributes = dict(selected[0])
+    attributes[id_attribute] = attributes.pop(id_attribute.lower())
+    return attributes
 
 
 # ----------------------------------------
@@ -119,8 +299,8 @@ def get_create_entities_cmd():
 def get_create_many2many_relation_cmd(name, src, tgt):
     return f" \
             CREATE TABLE public.{name}( \
-                {src}ID integer, \
-                {tgt}ID integer, \
+                {src}ID integer NOT NULL, \
+                {tgt}ID integer NOT NULL, \
                 UNIQUE ({src}ID, {tgt}ID), \
                 FOREIGN KEY ({src}ID) \
                     REFERENCES public.{src} ({src}ID) \
@@ -154,12 +334,455 @@ def get_create_views_cmd():
        "public.ram INNER JOIN public.ram_on_disk ON public.ram.ramID=public.ram_on_disk.ramID"
    )
 
+# (name, table, columns)
+# The (diskID, srcID) indexes serve lookups by disk (the all_*_on_disk views and everything built on them),
+# lookups by file/RAM use the leading column of the UNIQUE (srcID, diskID) constraint.
+# (fileID, size) lets the getFilesCanBeAddedToDisk* top-5 walk the files in ID order without visiting the table.
+# The per-type totals are read from type_cost, nothing looks files up by type (see Benchmarks/indexes.py)
+INDEXES = (
+    ("file_on_disk_disk_file_idx", "file_on_disk", "diskID, fileID"),
+    ("ram_on_disk_disk_ram_idx", "ram_on_disk", "diskID, ramID"),
+    ("file_size_idx", "file", "size"),
+    ("file_id_size_idx", "file", "fileID, size"),
+    ("disk_free_space_idx", "disk", "free_space"),
+)
+
+
+def get_create_index_cmd(name, table, columns):
+    return f"CREATE INDEX {name} ON public.{table} ({columns}); "
+
+
+def get_create_indexes_cmd():
+    return "".join(get_create_index_cmd(*index) for index in INDEXES)
+
+
+# Per-disk running aggregates, kept current by triggers so the per-disk reads are single-row lookups:
+#   disk_stats:        number and total size of the files on the disk, total size of its RAM
+#   disk_ram_company:  number of RAMs of each company on the disk
+# Placements are counted when they are added/removed. Deleting a file/RAM is handled by a BEFORE DELETE
+# trigger on it, since by the time the cascaded placement deletes run the file/RAM row (and its size) is gone.
+# Changing a file's size or a RAM's size/company moves the totals of the disks it is on. Changing an ID cascades to
+# the placements (and renames the disk's rows), which moves nothing, so placement updates aren't tracked
+def get_create_disk_aggregates_cmd():
+    return " \
+        CREATE TABLE public.disk_stats( \
+            diskID          integer     PRIMARY KEY \
+                REFERENCES public.disk (diskID) ON UPDATE CASCADE ON DELETE CASCADE, \
+            file_count      integer     NOT NULL    DEFAULT 0, \
+            file_size_sum   bigint      NOT NULL    DEFAULT 0, \
+            ram_size_sum    bigint      NOT NULL    DEFAULT 0 \
+        ); \
+        CREATE TABLE public.disk_ram_company( \
+            diskID          integer \
+                REFERENCES public.disk (diskID) ON UPDATE CASCADE ON DELETE CASCADE, \
+            company         text, \
+            ram_count       integer     NOT NULL, \
+            PRIMARY KEY (diskID, company) \
+        ); \
+        CREATE OR REPLACE FUNCTION public.filez_disk_stats_on_disk() RETURNS trigger AS $$ \
+        BEGIN \
+            INSERT INTO public.disk_stats (diskID) SELECT diskID FROM new_rows; \
+            RETURN NULL; \
+        END; \
+        $$ LANGUAGE plpgsql; \
+        CREATE OR REPLACE FUNCTION public.filez_disk_stats_on_file_on_disk() RETURNS trigger AS $$ \
+        BEGIN \
+            IF TG_OP = 'INSERT' THEN \
+                UPDATE public.disk_stats SET \
+                    file_count = file_count + placed.num_files, \
+                    file_size_sum = file_size_sum + placed.total_size \
+                FROM ( \
+                    SELECT new_rows.diskID, COUNT(*) AS num_files, SUM(size) AS total_size \
+                    FROM new_rows INNER JOIN public.file ON public.file.fileID = new_rows.fileID \
+                    GROUP BY new_rows.diskID \
+                ) placed \
+                WHERE public.disk_stats.diskID = placed.diskID; \
+            ELSE \
+                UPDATE public.disk_stats SET \
+                    file_count = file_count - removed.num_files, \
+                    file_size_sum = file_size_sum - removed.total_size \
+                FROM ( \
+                    SELECT old_rows.diskID, COUNT(*) AS num_files, SUM(size) AS total_size \
+                    FROM old_rows INNER JOIN public.file ON public.file.fileID = old_rows.fileID \
+                    GROUP BY old_rows.diskID \
+                ) removed \
+                WHERE public.disk_stats.diskID = removed.diskID; \
+            END IF; \
+            RETURN NULL; \
+        END; \
+        $$ LANGUAGE plpgsql; \
+        CREATE OR REPLACE FUNCTION public.filez_disk_stats_on_file_delete() RETURNS trigger AS $$ \
+        BEGIN \
+            UPDATE public.disk_stats SET \
+                file_count = file_count - 1, \
+                file_size_sum = file_size_sum - OLD.size \
+            WHERE diskID IN (SELECT diskID FROM public.file_on_disk WHERE fileID = OLD.fileID); \
+            RETURN OLD; \
+        END; \
+        $$ LANGUAGE plpgsql; \
+        CREATE OR REPLACE FUNCTION public.filez_disk_stats_on_file_update() RETURNS trigger AS $$ \
+        BEGIN \
+            UPDATE public.disk_stats SET file_size_sum = file_size_sum + NEW.size - OLD.size \
+            WHERE diskID IN (SELECT diskID FROM public.file_on_disk WHERE fileID IN (OLD.fileID, NEW.fileID)); \
+            RETURN NULL; \
+        END; \
+        $$ LANGUAGE plpgsql; \
+        CREATE OR REPLACE FUNCTION public.filez_disk_stats_on_ram_on_disk() RETURNS trigger AS $$ \
+        BEGIN \
+            IF TG_OP = 'INSERT' THEN \
+                UPDATE public.disk_stats SET ram_size_sum = ram_size_sum + placed.total_size \
+                FROM ( \
+                    SELECT new_rows.diskID, SUM(size) AS total_size \
+                    FROM new_rows INNER JOIN public.ram ON public.ram.ramID = new_rows.ramID \
+                    GROUP BY new_rows.diskID \
+                ) placed \
+                WHERE public.disk_stats.diskID = placed.diskID; \
+                INSERT INTO public.disk_ram_company (diskID, company, ram_count) \
+                    SELECT new_rows.diskID, company, COUNT(*) \
+                    FROM new_rows INNER JOIN public.ram ON public.ram.ramID = new_rows.ramID \
+                    GROUP BY new_rows.diskID, company \
+                ON CONFLICT (diskID, company) DO UPDATE \
+                    SET ram_count = public.disk_ram_company.ram_count + EXCLUDED.ram_count; \
+            ELSE \
+                UPDATE public.disk_stats SET ram_size_sum = ram_size_sum - removed.total_size \
+                FROM ( \
+                    SELECT old_rows.diskID, SUM(size) AS total_size \
+                    FROM old_rows INNER JOIN public.ram ON public.ram.ramID = old_rows.ramID \
+                    GROUP BY old_rows.diskID \
+                ) removed \
+                WHERE public.disk_stats.diskID = removed.diskID; \
+                UPDATE public.disk_ram_company SET ram_count = ram_count - removed.num_rams \
+                FROM ( \
+                    SELECT old_rows.diskID, company, COUNT(*) AS num_rams \
+                    FROM old_rows INNER JOIN public.ram ON public.ram.ramID = old_rows.ramID \
+                    GROUP BY old_rows.diskID, company \
+                ) removed \
+                WHERE public.disk_ram_company.diskID = removed.diskID \
+                    AND public.disk_ram_company.company = removed.company; \
+                DELETE FROM public.disk_ram_company \
+                WHERE ram_count = 0 AND diskID IN (SELECT diskID FROM old_rows); \
+            END IF; \
+            RETURN NULL; \
+        END; \
+        $$ LANGUAGE plpgsql; \
+        CREATE OR REPLACE FUNCTION public.filez_disk_stats_on_ram_delete() RETURNS trigger AS $$ \
+        BEGIN \
+            UPDATE public.disk_stats SET ram_size_sum = ram_size_sum - OLD.size \
+            WHERE diskID IN (SELECT diskID FROM public.ram_on_disk WHERE ramID = OLD.ramID); \
+            UPDATE public.disk_ram_company SET ram_count = ram_count - 1 \
+            WHERE company = OLD.company \
+                AND diskID IN (SELECT diskID FROM public.ram_on_disk WHERE ramID = OLD.ramID); \
+            DELETE FROM public.disk_ram_company \
+            WHERE ram_count = 0 AND company = OLD.company \
+                AND diskID IN (SELECT diskID FROM public.ram_on_disk WHERE ramID = OLD.ramID); \
+            RETURN OLD; \
+        END; \
+        $$ LANGUAGE plpgsql; \
+        CREATE OR REPLACE FUNCTION public.filez_disk_stats_on_ram_update() RETURNS trigger AS $$ \
+        BEGIN \
+            UPDATE public.disk_stats SET ram_size_sum = ram_size_sum + NEW.size - OLD.size \
+            WHERE diskID IN (SELECT diskID FROM public.ram_on_disk WHERE ramID IN (OLD.ramID, NEW.ramID)); \
+            IF OLD.company IS DISTINCT FROM NEW.company THEN \
+                UPDATE public.disk_ram_company SET ram_count = ram_count - 1 \
+                WHERE company = OLD.company \
+                    AND diskID IN (SELECT diskID FROM public.ram_on_disk WHERE ramID IN (OLD.ramID, NEW.ramID)); \
+                DELETE FROM public.disk_ram_company \
+                WHERE ram_count = 0 AND company = OLD.company \
+                    AND diskID IN (SELECT diskID FROM public.ram_on_disk WHERE ramID IN (OLD.ramID, NEW.ramID)); \
+                INSERT INTO public.disk_ram_company (diskID, company, ram_count) \
+                    SELECT diskID, NEW.company, 1 FROM public.ram_on_disk WHERE ramID IN (OLD.ramID, NEW.ramID) \
+                ON CONFLICT (diskID, company) DO UPDATE SET ram_count = public.disk_ram_company.ram_count + 1; \
+            END IF; \
+            RETURN NULL; \
+        END; \
+        $$ LANGUAGE plpgsql; \
+        CREATE TRIGGER disk_stats_insert AFTER INSERT ON public.disk \
+            REFERENCING NEW TABLE AS new_rows \
+            FOR EACH STATEMENT EXECUTE PROCEDURE public.filez_disk_stats_on_disk(); \
+        CREATE TRIGGER disk_stats_insert AFTER INSERT ON public.file_on_disk \
+            REFERENCING NEW TABLE AS new_rows \
+            FOR EACH STATEMENT EXECUTE PROCEDURE public.filez_disk_stats_on_file_on_disk(); \
+        CREATE TRIGGER disk_stats_delete AFTER DELETE ON public.file_on_disk \
+            REFERENCING OLD TABLE AS old_rows \
+            FOR EACH STATEMENT EXECUTE PROCEDURE public.filez_disk_stats_on_file_on_disk(); \
+        CREATE TRIGGER disk_stats_delete BEFORE DELETE ON public.file \
+            FOR EACH ROW EXECUTE PROCEDURE public.filez_disk_stats_on_file_delete(); \
+        CREATE TRIGGER disk_stats_update AFTER UPDATE OF size ON public.file \
+            FOR EACH ROW WHEN (OLD.size IS DISTINCT FROM NEW.size) \
+            EXECUTE PROCEDURE public.filez_disk_stats_on_file_update(); \
+        CREATE TRIGGER disk_stats_insert AFTER INSERT ON public.ram_on_disk \
+            REFERENCING NEW TABLE AS new_rows \
+            FOR EACH STATEMENT EXECUTE PROCEDURE public.filez_disk_stats_on_ram_on_disk(); \
+        CREATE TRIGGER disk_stats_delete AFTER DELETE ON public.ram_on_disk \
+            REFERENCING OLD TABLE AS old_rows \
+            FOR EACH STATEMENT EXECUTE PROCEDURE public.filez_disk_stats_on_ram_on_disk(); \
+        CREATE TRIGGER disk_stats_delete BEFORE DELETE ON public.ram \
+            FOR EACH ROW EXECUTE PROCEDURE public.filez_disk_stats_on_ram_delete(); \
+        CREATE TRIGGER disk_stats_update AFTER UPDATE OF size, company ON public.ram \
+            FOR EACH ROW WHEN (OLD.size IS DISTINCT FROM NEW.size OR OLD.company IS DISTINCT FROM NEW.company) \
+            EXECUTE PROCEDURE public.filez_disk_stats_on_ram_update(); "
+
+
+# Total cost (disk cost * file size over every placement) of each file type, kept current by triggers. The costs are
+# bigint, since cost * size can exceed an integer.
+# As with disk_stats, deleting a file/disk is handled by a BEFORE DELETE trigger on it, and the cascaded placement
+# deletes find no parent row to join with so they aren't subtracted twice. Changing a disk's cost moves the
+# totals of the types on it, changing a file's size or type moves its cost
+def get_create_type_cost_cmd():
+    return " \
+        CREATE TABLE public.type_cost( \
+            type            text        PRIMARY KEY, \
+            total_cost      bigint      NOT NULL \
+        ); \
+        CREATE OR REPLACE FUNCTION public.filez_type_cost_on_file_on_disk() RETURNS trigger AS $$ \
+        BEGIN \
+            IF TG_OP = 'INSERT' THEN \
+                INSERT INTO public.type_cost (type, total_cost) \
+                    SELECT type, SUM(cost::bigint * size) \
+                    FROM new_rows \
+                    INNER JOIN public.file ON public.file.fileID = new_rows.fileID \
+                    INNER JOIN public.disk ON public.disk.diskID = new_rows.diskID \
+                    GROUP BY type \
+                ON CONFLICT (type) DO UPDATE \
+                    SET total_cost = public.type_cost.total_cost + EXCLUDED.total_cost; \
+            ELSE \
+                UPDATE public.type_cost SET total_cost = total_cost - removed.cost \
+                FROM ( \
+                    SELECT type, SUM(cost::bigint * size) AS cost \
+                    FROM old_rows \
+                    INNER JOIN public.file ON public.file.fileID = old_rows.fileID \
+                    INNER JOIN public.disk ON public.disk.diskID = old_rows.diskID \
+                    GROUP BY type \
+                ) removed \
+                WHERE public.type_cost.type = removed.type; \
+            END IF; \
+            RETURN NULL; \
+        END; \
+        $$ LANGUAGE plpgsql; \
+        CREATE OR REPLACE FUNCTION public.filez_type_cost_on_file_delete() RETURNS trigger AS $$ \
+        BEGIN \
+            UPDATE public.type_cost SET total_cost = total_cost - removed.cost \
+            FROM ( \
+                SELECT OLD.size * SUM(cost) AS cost \
+                FROM public.file_on_disk INNER JOIN public.disk ON public.disk.diskID = public.file_on_disk.diskID \
+                WHERE fileID = OLD.fileID \
+                HAVING COUNT(*) > 0 \
+            ) removed \
+            WHERE type = OLD.type; \
+            RETURN OLD; \
+        END; \
+        $$ LANGUAGE plpgsql; \
+        CREATE OR REPLACE FUNCTION public.filez_type_cost_on_disk_delete() RETURNS trigger AS $$ \
+        BEGIN \
+            UPDATE public.type_cost SET total_cost = total_cost - removed.cost \
+            FROM ( \
+                SELECT type, OLD.cost * SUM(size) AS cost \
+                FROM public.file_on_disk INNER JOIN public.file ON public.file.fileID = public.file_on_disk.fileID \
+                WHERE diskID = OLD.diskID \
+                GROUP BY type \
+            ) removed \
+            WHERE public.type_cost.type = removed.type; \
+            RETURN OLD; \
+        END; \
+        $$ LANGUAGE plpgsql; \
+        CREATE OR REPLACE FUNCTION public.filez_type_cost_on_disk_cost() RETURNS trigger AS $$ \
+        BEGIN \
+            UPDATE public.type_cost SET total_cost = total_cost + changed.cost \
+            FROM ( \
+                SELECT type, (NEW.cost - OLD.cost) * SUM(size) AS cost \
+                FROM public.file_on_disk INNER JOIN public.file ON public.file.fileID = public.file_on_disk.fileID \
+                WHERE diskID IN (OLD.diskID, NEW.diskID) \
+                GROUP BY type \
+            ) changed \
+            WHERE public.type_cost.type = changed.type; \
+            RETURN NULL; \
+        END; \
+        $$ LANGUAGE plpgsql; \
+        CREATE OR REPLACE FUNCTION public.filez_type_cost_on_file_update() RETURNS trigger AS $$ \
+        BEGIN \
+            UPDATE public.type_cost SET total_cost = total_cost - removed.cost \
+            FROM ( \
+                SELECT OLD.size * SUM(cost) AS cost \
+                FROM public.file_on_disk INNER JOIN public.disk ON public.disk.diskID = public.file_on_disk.diskID \
+                WHERE fileID IN (OLD.fileID, NEW.fileID) \
+                HAVING COUNT(*) > 0 \
+            ) removed \
+            WHERE type = OLD.type; \
+            INSERT INTO public.type_cost (type, total_cost) \
+                SELECT NEW.type, NEW.size * SUM(cost) \
+                FROM public.file_on_disk INNER JOIN public.disk ON public.disk.diskID = public.file_on_disk.diskID \
+                WHERE fileID IN (OLD.fileID, NEW.fileID) \
+                HAVING COUNT(*) > 0 \
+            ON CONFLICT (type) DO UPDATE \
+                SET total_cost = public.type_cost.total_cost + EXCLUDED.total_cost; \
+            RETURN NULL; \
+        END; \
+        $$ LANGUAGE plpgsql; \
+        CREATE TRIGGER type_cost_insert AFTER INSERT ON public.file_on_disk \
+            REFERENCING NEW TABLE AS new_rows \
+            FOR EACH STATEMENT EXECUTE PROCEDURE public.filez_type_cost_on_file_on_disk(); \
+        CREATE TRIGGER type_cost_delete AFTER DELETE ON public.file_on_disk \
+            REFERENCING OLD TABLE AS old_rows \
+            FOR EACH STATEMENT EXECUTE PROCEDURE public.filez_type_cost_on_file_on_disk(); \
+        CREATE TRIGGER type_cost_delete BEFORE DELETE ON public.file \
+            FOR EACH ROW EXECUTE PROCEDURE public.filez_type_cost_on_file_delete(); \
+        CREATE TRIGGER type_cost_delete BEFORE DELETE ON public.disk \
+            FOR EACH ROW EXECUTE PROCEDURE public.filez_type_cost_on_disk_delete(); \
+        CREATE TRIGGER type_cost_update AFTER UPDATE OF cost ON public.disk \
+            FOR EACH ROW WHEN (OLD.cost IS DISTINCT FROM NEW.cost) \
+            EXECUTE PROCEDURE public.filez_type_cost_on_disk_cost(); \
+        CREATE TRIGGER type_cost_update AFTER UPDATE OF size, type ON public.file \
+            FOR EACH ROW WHEN (OLD.size IS DISTINCT FROM NEW.size OR OLD.type IS DISTINCT FROM NEW.type) \
+            EXECUTE PROCEDURE public.filez_type_cost_on_file_update(); "
+
+
+# Conflicting disks (disks sharing a file with another disk), kept current by triggers:
+#   file_replicas:  number of disks each placed file is on
+#   disk_conflicts: number of files on the disk that are also on another disk
+# Both only hold non-zero counts, so disk_conflicts is exactly the conflicting set. Neither references file/disk:
+# the rows go away as the cascaded placements are deleted, and a cascade must not find them already gone.
+# A placement updated by the cascade of an ID change counts as the old one removed and the new one added, without
+# the old row (still there for a BEFORE trigger) as another disk of the file.
+# Row-level BEFORE triggers, because a BEFORE trigger sees the rows already changed by the same statement: when
+# deleteFile/deleteDisk cascade over several placements of a file, each one sees the replicas that remain
+def get_create_conflicts_cmd():
+    return " \
+        CREATE TABLE public.file_replicas( \
+            fileID          integer     PRIMARY KEY, \
+            replica_count   integer     NOT NULL \
+        ); \
+        CREATE TABLE public.disk_conflicts( \
+            diskID              integer     PRIMARY KEY, \
+            shared_file_count   integer     NOT NULL \
+        ); \
+        CREATE OR REPLACE FUNCTION public.filez_replicas_on_file_on_disk() RETURNS trigger AS $$ \
+        DECLARE \
+            replicas integer; \
+            stale_disk integer; \
+        BEGIN \
+            IF TG_OP <> 'INSERT' THEN \
+                UPDATE public.file_replicas SET replica_count = replica_count - 1 \
+                WHERE fileID = OLD.fileID \
+                RETURNING replica_count INTO replicas; \
+                IF replicas = 0 THEN \
+                    DELETE FROM public.file_replicas WHERE fileID = OLD.fileID; \
+                ELSE \
+                    UPDATE public.disk_conflicts SET shared_file_count = shared_file_count - 1 \
+                    WHERE diskID = OLD.diskID \
+                        OR (replicas = 1 AND diskID IN (SELECT diskID FROM public.file_on_disk WHERE fileID = OLD.fileID)); \
+                    DELETE FROM public.disk_conflicts \
+                    WHERE shared_file_count = 0 \
+                        AND (diskID = OLD.diskID \
+                            OR (replicas = 1 AND diskID IN (SELECT diskID FROM public.file_on_disk WHERE fileID = OLD.fileID))); \
+                END IF; \
+                IF TG_OP = 'DELETE' THEN \
+                    RETURN OLD; \
+                END IF; \
+                IF OLD.fileID = NEW.fileID THEN \
+                    stale_disk := OLD.diskID; \
+                END IF; \
+            END IF; \
+            INSERT INTO public.file_replicas (fileID, replica_count) VALUES (NEW.fileID, 1) \
+            ON CONFLICT (fileID) DO UPDATE SET replica_count = public.file_replicas.replica_count + 1 \
+            RETURNING replica_count INTO replicas; \
+            IF replicas >= 2 THEN \
+                INSERT INTO public.disk_conflicts (diskID, shared_file_count) \
+                SELECT NEW.diskID, 1 \
+                UNION ALL \
+                SELECT diskID, 1 FROM public.file_on_disk \
+                WHERE fileID = NEW.fileID AND diskID <> NEW.diskID AND diskID IS DISTINCT FROM stale_disk \
+                    AND replicas = 2 \
+                ON CONFLICT (diskID) DO UPDATE SET shared_file_count = public.disk_conflicts.shared_file_count + 1; \
+            END IF; \
+            RETURN NEW; \
+        END; \
+        $$ LANGUAGE plpgsql; \
+        CREATE TRIGGER replicas_insert BEFORE INSERT ON public.file_on_disk \
+            FOR EACH ROW EXECUTE PROCEDURE public.filez_replicas_on_file_on_disk(); \
+        CREATE TRIGGER replicas_delete BEFORE DELETE ON public.file_on_disk \
+            FOR EACH ROW EXECUTE PROCEDURE public.filez_replicas_on_file_on_disk(); \
+        CREATE TRIGGER replicas_update BEFORE UPDATE OF fileID, diskID ON public.file_on_disk \
+            FOR EACH ROW WHEN (OLD.fileID <> NEW.fileID OR OLD.diskID <> NEW.diskID) \
+            EXECUTE PROCEDURE public.filez_replicas_on_file_on_disk(); "
+
+
+# Every committed change to a table sends a NOTIFY on this channel so other processes can drop what they cached
+# Payload: {"table": <table>, "ids": {<id column>: [changed IDs], ...}}, with "ids": null when there were too many
+INVALIDATION_CHANNEL = "filez_invalidate"
+
+
+def get_create_notify_function_cmd():
+    # statement-level, so a bulk write sends one notification per table instead of one per row
+    return " \
+        CREATE OR REPLACE FUNCTION public.filez_notify_change() RETURNS trigger AS $$ \
+        DECLARE \
+            changed_rows text; \
+            ids jsonb := '{}'; \
+            changed jsonb; \
+            payload text; \
+            col text; \
+        BEGIN \
+            IF TG_OP = 'INSERT' THEN \
+                changed_rows := 'SELECT %1$I AS id FROM new_rows'; \
+            ELSIF TG_OP = 'DELETE' THEN \
+                changed_rows := 'SELECT %1$I AS id FROM old_rows'; \
+            ELSE \
+                changed_rows := 'SELECT %1$I AS id FROM new_rows UNION SELECT %1$I FROM old_rows'; \
+            END IF; \
+            FOREACH col IN ARRAY TG_ARGV LOOP \
+                EXECUTE format('SELECT jsonb_agg(DISTINCT id) FROM (' || changed_rows || ') changed WHERE id IS NOT NULL', col) \
+                    INTO changed; \
+                ids := ids || jsonb_build_object(col, COALESCE(changed, '[]')); \
+            END LOOP; \
+            payload := jsonb_build_object('table', TG_TABLE_NAME, 'ids', ids)::text; \
+            IF octet_length(payload) > 7900 THEN \
+                payload := jsonb_build_object('table', TG_TABLE_NAME, 'ids', NULL)::text; \
+            END IF; \
+            PERFORM pg_notify('" + INVALIDATION_CHANNEL + "', payload); \
+            RETURN NULL; \
+        END; \
+        $$ LANGUAGE plpgsql; "
+
+
+def get_create_notify_triggers_cmd(name, id_columns):
+    args = ", ".join(f"'{col}'" for col in id_columns)
+    return f" \
+        CREATE TRIGGER {name}_notify_insert AFTER INSERT ON public.{name} \
+            REFERENCING NEW TABLE AS new_rows \
+            FOR EACH STATEMENT EXECUTE PROCEDURE public.filez_notify_change({args}); \
+        CREATE TRIGGER {name}_notify_update AFTER UPDATE ON public.{name} \
+            REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows \
+            FOR EACH STATEMENT EXECUTE PROCEDURE public.filez_notify_change({args}); \
+        CREATE TRIGGER {name}_notify_delete AFTER DELETE ON public.{name} \
+            REFERENCING OLD TABLE AS old_rows \
+            FOR EACH STATEMENT EXECUTE PROCEDURE public.filez_notify_change({args}); "
+
+
+def get_create_notifications_cmd():
+    return get_create_notify_function_cmd() + \
+           get_create_notify_triggers_cmd("file", ["fileid"]) + \
+           get_create_notify_triggers_cmd("disk", ["diskid"]) + \
+           get_create_notify_triggers_cmd("ram", ["ramid"]) + \
+           get_create_notify_triggers_cmd("file_on_disk", ["fileid", "diskid"]) + \
+           get_create_notify_triggers_cmd("ram_on_disk", ["ramid", "diskid"])
+
+
+def get_create_tables_cmd():
+    return get_create_entities_cmd() + \
+           get_create_relations_cmd() + \
+           get_create_views_cmd() + \
+           get_create_indexes_cmd() + \
+           get_create_disk_aggregates_cmd() + \
+           get_create_type_cost_cmd() + \
+           get_create_conflicts_cmd() + \
+           get_create_notifications_cmd()
+
+
+@invalidate_cache(clear_caches)
 @return_status
 @perform_sql_txn
 def createTables():
-    return get_create_entities_cmd() + \
-           get_create_relations_cmd() + \
-           get_create_views_cmd()
+    return Connector.Script("filez_create_tables", get_create_tables_cmd())
 
 
 # ----------------------------------------
@@ -167,9 +790,8 @@ def createTables():
 def get_clear_table_cmd(name):
     return f"DELETE FROM {name} CASCADE; "
 
-@return_status
-@perform_sql_txn
-def clearTables():
+
+def get_clear_tables_cmd():
     return get_clear_table_cmd("file") + \
            get_clear_table_cmd("ram") + \
            get_clear_table_cmd("disk") + \
@@ -177,141 +799,205 @@ def clearTables():
            get_clear_table_cmd("ram_on_disk")
 
 
+@invalidate_cache(clear_caches)
+@return_status
+@perform_sql_txn
+def clearTables():
+    return Connector.Script("filez_clear_tables", get_clear_tables_cmd())
+
+
 # ----------------------------------------
 
 def get_drop_table_cmd(name):
     return f"DROP TABLE {name} CASCADE; "
 
 
-@return_status
-@perform_sql_txn
-def dropTables():
+def get_drop_tables_cmd():
     return get_drop_table_cmd("file") + \
            get_drop_table_cmd("disk") + \
            get_drop_table_cmd("ram") + \
            get_drop_table_cmd("file_on_disk") + \
-           get_drop_table_cmd("ram_on_disk")
+           get_drop_table_cmd("ram_on_disk") + \
+           get_drop_table_cmd("disk_stats") + \
+           get_drop_table_cmd("disk_ram_company") + \
+           get_drop_table_cmd("type_cost") + \
+           get_drop_table_cmd("file_replicas") + \
+           get_drop_table_cmd("disk_conflicts")
+
+
+@invalidate_cache(clear_caches)
+@return_status
+@perform_sql_txn
+def dropTables():
+    return Connector.Script("filez_drop_tables", get_drop_tables_cmd())
 
 
 # ----------------------------------------
 
+ADD_FILE = Connector.Statement("filez_add_file", " \
+    INSERT INTO public.file (fileID, type, size) \
+    VALUES($1, $2, $3)")
+
+
 @return_status
 @perform_sql_txn
 def addFile(file: File) -> Status:
-    return f"INSERT INTO public.file (fileID, type, size) \
-            VALUES({none_to_null(file.getFileID())},{none_to_null(file.getType(), True)},{none_to_null(file.getSize())});"
+    return ADD_FILE.bind(file.getFileID(), file.getType(), file.getSize())
 
 
 # ----------------------------------------
 
+GET_FILE = Connector.Statement("filez_get_file", " \
+    SELECT * FROM public.file \
+    WHERE fileID=$1")
+
+
 @assert_no_database_error
 @assert_exists
-@perform_sql_txn
+@perform_sql_read(serves=("getFileByID",))
 def getFileAttributesByID(fileID: int):
-    return f"SELECT * FROM public.file  \
-        WHERE fileID={fileID};"
+    return GET_FILE.bind(*required_ids(fileID))
 
 
 def getFileByID(fileID: int) -> File:
-    selected_files = getFileAttributesByID(fileID)
-    if type(selected_files) == Status:
+    file_attributes = read_through(file_cache,
+        fileID, lambda: first_row_attributes(getFileAttributesByID(fileID), "fileID"))
+    if file_attributes is None:
         return File.badFile()
-    file_attributes = selected_files[0]
-    file_attributes["fileID"] = file_attributes.pop("fileid")
     return File(**file_attributes)
 
 
 # ----------------------------------------
 
+RELEASE_FILE_SPACE = Connector.Statement("filez_release_file_space", " \
+    UPDATE public.disk \
+    SET free_space=free_space + $2 \
+    WHERE diskID IN ( \
+        SELECT diskID FROM public.file_on_disk \
+        WHERE fileID=$1 \
+    )")
+DELETE_FILE = Connector.Statement("filez_delete_file", " \
+    DELETE FROM public.file \
+    WHERE fileID=$1")
+
+
+def invalidate_deleted_file(file: File):
+    # freeing the file's space touches every disk it was on
+    file_cache.invalidate(file.getFileID())
+    disk_cache.clear()
+
+
+@invalidate_cache(invalidate_deleted_file)
 @return_status
 @perform_sql_txn
 def deleteFile(file: File) -> Status:
-    return f" \
-        UPDATE public.disk \
-        SET free_space=free_space + {none_to_null(file.getSize())} \
-        WHERE diskID IN ( \
-            SELECT diskID FROM public.file_on_disk \
-            WHERE fileID={none_to_null(file.getFileID())} \
-        ); " + f" \
-        DELETE FROM public.file \
-        WHERE fileID={none_to_null(file.getFileID())}; "
+    return [RELEASE_FILE_SPACE.bind(file.getFileID(), file.getSize()),
+            DELETE_FILE.bind(file.getFileID())]
 
 
 # ----------------------------------------
 
+ADD_DISK = Connector.Statement("filez_add_disk", " \
+    INSERT INTO public.disk (diskID, company, speed, free_space, cost) \
+    VALUES($1, $2, $3, $4, $5)")
+
+
+def bind_add_disk(disk: Disk):
+    return ADD_DISK.bind(disk.getDiskID(), disk.getCompany(), disk.getSpeed(), disk.getFreeSpace(), disk.getCost())
+
+
 @return_status
 @perform_sql_txn
 def addDisk(disk: Disk) -> Status:
-    return f"INSERT INTO public.disk (diskID, company, speed, free_space, cost) \
-        VALUES({none_to_null(disk.getDiskID())},{none_to_null(disk.getCompany(), True)},{none_to_null(disk.getSpeed())},{none_to_null(disk.getFreeSpace())},{none_to_null(disk.getCost())}); "
+    return bind_add_disk(disk)
 
 
 # ----------------------------------------
 
+GET_DISK = Connector.Statement("filez_get_disk", " \
+    SELECT * FROM public.disk \
+    WHERE diskID=$1")
+
+
 @assert_no_database_error
 @assert_exists
-@perform_sql_txn
+@perform_sql_read(serves=("getDiskByID",))
 def getDiskAttributesByID(diskID: int):
-    return f"SELECT * FROM public.disk \
-        WHERE diskID={diskID};"
+    return GET_DISK.bind(*required_ids(diskID))
 
 
 def getDiskByID(diskID: int) -> Disk:
-    selected_disks = getDiskAttributesByID(diskID)
-    if type(selected_disks) == Status:
+    disk_attributes = read_through(disk_cache,
+        diskID, lambda: first_row_attributes(getDiskAttributesByID(diskID), "diskID"))
+    if disk_attributes is None:
         return Disk.badDisk()
-    disk_attributes = selected_disks[0]
-    disk_attributes["diskID"] = disk_attributes.pop("diskid")
     return Disk(**disk_attributes)
 
 
 # ----------------------------------------
 
 
+DELETE_DISK = Connector.Statement("filez_delete_disk", " \
+    DELETE FROM public.disk \
+    WHERE diskID=$1")
+
+
+@invalidate_cache(lambda diskID: disk_cache.invalidate(diskID))
 @return_status
 @assert_exists
 @perform_sql_txn
 def deleteDisk(diskID: int) -> Status:
-    return f"DELETE FROM public.disk \
-        WHERE diskID={diskID}; "
+    return DELETE_DISK.bind(*required_ids(diskID))
 
 
 # ----------------------------------------
 
+ADD_RAM = Connector.Statement("filez_add_ram", " \
+    INSERT INTO public.ram (ramID, company, size) \
+    VALUES($1, $2, $3)")
+
+
 @return_status
 @perform_sql_txn
 def addRAM(ram: RAM) -> Status:
-    return f"INSERT INTO public.ram (ramID, company, size) \
-                VALUES({none_to_null(ram.getRamID())},{none_to_null(ram.getCompany(), True)},{none_to_null(ram.getSize())}); "
+    return ADD_RAM.bind(ram.getRamID(), ram.getCompany(), ram.getSize())
 
 
 # ----------------------------------------
 
+GET_RAM = Connector.Statement("filez_get_ram", " \
+    SELECT * FROM public.ram \
+    WHERE ramID=$1")
+
+
 @assert_no_database_error
 @assert_exists
-@perform_sql_txn
+@perform_sql_read(serves=("getRAMByID",))
 def getRAMAttributesByID(ramID: int):
-    return f"SELECT * FROM public.ram \
-        WHERE ramID={ramID}; "
+    return GET_RAM.bind(*required_ids(ramID))
 
 
 def getRAMByID(ramID: int) -> RAM:
-    selected_rams = getRAMAttributesByID(ramID)
-    if type(selected_rams) == Status:
+    ram_attributes = read_through(ram_cache,
+        ramID, lambda: first_row_attributes(getRAMAttributesByID(ramID), "ramID"))
+    if ram_attributes is None:
         return RAM.badRAM()
-    ram_attributes = selected_rams[0]
-    ram_attributes["ramID"] = ram_attributes.pop("ramid")
     return RAM(**ram_attributes)
 
 
 # ----------------------------------------
 
+DELETE_RAM = Connector.Statement("filez_delete_ram", " \
+    DELETE FROM public.ram \
+    WHERE ramID=$1")
+
+
+@invalidate_cache(lambda ramID: ram_cache.invalidate(ramID))
 @return_status
 @assert_exists
 @perform_sql_txn
 def deleteRAM(ramID: int) -> Status:
-    return f"DELETE FROM public.ram \
-        WHERE ramID={ramID}; "
+    return DELETE_RAM.bind(*required_ids(ramID))
 
 
 # ----------------------------------------
@@ -319,80 +1005,274 @@ def deleteRAM(ramID: int) -> Status:
 @return_status
 @perform_sql_txn
 def addDiskAndFile(disk: Disk, file: File) -> Status:
-    return f"\
-            INSERT INTO public.disk (diskID, company, speed, free_space, cost) \
-                VALUES({none_to_null(disk.getDiskID())},{none_to_null(disk.getCompany(), True)},{none_to_null(disk.getSpeed())},{none_to_null(disk.getFreeSpace())},{none_to_null(disk.getCost())}); \
-            INSERT INTO public.file (fileID, type, size) \
-                VALUES({none_to_null(file.getFileID())},{none_to_null(file.getType(), True)},{none_to_null(file.getSize())}); "
+    return [bind_add_disk(disk),
+            ADD_FILE.bind(file.getFileID(), file.getType(), file.getSize())]
+
+
+# ----------------------------------------
+
+BULK_CHUNK_SIZE = 10000
+BULK_INSERT_METHOD = "copy"  # or "values" for a multi-row INSERT ... VALUES
+DATA_ERRORS = (psycopg2.DataError, DatabaseException.DATA_EXCEPTION)  # a value the column can't hold
+
+# the IDs of a batch already in the table, by table
+EXISTING_IDS = {
+    "public.file": Connector.Statement("filez_existing_file_ids", " \
+        SELECT fileID FROM public.file \
+        WHERE fileID = ANY($1::integer[])"),
+    "public.disk": Connector.Statement("filez_existing_disk_ids", " \
+        SELECT diskID FROM public.disk \
+        WHERE diskID = ANY($1::integer[])"),
+    "public.ram": Connector.Statement("filez_existing_ram_ids", " \
+        SELECT ramID FROM public.ram \
+        WHERE ramID = ANY($1::integer[])"),
+}
+
+
+def insert_isolating_bad_rows(conn, table, columns, rows, statuses, offset, skip_existing=False):
+    # Insert rows with one COPY; if a row violates a constraint, undo and retry both halves, so only
+    # the rows around a bad one are retried individually. Statuses are written to statuses[offset:]
+    conn.execute("SAVEPOINT filez_bulk_insert")
+    try:
+        conn.insert_rows(table, columns, rows, method=BULK_INSERT_METHOD, skip_existing=skip_existing)
+    except (DatabaseException.CHECK_VIOLATION, DatabaseException.NOT_NULL_VIOLATION,
+            DatabaseException.UNIQUE_VIOLATION) + DATA_ERRORS as e:
+        conn.execute("ROLLBACK TO SAVEPOINT filez_bulk_insert; RELEASE SAVEPOINT filez_bulk_insert")
+        if len(rows) == 1:
+            if isinstance(e, DatabaseException.UNIQUE_VIOLATION):
+                statuses[offset] = Status.ALREADY_EXISTS
+            elif isinstance(e, DATA_ERRORS):
+                statuses[offset] = Status.ERROR  # e.g. a value out of the column's range
+            else:
+                statuses[offset] = Status.BAD_PARAMS
+            return
+        middle = len(rows) // 2
+        # earlier rows go first, so a duplicate ID inside the batch is reported on its later occurrence
+        insert_isolating_bad_rows(conn, table, columns, rows[:middle], statuses, offset, skip_existing)
+        insert_isolating_bad_rows(conn, table, columns, rows[middle:], statuses, offset + middle, skip_existing)
+        return
+    conn.execute("RELEASE SAVEPOINT filez_bulk_insert")
+
+
+def insert_chunk(conn, table, columns, rows) -> List[Status]:
+    # A row whose ID is taken would make the COPY bisect down to it, so the rows whose ID is in the table or earlier
+    # in the chunk are found with one query and inserted after the others, skipping the taken IDs. They still go
+    # through the insert, since a bad value is refused before the ID is (BAD_PARAMS or ERROR, not ALREADY_EXISTS)
+    ids = [row[0] for row in rows if isinstance(row[0], int) and INTEGER_RANGE[0] <= row[0] <= INTEGER_RANGE[1]]
+    _, existing = conn.execute(EXISTING_IDS[table], params=(ids,))
+    existing_ids = set(existing.column(columns[0]))
+    present = set(existing_ids)
+    new, repeated = [], []
+    for i, row in enumerate(rows):
+        (repeated if row[0] in present else new).append(i)
+        present.add(row[0])
+
+    statuses = [Status.OK] * len(rows)
+    for positions, skip_existing in ((new, False), (repeated, True)):
+        if len(positions) == 0:
+            continue
+        part_statuses = [Status.OK] * len(positions)
+        insert_isolating_bad_rows(conn, table, columns, [rows[i] for i in positions], part_statuses, 0, skip_existing)
+        for i, status in zip(positions, part_statuses):
+            statuses[i] = status
+
+    # a repeated row that wasn't refused was skipped if its ID was taken by then, else inserted (the rows before it
+    # with its ID were all refused)
+    taken = existing_ids | {rows[i][0] for i in new if statuses[i] == Status.OK}
+    for i in repeated:
+        if statuses[i] == Status.OK:
+            if rows[i][0] in taken:
+                statuses[i] = Status.ALREADY_EXISTS
+            taken.add(rows[i][0])
+    return statuses
+
+
+def bulk_insert(table, columns, rows: Iterable[tuple], chunk_size) -> List[Status]:
+    # Each chunk is inserted and committed in its own transaction (a savepoint in a session). Per-row statuses match what the
+    # single-row add* functions would have returned for the same rows added one after the other
+    statuses = []
+    rows = iter(rows)
+    for chunk in iter(lambda: list(itertools.islice(rows, chunk_size)), []):
+        try:
+            with transaction() as conn:
+                chunk_statuses = insert_chunk(conn, table, columns, chunk)
+        except DATABASE_ERRORS:
+            chunk_statuses = [Status.ERROR] * len(chunk)
+        statuses += chunk_statuses
+    return statuses
+
+
+# The bulk add* functions take the entities or a batch of them (see Business.Batch), whose rows are inserted
+# without an object per entity
+
+def addFiles(files: Union[Iterable[File], FileBatch], chunk_size=BULK_CHUNK_SIZE) -> List[Status]:
+    return bulk_insert("public.file", ("fileID", "type", "size"), FileBatch.rows_of(files), chunk_size)
+
+
+def addDisks(disks: Union[Iterable[Disk], DiskBatch], chunk_size=BULK_CHUNK_SIZE) -> List[Status]:
+    return bulk_insert("public.disk", ("diskID", "company", "speed", "free_space", "cost"), DiskBatch.rows_of(disks),
+                       chunk_size)
+
+
+def addRAMs(rams: Union[Iterable[RAM], RAMBatch], chunk_size=BULK_CHUNK_SIZE) -> List[Status]:
+    return bulk_insert("public.ram", ("ramID", "company", "size"), RAMBatch.rows_of(rams), chunk_size)
 
 
 # ----------------------------------------
 
+ADD_FILE_TO_DISK = Connector.Statement("filez_add_file_to_disk", " \
+    INSERT INTO public.file_on_disk (fileID, diskID) \
+    VALUES ($1, $2)")
+TAKE_DISK_SPACE = Connector.Statement("filez_take_disk_space", " \
+    UPDATE public.disk \
+    SET free_space=free_space - $2 \
+    WHERE diskID = $1")
+
+
+@invalidate_cache(lambda file, diskID: disk_cache.invalidate(diskID))
 @return_status
 @assert_exists
 @perform_sql_txn
 def addFileToDisk(file: File, diskID: int) -> Status:
-    return f" \
-        INSERT INTO public.file_on_disk (fileID, diskID) \
-        VALUES ({none_to_null(file.getFileID())}, {diskID}); " + \
-        f" \
-        UPDATE public.disk \
-        SET free_space=free_space - {none_to_null(file.getSize())} \
-        WHERE diskID = {diskID}; "
+    required_ids(diskID)
+    return [ADD_FILE_TO_DISK.bind(file.getFileID(), diskID),
+            TAKE_DISK_SPACE.bind(diskID, file.getSize())]
 
 
 # ----------------------------------------
 
+LOCK_DISKS_SPACE = Connector.Statement("filez_lock_disks_space", " \
+    SELECT diskID, free_space FROM public.disk \
+    WHERE diskID = ANY($1::integer[]) \
+    ORDER BY diskID \
+    FOR UPDATE")
+LOCK_FILES = Connector.Statement("filez_lock_files", " \
+    SELECT fileID FROM public.file \
+    WHERE fileID = ANY($1::integer[]) \
+    FOR KEY SHARE")
+EXISTING_PLACEMENTS = Connector.Statement("filez_existing_placements", " \
+    SELECT fileID, diskID FROM public.file_on_disk \
+    WHERE (fileID, diskID) IN (SELECT * FROM unnest($1::integer[], $2::integer[]))")
+TAKE_DISKS_SPACE = Connector.Statement("filez_take_disks_space", " \
+    UPDATE public.disk \
+    SET free_space=free_space - taken.size \
+    FROM unnest($1::integer[], $2::bigint[]) AS taken(diskID, size) \
+    WHERE public.disk.diskID = taken.diskID")
+
+
+def placeFiles(placements: Iterable[tuple]) -> List[Status]:
+    # Add many (file, diskID) pairs in one transaction: the disks are locked once, the mappings are inserted
+    # with a single COPY and each disk's free_space is decremented once by the total size placed on it.
+    # Statuses match calling addFileToDisk for each pair in order (a pair without a diskID is ERROR, one without
+    # a fileID is BAD_PARAMS)
+    return place_file_rows([(file.getFileID(), file.getSize(), diskID) for file, diskID in placements])
+
+
+def place_file_rows(placements: List[tuple]) -> List[Status]:
+    # placeFiles for (fileID, size, diskID) rows
+    if len(placements) == 0:
+        return []
+    disk_ids = sorted({diskID for _, _, diskID in placements if diskID is not None})
+    try:
+        return place_files(placements, disk_ids)
+    finally:
+        invalidate_after_write(lambda: disk_cache.invalidate(*disk_ids))
+
+
+def place_files(placements, disk_ids) -> List[Status]:
+    file_ids = sorted({fileID for fileID, _, _ in placements if fileID is not None})
+    try:
+        with transaction() as conn:
+            _, disks = conn.execute(LOCK_DISKS_SPACE, params=(disk_ids,))
+            free_space = dict(zip(disks.column("diskID"), disks.column("free_space")))
+            _, files = conn.execute(LOCK_FILES, params=(file_ids,))
+            existing_files = set(files.column("fileID"))
+            _, mapped = conn.execute(EXISTING_PLACEMENTS, params=([fileID for fileID, _, _ in placements],
+                                                                  [diskID for _, _, diskID in placements]))
+            existing_placements = set(zip(mapped.column("fileID"), mapped.column("diskID")))
+            statuses, accepted, taken = Backend.placement_statuses(placements, free_space, existing_files,
+                                                                   existing_placements)
+            conn.insert_rows("public.file_on_disk", ("fileID", "diskID"), accepted, method=BULK_INSERT_METHOD)
+            if len(taken) > 0:
+                conn.execute(TAKE_DISKS_SPACE, params=(list(taken.keys()), list(taken.values())))
+    except DATABASE_ERRORS + (DatabaseException.CHECK_VIOLATION, DatabaseException.NOT_NULL_VIOLATION,
+                              DatabaseException.UNIQUE_VIOLATION, DatabaseException.FOREIGN_KEY_VIOLATION):
+        return [Status.ERROR] * len(placements)
+    return statuses
+
+
+def addFilesToDisk(files: Union[Iterable[File], FileBatch], diskID: int) -> List[Status]:
+    return place_file_rows([(fileID, size, diskID) for fileID, _, size in FileBatch.rows_of(files)])
+
+
+# ----------------------------------------
+
+RETURN_DISK_SPACE = Connector.Statement("filez_return_disk_space", " \
+    UPDATE public.disk \
+    SET free_space=free_space + $3 \
+    WHERE diskID=$2 AND EXISTS ( \
+        SELECT * FROM public.file_on_disk \
+        WHERE diskID=$2 AND fileID=$1 \
+    )")
+REMOVE_FILE_FROM_DISK = Connector.Statement("filez_remove_file_from_disk", " \
+    DELETE FROM public.file_on_disk \
+    WHERE fileID=$1 AND diskID=$2")
+
+
+@invalidate_cache(lambda file, diskID: disk_cache.invalidate(diskID))
 @return_status
 @perform_sql_txn
 def removeFileFromDisk(file: File, diskID: int) -> Status:
     # modify free space of disk first (so we can check if file was on disk), then remove file from disk.  If fails, free_space modification will be rolled back as well
-    return f" \
-        UPDATE public.disk \
-        SET free_space=free_space + {none_to_null(file.getSize())} \
-        WHERE diskID={diskID} AND EXISTS ( \
-            SELECT * FROM public.file_on_disk \
-            WHERE diskID={diskID} AND fileID={none_to_null(file.getFileID())} \
-        ); " + f" \
-        DELETE FROM public.file_on_disk \
-        WHERE fileID={none_to_null(file.getFileID())} AND diskID={diskID}; "
+    required_ids(diskID)
+    return [RETURN_DISK_SPACE.bind(file.getFileID(), diskID, file.getSize()),
+            REMOVE_FILE_FROM_DISK.bind(file.getFileID(), diskID)]
 
 
 # ----------------------------------------
 
+ADD_RAM_TO_DISK = Connector.Statement("filez_add_ram_to_disk", " \
+    INSERT INTO public.ram_on_disk (ramID, diskID) \
+    SELECT * FROM ( \
+        (SELECT ramID FROM public.ram WHERE ramID=$1) needless_alias1 \
+        CROSS JOIN \
+        (SELECT diskID FROM public.disk WHERE diskID=$2) needless_alias2 \
+    )")
+
+
 @return_status
 @assert_exists
 @perform_sql_txn
 def addRAMToDisk(ramID: int, diskID: int) -> Status:
-    return f" \
-        INSERT INTO public.ram_on_disk (ramID, diskID) \
-        SELECT * FROM ( \
-            (SELECT ramID FROM public.ram WHERE ramID={ramID}) needless_alias1 \
-            CROSS JOIN \
-            (SELECT diskID FROM public.disk WHERE diskID={diskID}) needless_alias2 \
-        ); "
+    return ADD_RAM_TO_DISK.bind(*required_ids(ramID, diskID))
 
 
 # ----------------------------------------
 
+REMOVE_RAM_FROM_DISK = Connector.Statement("filez_remove_ram_from_disk", " \
+    DELETE FROM public.ram_on_disk \
+    WHERE ramID=$1 AND diskID=$2")
+
+
 @return_status
 @assert_exists
 @perform_sql_txn
 def removeRAMFromDisk(ramID: int, diskID: int) -> Status:
-    return f" \
-        DELETE FROM public.ram_on_disk \
-        WHERE ramID={ramID} AND diskID={diskID}; "
+    return REMOVE_RAM_FROM_DISK.bind(*required_ids(ramID, diskID))
 
 
 # ----------------------------------------
 
+AVERAGE_FILE_SIZE_ON_DISK = Connector.Statement("filez_average_file_size_on_disk", " \
+    SELECT file_size_sum::float8 / NULLIF(file_count, 0) AS avg FROM public.disk_stats \
+    WHERE diskID = $1")
+
+
 @assert_no_database_error
 @assert_exists
-@perform_sql_txn
+@perform_sql_read
 def _averageFileSizeOnDisk(diskID: int):
-    return f" \
-        SELECT AVG(size) FROM public.all_files_on_disk \
-        WHERE diskID = {diskID};"
+    return AVERAGE_FILE_SIZE_ON_DISK.bind(*required_ids(diskID))
 
 
 def averageFileSizeOnDisk(diskID: int) -> float:
@@ -406,13 +1286,16 @@ def averageFileSizeOnDisk(diskID: int) -> float:
 
 # ----------------------------------------
 
+DISK_TOTAL_RAM = Connector.Statement("filez_disk_total_ram", " \
+    SELECT NULLIF(ram_size_sum, 0) AS sum FROM public.disk_stats \
+    WHERE diskID = $1")
+
+
 @assert_no_database_error
 @assert_exists
-@perform_sql_txn
+@perform_sql_read
 def _diskTotalRAM(diskID: int):
-    return f" \
-        SELECT SUM(size) FROM public.all_rams_on_disk \
-        WHERE diskID = {diskID};"
+    return DISK_TOTAL_RAM.bind(*required_ids(diskID))
 
 
 def diskTotalRAM(diskID: int) -> int:
@@ -426,13 +1309,16 @@ def diskTotalRAM(diskID: int) -> int:
 
 # ----------------------------------------
 
+COST_FOR_TYPE = Connector.Statement("filez_cost_for_type", " \
+    SELECT total_cost AS sum FROM public.type_cost \
+    WHERE type=$1")
+
+
 @assert_no_database_error
 @assert_exists
-@perform_sql_txn
+@perform_sql_read(replica=True)
 def _getCostForType(type: str):
-    return f" \
-        SELECT SUM(cost*size) FROM public.all_files_on_disk INNER JOIN public.disk ON public.disk.diskID=public.all_files_on_disk.diskID \
-        WHERE type={none_to_null(type, True)}; "
+    return COST_FOR_TYPE.bind(type)
 
 
 def getCostForType(type: str) -> int:
@@ -446,14 +1332,46 @@ def getCostForType(type: str) -> int:
 
 # ----------------------------------------
 
+COSTS_FOR_TYPES = Connector.Statement("filez_costs_for_types", " \
+    SELECT type, total_cost FROM public.type_cost \
+    WHERE type = ANY($1::text[])")
+
+
 @assert_no_database_error
-@perform_sql_txn
+@perform_sql_read
+def _getCostForTypes(types: List[str]):
+    return COSTS_FOR_TYPES.bind(types)
+
+
+def getCostForTypes(types: Iterable[str]) -> dict:
+    # {type: getCostForType(type)} for each of types, in one round-trip
+    types = list(types)
+    if len(types) == 0:
+        return {}
+    total_costs = _getCostForTypes(types)
+    if total_costs == Status.ERROR:
+        return {type: -1 for type in types}
+    _, totals = total_costs
+    costs = {type: 0 for type in types}
+    costs.update(zip(totals.column("type"), totals.column("total_cost")))
+    return costs
+
+
+# ----------------------------------------
+
+# Top-5 walks: the bound is computed once, before the scan, so the files are read in fileID order from the
+# (fileID, size) index and the walk stops at the fifth one that fits, however large the table is
+FILES_CAN_BE_ADDED_TO_DISK = Connector.Statement("filez_files_can_be_added_to_disk", " \
+    SELECT fileID FROM public.file \
+    WHERE size <= (SELECT free_space FROM public.disk WHERE diskID=$1) \
+    ORDER BY fileID DESC \
+    LIMIT 5")
+
+
+@assert_no_database_error
+@perform_sql_read
 def _getFilesCanBeAddedToDisk(diskID: int):
-    return f" \
-        SELECT fileID FROM public.file, (SELECT free_space FROM public.disk WHERE diskID={diskID}) disk_freespace_singleton \
-        WHERE size <= free_space \
-        ORDER BY fileID DESC \
-        LIMIT 5; "
+    return FILES_CAN_BE_ADDED_TO_DISK.bind(*required_ids(diskID))
 
 
 def getFilesCanBeAddedToDisk(diskID: int) -> List[int]:
@@ -461,43 +1379,52 @@ def getFilesCanBeAddedToDisk(diskID: int) -> List[int]:
     if type(suggested_files) == Status:
         return []
     _, suggested = suggested_files
-    return [suggested[i]["fileID"] for i in range(suggested.size())]
+    return suggested.column("fileID")
 
 
 # ----------------------------------------
 
+# A disk without RAM has a RAM total of 0 in disk_stats, which only files of size 0 fit in
+FILES_CAN_BE_ADDED_TO_DISK_AND_RAM = Connector.Statement("filez_files_can_be_added_to_disk_and_ram", " \
+    SELECT fileID FROM public.file \
+    WHERE size <= ( \
+        SELECT LEAST(free_space, ram_size_sum) FROM public.disk \
+        INNER JOIN public.disk_stats ON public.disk_stats.diskID = public.disk.diskID \
+        WHERE public.disk.diskID=$1 \
+    ) \
+    ORDER BY fileID ASC \
+    LIMIT 5")
+
+
 @assert_no_database_error
-@perform_sql_txn
+@perform_sql_read
 def _getFilesCanBeAddedToDiskAndRAM(diskID: int):
-    return f" \
-    SELECT fileID FROM \
-        public.file, \
-        (SELECT free_space FROM public.disk WHERE diskID={diskID}) disk_freespace_singleton, \
-        (SELECT SUM(size) as ram_space FROM public.all_rams_on_disk WHERE diskID={diskID}) disk_ramspace_singleton \
-    WHERE size <= free_space AND (size <= ram_space OR (size=0 AND ram_space IS NULL)) \
-    ORDER BY fileID ASC \
-    LIMIT 5; "
+    return FILES_CAN_BE_ADDED_TO_DISK_AND_RAM.bind(*required_ids(diskID))
 
 def getFilesCanBeAddedToDiskAndRAM(diskID: int) -> List[int]:
     canBeAdded = _getFilesCanBeAddedToDiskAndRAM(diskID)
     if type(canBeAdded) == Status:
         return []
     _, filesCanBeAdded = canBeAdded
-    return [filesCanBeAdded[i]["fileID"] for i in range(filesCanBeAdded.size())]
+    return filesCanBeAdded.column("fileID")
 
 
 # ----------------------------------------
 
+# disk_ram_company holds the companies of the RAMs on each disk, so both are primary key lookups
+IS_COMPANY_EXCLUSIVE = Connector.Statement("filez_is_company_exclusive", " \
+    SELECT company FROM public.disk \
+    WHERE diskID=$1 AND NOT EXISTS ( \
+        SELECT * FROM public.disk_ram_company \
+        WHERE public.disk_ram_company.diskID=$1 AND public.disk_ram_company.company <> public.disk.company \
+    )")
+
+
 @assert_no_database_error
 @assert_exists
-@perform_sql_txn
+@perform_sql_read
 def _isCompanyExclusive(diskID: int):
-    return f" \
-        SELECT disk_singleton.company FROM (SELECT company FROM public.disk WHERE diskID={diskID}) disk_singleton  \
-        WHERE disk_singleton.company =ALL ( \
-            SELECT company FROM public.all_rams_on_disk \
-            WHERE diskID={diskID} \
-        ); "
+    return IS_COMPANY_EXCLUSIVE.bind(*required_ids(diskID))
 
 
 def isCompanyExclusive(diskID: int) -> bool:
@@ -506,86 +1433,353 @@ def isCompanyExclusive(diskID: int) -> bool:
 
 # ----------------------------------------
 
+IS_COMPANY_EXCLUSIVE_MANY = Connector.Statement("filez_is_company_exclusive_many", " \
+    SELECT public.disk.diskID, \
+        COUNT(public.disk_ram_company.company) FILTER (WHERE public.disk_ram_company.company <> public.disk.company) = 0 \
+            AS exclusive \
+    FROM public.disk \
+    LEFT OUTER JOIN public.disk_ram_company ON public.disk_ram_company.diskID = public.disk.diskID \
+    WHERE public.disk.diskID = ANY($1::integer[]) \
+    GROUP BY public.disk.diskID")
+
+
 @assert_no_database_error
-@perform_sql_txn
+@perform_sql_read
+def _isCompanyExclusiveMany(diskIDs: List[int]):
+    return IS_COMPANY_EXCLUSIVE_MANY.bind(diskIDs)
+
+
+def isCompanyExclusiveMany(diskIDs: Iterable[int]) -> dict:
+    # {diskID: isCompanyExclusive(diskID)} for each of diskIDs, in one round-trip
+    exclusive = {diskID: False for diskID in diskIDs}
+    if len(exclusive) == 0:
+        return exclusive
+    result = _isCompanyExclusiveMany(list(exclusive))
+    if type(result) == Status:
+        return exclusive
+    _, disks = result
+    exclusive.update(zip(disks.column("diskID"), map(bool, disks.column("exclusive"))))
+    return exclusive
+
+
+# ----------------------------------------
+
+CONFLICTING_DISKS = Connector.Statement("filez_conflicting_disks", " \
+    SELECT diskID FROM public.disk_conflicts \
+    ORDER BY diskID ASC")
+
+
+@assert_no_database_error
+@perform_sql_read(replica=True)
 def _getConflictingDisks():
-    return f" \
-        SELECT DISTINCT file1tbl.diskID FROM public.file_on_disk AS file1tbl INNER JOIN public.file_on_disk AS file2tbl ON file1tbl.fileID = file2tbl.fileID \
-        WHERE file1tbl.diskID <> file2tbl.diskID \
-        ORDER BY file1tbl.diskID ASC;"
+    return CONFLICTING_DISKS.bind()
 
 def getConflictingDisks() -> List[int]:
     conflicting_disks = _getConflictingDisks()
     if type(conflicting_disks) == Status:
         return []
     _, conflicting = conflicting_disks
-    return [conflicting[i]["diskID"] for i in range(conflicting.size())]
+    return conflicting.column("diskID")
 
 
 # ----------------------------------------
 
+# The number of files that fit on a disk is the number of file sizes <= its free space. Merge the size histogram
+# of the files with the disks' free spaces in one sorted pass: the running file count at a disk's position is its
+# count (disks sort after files of the same size, so a file that exactly fills the disk counts).
+# O((#distinct sizes + #disks) log) instead of the O(#files * #disks) cross join
+MOST_AVAILABLE_DISKS = Connector.Statement("filez_most_available_disks", " \
+    SELECT diskID FROM ( \
+        SELECT diskID, speed, is_disk, \
+            SUM(num_files) OVER (ORDER BY space, is_disk ROWS UNBOUNDED PRECEDING) AS count \
+        FROM ( \
+            SELECT size AS space, FALSE AS is_disk, COUNT(*) AS num_files, NULL::integer AS diskID, NULL::integer AS speed \
+            FROM public.file \
+            GROUP BY size \
+            UNION ALL \
+            SELECT free_space, TRUE, 0, diskID, speed FROM public.disk \
+        ) file_sizes_and_disks \
+    ) num_files_addable_to_disk \
+    WHERE is_disk \
+    ORDER BY count DESC, speed DESC, diskID ASC \
+    LIMIT 5")
+
+
 @assert_no_database_error
-@perform_sql_txn
+@perform_sql_read(replica=True)
 def _mostAvailableDisks():
-    return f" \
-        SELECT public.disk.diskID FROM public.disk LEFT OUTER JOIN ( \
-             SELECT files_that_fit_on_disks.diskID, COUNT(*) FROM ( \
-                 SELECT DISTINCT diskID, fileID FROM public.file CROSS JOIN public.disk \
-                 WHERE size<=free_space \
-             ) files_that_fit_on_disks \
-             GROUP BY diskID \
-        ) num_files_addable_to_disk ON public.disk.diskID = num_files_addable_to_disk.diskID \
-        ORDER BY count DESC NULLS LAST, speed DESC NULLS LAST, diskID ASC NULLS LAST\
-        LIMIT 5; "
+    return MOST_AVAILABLE_DISKS.bind()
 
 def mostAvailableDisks() -> List[int]:
     most_available_disk = _mostAvailableDisks()
     if type(most_available_disk) == Status:
         return []
     _, most_available = most_available_disk
-    return [most_available[i]["diskID"] for i in range(most_available.size())]
+    return most_available.column("diskID")
 
 # ----------------------------------------
 
 
+# The target's disks are read once; each other file is counted with one grouped pass over the (diskID, fileID)
+# index, and is close when it shares at least half of them. A file on no disk is close to every other file
+# (count 0), so then the 10 lowest IDs are the answer.
+CLOSE_FILES = Connector.Statement("filez_close_files", " \
+    WITH target_disks AS ( \
+        SELECT diskID FROM public.file_on_disk \
+        WHERE fileID = $1 \
+    ) \
+    SELECT fileID FROM ( \
+        SELECT fileID, count FROM ( \
+            SELECT others.fileID, COUNT(*) AS count FROM target_disks \
+            INNER JOIN public.file_on_disk AS others ON others.diskID = target_disks.diskID \
+            WHERE others.fileID <> $1 \
+            GROUP BY others.fileID \
+            HAVING 2 * COUNT(*) >= (SELECT COUNT(*) FROM target_disks) \
+        ) colocated \
+        UNION ALL \
+        ( \
+            SELECT fileID, 0 FROM public.file \
+            WHERE fileID <> $1 AND NOT EXISTS (SELECT * FROM target_disks) \
+            ORDER BY fileID ASC \
+            LIMIT 10 \
+        ) \
+        ORDER BY count DESC, fileID ASC \
+        LIMIT 10 \
+    ) closest \
+    ORDER BY fileID ASC")
+
+
 @assert_no_database_error
-@perform_sql_txn
+@perform_sql_read(replica=True)
 def _getCloseFiles(fileID: int):
-    return f" \
-        SELECT disordered_results.fileID FROM ( \
-            SELECT disordered_nonzero_unlimited_results.fileID, count FROM \
-                (SELECT * FROM ( \
-                    ( \
-                        SELECT fileID, count FROM public.file CROSS JOIN (SELECT 0 AS count) pointless_alias1 \
-                        WHERE NOT EXISTS ( \
-                            SELECT * FROM public.file_on_disk WHERE public.file_on_disk.fileID={fileID} \
-                        ) \
-                    ) \
-                    UNION \
-                    ( \
-                        SELECT fileID, COUNT(*) FROM public.file_on_disk \
-                        WHERE diskID IN ( \
-                            SELECT diskID FROM public.file_on_disk \
-                            WHERE fileID={fileID} \
-                        ) AND fileID != {fileID} \
-                        GROUP BY fileID \
-                        HAVING 2*COUNT(*) >=ALL ( \
-                            SELECT COUNT(*) FROM public.file_on_disk \
-                            WHERE fileID={fileID} \
-                        ) \
-                    ) \
-                ) pointless_alias2 \
-                ) disordered_nonzero_unlimited_results \
-            WHERE disordered_nonzero_unlimited_results.fileID != {fileID} \
-            ORDER BY count DESC, disordered_nonzero_unlimited_results.fileID ASC \
-            LIMIT 10 \
-        ) disordered_results \
-        ORDER BY disordered_results.fileID ASC \
-    ; "
+    return CLOSE_FILES.bind(*required_ids(fileID))
 
 def getCloseFiles(fileID: int) -> List[int]:
     result = _getCloseFiles(fileID)
     if type(result) == Status:
         return []
     _, closest_files = result
-    return [closest_files[i]["fileID"] for i in range(closest_files.size())]
+    return closest_files.column("fileID")
+
+
+# ----------------------------------------
+
+# getCloseFiles for many targets in one query: the placements of every target are joined with file_on_disk in a
+# single grouped pass, and the lowest file IDs (for targets on no disk) are read once for all of them
+CLOSE_FILES_MANY = Connector.Statement("filez_close_files_many", " \
+    WITH targets AS ( \
+        SELECT DISTINCT target FROM unnest($1::integer[]) AS target \
+    ), target_disks AS ( \
+        SELECT targets.target, public.file_on_disk.diskID FROM targets \
+        INNER JOIN public.file_on_disk ON public.file_on_disk.fileID = targets.target \
+    ), replicas AS ( \
+        SELECT target, COUNT(*) AS count FROM target_disks \
+        GROUP BY target \
+    ), colocated AS ( \
+        SELECT target_disks.target, others.fileID, COUNT(*) AS count FROM target_disks \
+        INNER JOIN public.file_on_disk AS others ON others.diskID = target_disks.diskID \
+        WHERE others.fileID <> target_disks.target \
+        GROUP BY target_disks.target, others.fileID \
+    ), lowest_files AS ( \
+        SELECT fileID FROM public.file \
+        ORDER BY fileID ASC \
+        LIMIT 11 \
+    ), ranked AS ( \
+        SELECT colocated.target, colocated.fileID, \
+            ROW_NUMBER() OVER (PARTITION BY colocated.target ORDER BY colocated.count DESC, colocated.fileID ASC) AS rank \
+        FROM colocated INNER JOIN replicas ON replicas.target = colocated.target \
+        WHERE 2 * colocated.count >= replicas.count \
+        UNION ALL \
+        SELECT targets.target, lowest_files.fileID, \
+            ROW_NUMBER() OVER (PARTITION BY targets.target ORDER BY lowest_files.fileID ASC) AS rank \
+        FROM targets INNER JOIN lowest_files ON lowest_files.fileID <> targets.target \
+        WHERE targets.target NOT IN (SELECT target FROM replicas) \
+    ) \
+    SELECT target, fileID FROM ranked \
+    WHERE rank <= 10 \
+    ORDER BY target ASC, fileID ASC")
+
+
+@assert_no_database_error
+@perform_sql_read
+def _getCloseFilesMany(fileIDs: List[int]):
+    return CLOSE_FILES_MANY.bind(fileIDs)
+
+def getCloseFilesMany(fileIDs: Iterable[int]) -> dict:
+    # {fileID: getCloseFiles(fileID)} for each of fileIDs
+    fileIDs = list(fileIDs)
+    closest = {fileID: [] for fileID in fileIDs}
+    if len(fileIDs) == 0:
+        return closest
+    result = _getCloseFilesMany(fileIDs)
+    if type(result) == Status:
+        return closest
+    _, close_files = result
+    for target, fileID in zip(close_files.column("target"), close_files.column("fileID")):
+        closest[target].append(fileID)
+    return closest
+
+
+# ----------------------------------------
+# Bulk reads: the entities with the given IDs as a batch (see Business.Batch), in ID order and without the IDs that
+# don't exist; an empty batch in case of a database error
+
+GET_FILES = Connector.Statement("filez_get_files", " \
+    SELECT fileID, type, size FROM public.file \
+    WHERE fileID = ANY($1::integer[]) \
+    ORDER BY fileID")
+GET_DISKS = Connector.Statement("filez_get_disks", " \
+    SELECT diskID, company, speed, free_space, cost FROM public.disk \
+    WHERE diskID = ANY($1::integer[]) \
+    ORDER BY diskID")
+GET_RAMS = Connector.Statement("filez_get_rams", " \
+    SELECT ramID, company, size FROM public.ram \
+    WHERE ramID = ANY($1::integer[]) \
+    ORDER BY ramID")
+
+
+def result_batch(batch_type, result):
+    if type(result) == Status:
+        return batch_type()
+    _, rows = result
+    return batch_type(**{name: rows.column(name, typecode) for name, typecode, _ in batch_type.attributes})
+
+
+@assert_no_database_error
+@perform_sql_read
+def _getFilesByIDs(fileIDs: List[int]):
+    return GET_FILES.bind(fileIDs)
+
+
+def getFilesByIDs(fileIDs: Iterable[int]) -> FileBatch:
+    return result_batch(FileBatch, _getFilesByIDs(list(fileIDs)))
+
+
+@assert_no_database_error
+@perform_sql_read
+def _getDisksByIDs(diskIDs: List[int]):
+    return GET_DISKS.bind(diskIDs)
+
+
+def getDisksByIDs(diskIDs: Iterable[int]) -> DiskBatch:
+    return result_batch(DiskBatch, _getDisksByIDs(list(diskIDs)))
+
+
+@assert_no_database_error
+@perform_sql_read
+def _getRAMsByIDs(ramIDs: List[int]):
+    return GET_RAMS.bind(ramIDs)
+
+
+def getRAMsByIDs(ramIDs: Iterable[int]) -> RAMBatch:
+    return result_batch(RAMBatch, _getRAMsByIDs(list(ramIDs)))
+
+
+# ----------------------------------------
+# Bulk exports for analysis: a whole table as {attribute: numpy array} (see DBConnector.fetch_columns for binary),
+# {} if it failed. They need numpy
+
+EXPORT_FILES = Connector.Statement("filez_export_files", " \
+    SELECT fileID, type, size FROM public.file \
+    ORDER BY fileID")
+EXPORT_DISKS = Connector.Statement("filez_export_disks", " \
+    SELECT diskID, company, speed, free_space, cost FROM public.disk \
+    ORDER BY diskID")
+EXPORT_PLACEMENTS = Connector.Statement("filez_export_placements", " \
+    SELECT fileID, diskID FROM public.file_on_disk \
+    ORDER BY fileID, diskID")
+
+
+def fetch_columns(conn, cmd):
+    (statement, params), binary = cmd
+    return conn.fetch_columns(statement, params=params, binary=binary)
+
+
+def export_columns(attributes, columns) -> dict:
+    if type(columns) == Status:
+        return {}
+    return dict(zip(attributes, columns.values()))
+
+
+@assert_no_database_error
+@perform_sql_read(execute=fetch_columns)
+def _exportFiles(binary=None):
+    return EXPORT_FILES.bind(), binary
+
+
+def exportFiles(binary=None) -> dict:
+    # {"fileID": ..., "type": ..., "size": ...}, in fileID order
+    return export_columns(("fileID", "type", "size"), _exportFiles(binary))
+
+
+@assert_no_database_error
+@perform_sql_read(execute=fetch_columns)
+def _exportDisks(binary=None):
+    return EXPORT_DISKS.bind(), binary
+
+
+def exportDisks(binary=None) -> dict:
+    # {"diskID": ..., "company": ..., "speed": ..., "free_space": ..., "cost": ...}, in diskID order
+    return export_columns(("diskID", "company", "speed", "free_space", "cost"), _exportDisks(binary))
+
+
+@assert_no_database_error
+@perform_sql_read(execute=fetch_columns)
+def _exportPlacements(binary=None):
+    return EXPORT_PLACEMENTS.bind(), binary
+
+
+def exportPlacements(binary=None) -> dict:
+    # {"fileID": ..., "diskID": ...}, a pair per file on a disk
+    return export_columns(("fileID", "diskID"), _exportPlacements(binary))
+
+
+# The public Solution functions that never write (their queries go through perform_sql_read)
+READ_ONLY_FUNCTIONS = frozenset(read_only_functions)
+
+
+# ----------------------------------------
+# Backends: the functions of BACKEND_API run on PostgreSQL ("postgres", the functions above), on an embedded SQLite
+# database ("sqlite", the same functions on Connector.SQLiteConnector, see Utility.SQLiteDialect) or on the
+# pure-Python in-memory engine of MemorySolution ("memory"). useBackend rebinds them in this module, so callers must
+# look them up on it (Solution.addFile(...)) rather than import them by name before switching. The backend of a
+# process starts as FILEZ_BACKEND says, postgres by default. The entity caches are emptied on every switch; the
+# invalidation listener is PostgreSQL's
+
+BACKEND_API = (
+    "createTables", "clearTables", "dropTables", "session",
+    "addFile", "getFileByID", "deleteFile", "addDisk", "getDiskByID", "deleteDisk", "addRAM", "getRAMByID",
+    "deleteRAM", "addDiskAndFile", "addFiles", "addDisks", "addRAMs",
+    "addFileToDisk", "placeFiles", "addFilesToDisk", "removeFileFromDisk", "addRAMToDisk", "removeRAMFromDisk",
+    "averageFileSizeOnDisk", "diskTotalRAM", "getCostForType", "getCostForTypes",
+    "getFilesCanBeAddedToDisk", "getFilesCanBeAddedToDiskAndRAM", "isCompanyExclusive", "isCompanyExclusiveMany",
+    "getConflictingDisks", "mostAvailableDisks", "getCloseFiles", "getCloseFilesMany",
+    "getFilesByIDs", "getDisksByIDs", "getRAMsByIDs", "exportFiles", "exportDisks", "exportPlacements",
+)
+BACKEND_MODULES = {"memory": "MemorySolution"}
+BACKEND_ENV_VAR = "FILEZ_BACKEND"
+
+sql_api = {name: globals()[name] for name in BACKEND_API}
+backend = "postgres"
+
+
+def useBackend(name: str):
+    global backend, engine
+    if name in Connector.CONNECTORS:
+        functions = sql_api
+        engine = name
+    elif name in BACKEND_MODULES:
+        module = importlib.import_module(BACKEND_MODULES[name])
+        functions = {function: getattr(module, function) for function in BACKEND_API}
+    else:
+        raise ValueError("unknown backend: " + str(name))
+    globals().update(functions)
+    backend = name
+    clear_caches()
+
+
+def currentBackend() -> str:
+    return backend
+
+
+useBackend(os.environ.get(BACKEND_ENV_VAR, "postgres"))
@@ -0,0 +1,235 @@
+import random
+import unittest
+import Solution
+from Utility.Status import Status
+from Tests.abstractTest import AbstractTest
+from Business.File import File
+from Business.RAM import RAM
+from Business.Disk import Disk
+
+# table maintained by triggers -> (its rows, the same rows recomputed from the base tables)
+DISK_AGGREGATES = {
+    "disk_stats": (
+        "SELECT diskID, file_count, file_size_sum, ram_size_sum FROM public.disk_stats",
+        "SELECT diskID, \
+            (SELECT COUNT(*) FROM public.all_files_on_disk WHERE diskID = public.disk.diskID), \
+            (SELECT COALESCE(SUM(size), 0) FROM public.all_files_on_disk WHERE diskID = public.disk.diskID), \
+            (SELECT COALESCE(SUM(size), 0) FROM public.all_rams_on_disk WHERE diskID = public.disk.diskID) \
+        FROM public.disk"),
+    "disk_ram_company": (
+        "SELECT diskID, company, ram_count FROM public.disk_ram_company",
+        "SELECT diskID, company, COUNT(*) FROM public.all_rams_on_disk GROUP BY diskID, company"),
+}
+
+CONFLICTS = {
+    "file_replicas": (
+        "SELECT fileID, replica_count FROM public.file_replicas",
+        "SELECT fileID, COUNT(*) FROM public.file_on_disk GROUP BY fileID"),
+    "disk_conflicts": (
+        "SELECT diskID, shared_file_count FROM public.disk_conflicts",
+        "SELECT diskID, COUNT(*) FROM public.file_on_disk placement \
+        WHERE EXISTS ( \
+            SELECT * FROM public.file_on_disk other \
+            WHERE other.fileID = placement.fileID AND other.diskID <> placement.diskID \
+        ) \
+        GROUP BY diskID"),
+}
+
+# a type is kept at 0 when its last placement goes, only the non-zero totals are compared
+TYPE_COSTS = {
+    "type_cost": (
+        "SELECT type, total_cost FROM public.type_cost WHERE total_cost <> 0",
+        "SELECT type, SUM(cost::bigint * size) FROM public.file_on_disk \
+        INNER JOIN public.file ON public.file.fileID = public.file_on_disk.fileID \
+        INNER JOIN public.disk ON public.disk.diskID = public.file_on_disk.diskID \
+        GROUP BY type \
+        HAVING SUM(cost::bigint * size) <> 0"),
+}
+
+IDS = range(1, 7)
+COMPANIES = ("DELL", "HP", "Kingston")
+
+
+def select(query):
+    with Solution.transaction() as conn:
+        _, result = conn.execute(query)
+    return sorted(result.rows)
+
+
+def update(query, *params):
+    with Solution.transaction() as conn:
+        conn.execute(query, params=params)
+
+
+def free_id(table):
+    # an ID no row of the table has
+    return max([row[0] for row in select(f"SELECT {table}ID FROM public.{table}")], default=0) + 1
+
+
+def random_step(rng):
+    # a random write: a Solution call, or an update of a row the triggers have to follow
+    fileID, diskID, ramID = rng.choice(IDS), rng.choice(IDS), rng.choice(IDS)
+    file = File(fileID, rng.choice(("wav", "mp3")), rng.randint(0, 20))
+    return rng.choice([
+        lambda: Solution.addFile(file),
+        lambda: Solution.deleteFile(Solution.getFileByID(fileID)),
+        lambda: Solution.addDisk(Disk(diskID, rng.choice(COMPANIES), 10, 1000, rng.randint(1, 5))),
+        lambda: Solution.deleteDisk(diskID),
+        lambda: Solution.addRAM(RAM(ramID, rng.choice(COMPANIES), rng.randint(1, 20))),
+        lambda: Solution.deleteRAM(ramID),
+        lambda: Solution.addFileToDisk(Solution.getFileByID(fileID), diskID),
+        lambda: Solution.placeFiles([(Solution.getFileByID(fileID), diskID) for fileID, diskID in
+                                     zip(rng.sample(IDS, 3), rng.sample(IDS, 3))]),
+        lambda: Solution.removeFileFromDisk(Solution.getFileByID(fileID), diskID),
+        lambda: Solution.addRAMToDisk(ramID, diskID),
+        lambda: Solution.removeRAMFromDisk(ramID, diskID),
+        lambda: update("UPDATE public.file SET size = %s WHERE fileID = %s", rng.randint(0, 20), fileID),
+        lambda: update("UPDATE public.file SET type = %s WHERE fileID = %s", rng.choice(("wav", "mp3")), fileID),
+        lambda: update("UPDATE public.disk SET cost = %s WHERE diskID = %s", rng.randint(1, 5), diskID),
+        lambda: update("UPDATE public.ram SET size = %s WHERE ramID = %s", rng.randint(1, 20), ramID),
+        lambda: update("UPDATE public.ram SET company = %s WHERE ramID = %s", rng.choice(COMPANIES), ramID),
+        lambda: update("UPDATE public.file SET fileID = %s WHERE fileID = %s", free_id("file"), fileID),
+        lambda: update("UPDATE public.disk SET diskID = %s WHERE diskID = %s", free_id("disk"), diskID),
+        lambda: update("UPDATE public.ram SET ramID = %s WHERE ramID = %s", free_id("ram"), ramID),
+    ])
+
+
+class Test(AbstractTest):
+    def assertMaintained(self, tables, msg) -> None:
+        for table, (maintained, recomputed) in tables.items():
+            self.assertListEqual(select(recomputed), select(maintained), f"{table} after {msg}")
+
+    def test_DiskAggregates(self) -> None:
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 100, 1)), "Should work")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(2, "HP", 10, 100, 1)), "Should work")
+        for fileID, size in ((1, 10), (2, 20), (3, 30)):
+            self.assertEqual(Status.OK, Solution.addFile(File(fileID, "wav", size)), "Should work")
+        for ramID, company in ((1, "DELL"), (2, "HP"), (3, "HP")):
+            self.assertEqual(Status.OK, Solution.addRAM(RAM(ramID, company, 8 * ramID)), "Should work")
+        self.assertMaintained(DISK_AGGREGATES, "adding disks")
+
+        self.assertEqual(Status.OK, Solution.addFileToDisk(File(1, "wav", 10), 1), "Should work")
+        self.assertListEqual([Status.OK] * 3, Solution.placeFiles([(File(1, "wav", 10), 2), (File(2, "wav", 20), 1),
+                                                                   (File(3, "wav", 30), 1)]), "Should work")
+        for ramID, diskID in ((1, 1), (2, 1), (3, 1), (3, 2)):
+            self.assertEqual(Status.OK, Solution.addRAMToDisk(ramID, diskID), "Should work")
+        self.assertMaintained(DISK_AGGREGATES, "adding files and RAMs to disks")
+
+        self.assertEqual(Status.OK, Solution.removeFileFromDisk(File(3, "wav", 30), 1), "Should work")
+        self.assertEqual(Status.OK, Solution.removeRAMFromDisk(2, 1), "Should work")
+        self.assertMaintained(DISK_AGGREGATES, "removing files and RAMs from disks")
+
+        update("UPDATE public.file SET size = 15 WHERE fileID = 1")
+        self.assertEqual([(1, 2, 35, 32), (2, 1, 15, 24)],
+                         select(DISK_AGGREGATES["disk_stats"][0]), "The file's disks have its new size")
+        update("UPDATE public.ram SET size = 4, company = 'DELL' WHERE ramID = 3")
+        self.assertEqual([(1, 2, 35, 12), (2, 1, 15, 4)],
+                         select(DISK_AGGREGATES["disk_stats"][0]), "The RAM's disks have its new size")
+        self.assertEqual([(1, "DELL", 2), (2, "DELL", 1)],
+                         select(DISK_AGGREGATES["disk_ram_company"][0]), "The RAM's disks have its new company")
+        self.assertMaintained(DISK_AGGREGATES, "updating files and RAMs")
+
+        update("UPDATE public.file SET fileID = 10, size = 5 WHERE fileID = 1")
+        update("UPDATE public.disk SET diskID = 20 WHERE diskID = 2")
+        update("UPDATE public.ram SET ramID = 30, size = 6, company = 'HP' WHERE ramID = 3")
+        self.assertMaintained(DISK_AGGREGATES, "changing IDs")
+
+        self.assertEqual(Status.OK, Solution.deleteFile(File(10, "wav", 5)), "Should work")
+        self.assertEqual(Status.OK, Solution.deleteRAM(30), "Should work")
+        self.assertMaintained(DISK_AGGREGATES, "deleting files and RAMs on disks")
+        self.assertEqual(Status.OK, Solution.deleteDisk(1), "Should work")
+        self.assertMaintained(DISK_AGGREGATES, "deleting a disk")
+        self.assertEqual([(20, 0, 0, 0)], select(DISK_AGGREGATES["disk_stats"][0]), "Should work")
+
+    def test_Conflicts(self) -> None:
+        for diskID in (1, 2, 3):
+            self.assertEqual(Status.OK, Solution.addDisk(Disk(diskID, "DELL", 10, 100, 1)), "Should work")
+        for fileID in (1, 2, 3):
+            self.assertEqual(Status.OK, Solution.addFile(File(fileID, "wav", 10)), "Should work")
+        self.assertListEqual([Status.OK] * 5, Solution.placeFiles([(File(1, "wav", 10), 1), (File(1, "wav", 10), 2),
+                                                                   (File(2, "wav", 10), 2), (File(2, "wav", 10), 3),
+                                                                   (File(3, "wav", 10), 3)]), "Should work")
+        self.assertEqual([(1, 1), (2, 2), (3, 1)], select(CONFLICTS["disk_conflicts"][0]), "Should work")
+        self.assertMaintained(CONFLICTS, "adding files to disks")
+
+        self.assertEqual(Status.OK, Solution.addFileToDisk(File(1, "wav", 10), 3), "A third replica")
+        self.assertEqual(Status.OK, Solution.removeFileFromDisk(File(2, "wav", 10), 2), "Should work")
+        self.assertEqual([(1, 1), (2, 1), (3, 1)], select(CONFLICTS["disk_conflicts"][0]), "Should work")
+        self.assertMaintained(CONFLICTS, "adding and removing replicas")
+
+        update("UPDATE public.file SET fileID = 10 WHERE fileID = 1")
+        self.assertMaintained(CONFLICTS, "changing the ID of a file on several disks")
+        update("UPDATE public.disk SET diskID = 30 WHERE diskID = 3")
+        self.assertEqual([(1, 1), (2, 1), (30, 1)], select(CONFLICTS["disk_conflicts"][0]), "Renamed")
+        self.assertMaintained(CONFLICTS, "changing the ID of a disk")
+
+        self.assertEqual(Status.OK, Solution.deleteDisk(2), "Should work")
+        self.assertMaintained(CONFLICTS, "deleting a disk")
+        self.assertEqual(Status.OK, Solution.deleteFile(File(10, "wav", 10)), "Should work")
+        self.assertMaintained(CONFLICTS, "deleting a file on several disks")
+        self.assertEqual([], select(CONFLICTS["disk_conflicts"][0]), "No file is shared anymore")
+
+    def test_ConflictsRandom(self) -> None:
+        rng = random.Random(11)
+        for step in range(300):
+            random_step(rng)()
+            self.assertMaintained(CONFLICTS, f"step {step}")
+
+    def test_TypeCosts(self) -> None:
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 100, 2)), "Should work")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(2, "DELL", 10, 100, 3)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(1, "wav", 5)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(2, "mp3", 4)), "Should work")
+        self.assertListEqual([Status.OK] * 3, Solution.placeFiles([(File(1, "wav", 5), 1), (File(1, "wav", 5), 2),
+                                                                   (File(2, "mp3", 4), 2)]), "Should work")
+        self.assertMaintained(TYPE_COSTS, "adding files to disks")
+
+        update("UPDATE public.file SET size = 6 WHERE fileID = 1")
+        self.assertEqual([("mp3", 12), ("wav", 30)], select(TYPE_COSTS["type_cost"][0]), "Its new size")
+        update("UPDATE public.file SET type = 'mp3', size = 1 WHERE fileID = 1")
+        self.assertEqual([("mp3", 17)], select(TYPE_COSTS["type_cost"][0]), "Its new type")
+        update("UPDATE public.disk SET cost = 4 WHERE diskID = 2")
+        self.assertMaintained(TYPE_COSTS, "updating files and disks")
+
+        update("UPDATE public.file SET fileID = 10 WHERE fileID = 1")
+        update("UPDATE public.disk SET diskID = 20 WHERE diskID = 2")
+        self.assertMaintained(TYPE_COSTS, "changing IDs")
+        self.assertEqual(Status.OK, Solution.removeFileFromDisk(File(10, "mp3", 1), 1), "Should work")
+        self.assertEqual(Status.OK, Solution.deleteDisk(20), "Should work")
+        self.assertMaintained(TYPE_COSTS, "removing files and deleting disks")
+
+    def test_TypeCostsLarge(self) -> None:
+        # cost * size beyond an integer's range
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 2_000_000_000, 100000)), "Should work")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(2, "DELL", 10, 2_000_000_000, 100000)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(1, "wav", 100000)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(2, "wav", 100000)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFileToDisk(File(1, "wav", 100000), 1), "Should work")
+        self.assertListEqual([Status.OK], Solution.placeFiles([(File(2, "wav", 100000), 2)]), "Should work")
+        self.assertEqual(20_000_000_000, Solution.getCostForType("wav"), "Should work")
+        self.assertEqual({"wav": 20_000_000_000}, Solution.getCostForTypes(["wav"]), "Should work")
+        self.assertMaintained(TYPE_COSTS, "adding files to disks")
+
+        update("UPDATE public.disk SET cost = 200000 WHERE diskID = 2")
+        self.assertEqual(30_000_000_000, Solution.getCostForType("wav"), "Its new cost")
+        self.assertEqual(Status.OK, Solution.removeFileFromDisk(File(1, "wav", 100000), 1), "Should work")
+        self.assertEqual(Status.OK, Solution.deleteFile(File(2, "wav", 100000)), "Should work")
+        self.assertMaintained(TYPE_COSTS, "removing and deleting files")
+        self.assertEqual(0, Solution.getCostForType("wav"), "Should work")
+
+    def test_TypeCostsRandom(self) -> None:
+        rng = random.Random(14)
+        for step in range(300):
+            random_step(rng)()
+            self.assertMaintained(TYPE_COSTS, f"step {step}")
+
+    def test_DiskAggregatesRandom(self) -> None:
+        rng = random.Random(10)
+        for step in range(300):
+            random_step(rng)()
+            self.assertMaintained(DISK_AGGREGATES, f"step {step}")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
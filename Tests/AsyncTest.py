@@ -0,0 +1,161 @@
+import asyncio
+import unittest
+import AsyncSolution
+import Solution
+from Utility.AsyncDBConnector import AsyncDBConnector
+from Utility.Status import Status
+from Tests.abstractTest import AbstractTest
+from Business.File import File
+from Business.RAM import RAM
+from Business.Disk import Disk
+from Business.FileBatch import FileBatch
+from Utility import Columns
+
+
+def run(coroutine):
+    # each test runs in an event loop of its own, whose pool is closed before it ends
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await AsyncSolution.closePool()
+
+    return asyncio.run(main())
+
+
+class Test(AbstractTest):
+    def test_Statuses(self) -> None:
+        async def scenario():
+            self.assertEqual(Status.OK, await AsyncSolution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+            self.assertEqual(Status.ALREADY_EXISTS, await AsyncSolution.addDisk(Disk(1, "DELL", 10, 10, 10)),
+                             "Same ID")
+            self.assertEqual(Status.BAD_PARAMS, await AsyncSolution.addFile(File(1, "wav", -1)), "Bad size")
+            self.assertEqual(Status.BAD_PARAMS, await AsyncSolution.addFile(File(1, None, 1)), "No type")
+            self.assertEqual(Status.ERROR, await AsyncSolution.addFile(File(1, "wav", 2 ** 40)), "Out of range")
+            self.assertEqual(Status.OK, await AsyncSolution.addFile(File(1, "wav", 4)), "Should work")
+            self.assertEqual(Status.NOT_EXISTS, await AsyncSolution.addFileToDisk(File(1, "wav", 4), 2), "No disk")
+            self.assertEqual(Status.OK, await AsyncSolution.addFileToDisk(File(1, "wav", 4), 1), "Should work")
+            self.assertEqual(Status.ALREADY_EXISTS, await AsyncSolution.addFileToDisk(File(1, "wav", 4), 1),
+                             "Already on the disk")
+            self.assertEqual(Status.OK, await AsyncSolution.addRAM(RAM(1, "HP", 8)), "Should work")
+            self.assertEqual(Status.OK, await AsyncSolution.addRAMToDisk(1, 1), "Should work")
+            self.assertEqual(Status.NOT_EXISTS, await AsyncSolution.removeRAMFromDisk(1, 2), "Not on the disk")
+
+            disk = await AsyncSolution.getDiskByID(1)
+            self.assertEqual(6, disk.getFreeSpace(), "Should work")
+            self.assertEqual(Disk.badDisk().getDiskID(), (await AsyncSolution.getDiskByID(2)).getDiskID(), "No disk")
+            self.assertEqual("wav", (await AsyncSolution.getFileByID(1)).getType(), "Should work")
+            self.assertEqual(8, (await AsyncSolution.getRAMByID(1)).getSize(), "Should work")
+            self.assertEqual(4.0, await AsyncSolution.averageFileSizeOnDisk(1), "Should work")
+            self.assertEqual(8, await AsyncSolution.diskTotalRAM(1), "Should work")
+            self.assertEqual(40, await AsyncSolution.getCostForType("wav"), "Should work")
+            self.assertFalse(await AsyncSolution.isCompanyExclusive(1), "HP RAM on a DELL disk")
+            self.assertListEqual([1], await AsyncSolution.mostAvailableDisks(), "Should work")
+            self.assertEqual(Status.NOT_EXISTS, await AsyncSolution.deleteDisk(2), "No disk")
+            self.assertEqual(Status.OK, await AsyncSolution.deleteFile(File(1, "wav", 4)), "Should work")
+            self.assertEqual(10, (await AsyncSolution.getDiskByID(1)).getFreeSpace(), "Space is given back")
+
+        run(scenario())
+
+    def test_ManyConcurrentCalls(self) -> None:
+        AsyncDBConnector.configure_pool(maxconn=5)
+        try:
+            async def scenario():
+                statuses = await asyncio.gather(*(AsyncSolution.addFile(File(i, "wav", i)) for i in range(1, 1001)))
+                self.assertListEqual([Status.OK] * 1000, list(statuses), "Should work")
+                files = await asyncio.gather(*(AsyncSolution.getFileByID(i) for i in range(1, 1001)))
+                self.assertListEqual(list(range(1, 1001)), [file.getSize() for file in files], "Should work")
+                duplicates = await asyncio.gather(*(AsyncSolution.addFile(File(1, "wav", 1)) for _ in range(50)))
+                self.assertListEqual([Status.ALREADY_EXISTS] * 50, list(duplicates), "Same ID")
+
+            run(scenario())
+        finally:
+            AsyncDBConnector.configure_pool(maxconn=10)
+
+    def test_Bulk(self) -> None:
+        async def scenario():
+            self.assertListEqual([Status.OK, Status.BAD_PARAMS, Status.ALREADY_EXISTS, Status.ERROR],
+                                 await AsyncSolution.addFiles([File(1, "wav", 1), File(2, "wav", -1),
+                                                               File(1, "mp3", 1), File(3, "wav", 2 ** 40)]),
+                                 "Same statuses as addFile")
+            self.assertListEqual([Status.OK], await AsyncSolution.addDisks([Disk(1, "DELL", 10, 10, 10)]),
+                                 "Should work")
+            self.assertListEqual([Status.OK, Status.ALREADY_EXISTS, Status.NOT_EXISTS],
+                                 await AsyncSolution.placeFiles([(File(1, "wav", 1), 1), (File(1, "wav", 1), 1),
+                                                                 (File(2, "wav", 1), 1)]),
+                                 "Same statuses as addFileToDisk")
+            self.assertEqual(9, (await AsyncSolution.getDiskByID(1)).getFreeSpace(), "Should work")
+            files = FileBatch(fileID=[4, 4], type=["wav", "wav"], size=[1, 1])
+            self.assertListEqual([Status.OK, Status.ALREADY_EXISTS], await AsyncSolution.addFiles(files), "Batches too")
+            self.assertEqual(Solution.getFilesByIDs([1, 4]), await AsyncSolution.getFilesByIDs([1, 4]), "Should work")
+
+        run(scenario())
+
+    def test_Session(self) -> None:
+        async def scenario():
+            async with AsyncSolution.session() as s:
+                self.assertEqual(Status.OK, await s.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+                self.assertEqual(Status.ALREADY_EXISTS, await s.addDisk(Disk(1, "DELL", 10, 10, 10)), "Same ID")
+                self.assertEqual(Status.OK, await AsyncSolution.addFile(File(1, "wav", 4)), "Should work")
+                self.assertEqual(Status.OK, await s.addFileToDisk(File(1, "wav", 4), 1), "Should work")
+                self.assertEqual(6, (await s.getDiskByID(1)).getFreeSpace(), "The session sees its own writes")
+                self.assertEqual(Disk.badDisk().getDiskID(), Solution.getDiskByID(1).getDiskID(),
+                                 "Nothing is committed before the session ends")
+            self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "Committed when the session ends")
+
+            with self.assertRaises(RuntimeError):
+                async with AsyncSolution.session() as s:
+                    self.assertEqual(Status.OK, await s.addDisk(Disk(2, "DELL", 10, 10, 10)), "Should work")
+                    raise RuntimeError()
+            self.assertEqual(Disk.badDisk().getDiskID(), (await AsyncSolution.getDiskByID(2)).getDiskID(),
+                             "Rolled back")
+
+        run(scenario())
+
+    def test_NestedSession(self) -> None:
+        async def outside():
+            return AsyncSolution.current_session()
+
+        async def scenario():
+            pending = asyncio.ensure_future(outside())  # started before the session, so never in it
+            async with AsyncSolution.session() as s:
+                self.assertEqual(Status.OK, await s.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+                with self.assertRaises(RuntimeError):
+                    async with AsyncSolution.session() as inner:
+                        self.assertIs(s, inner.outer, "Should work")
+                        self.assertEqual(Status.OK, await inner.addDisk(Disk(2, "DELL", 10, 10, 10)), "Should work")
+                        raise RuntimeError()
+                self.assertIs(s, AsyncSolution.current_session(), "The outer session is current again")
+                self.assertEqual(None, await pending, "Other tasks are not in the session")
+                self.assertIs(s, await asyncio.ensure_future(outside()), "Tasks started inside inherit it")
+            self.assertEqual(None, AsyncSolution.current_session(), "Should work")
+            self.assertEqual(1, (await AsyncSolution.getDiskByID(1)).getDiskID(), "The outer session committed")
+            self.assertEqual(Disk.badDisk().getDiskID(), (await AsyncSolution.getDiskByID(2)).getDiskID(),
+                             "The inner session was rolled back")
+
+        run(scenario())
+
+    def test_SharedCache(self) -> None:
+        Solution.configureEntityCache()
+        self.addCleanup(Solution.configureEntityCache, maxsize=0)
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(1, "wav", 4)), "Should work")
+        self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Cached")
+        self.assertEqual(Status.OK, run(AsyncSolution.addFileToDisk(File(1, "wav", 4), 1)), "Should work")
+        self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "The async write invalidates the entry")
+
+    @unittest.skipIf(Columns.numpy is None, "numpy is not installed")
+    def test_Exports(self) -> None:
+        Solution.addFiles([File(i, "wav" if i % 2 else "mp3", i) for i in range(1, 101)])
+        for binary in (None, False, True):
+            files = run(AsyncSolution.exportFiles(binary=binary))
+            expected = Solution.exportFiles(binary=binary)
+            self.assertListEqual(list(expected), list(files), "Same attributes as Solution")
+            for name in expected:
+                self.assertListEqual(expected[name].tolist(), files[name].tolist(), "Same values as Solution")
+        self.assertListEqual([], run(AsyncSolution.exportPlacements())["diskID"].tolist(), "No placements")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
@@ -0,0 +1,83 @@
+import unittest
+import Solution
+from Utility.Status import Status
+from Utility import Columns
+from Tests.abstractTest import AbstractTest
+from Business.File import File
+from Business.RAM import RAM
+from Business.Disk import Disk
+from Business.FileBatch import FileBatch
+from Business.RAMBatch import RAMBatch
+from Business.DiskBatch import DiskBatch
+
+
+class Test(AbstractTest):
+    def test_Slots(self) -> None:
+        for entity in (File(1, "wav", 10), Disk(1, "DELL", 10, 10, 10), RAM(1, "DELL", 10)):
+            with self.assertRaises(AttributeError):
+                entity.extra = 1
+        file = File(1, "wav", 10)
+        file.setSize(20)
+        self.assertEqual(20, file.getSize(), "Same getters and setters")
+
+    def test_Batch(self) -> None:
+        files = FileBatch.of([File(1, "wav", 10), File(2, "mp3", 20)])
+        files.append(File(3, "wav", 30))
+        self.assertEqual(3, len(files), "Should work")
+        self.assertListEqual([2, "mp3", 20], [files[1].getFileID(), files[1].getType(), files[1].getSize()],
+                             "A File when read by index")
+        self.assertListEqual([1, 2, 3], [file.getFileID() for file in files], "Iterable")
+        self.assertListEqual([10, 20, 30], files.column("size").tolist(), "Stored in an array")
+        self.assertListEqual([(1, "wav", 10)], list(FileBatch.rows_of([File(1, "wav", 10)])), "Rows of Files")
+        self.assertEqual(files, FileBatch(fileID=[1, 2, 3], type=["wav", "mp3", "wav"], size=[10, 20, 30]),
+                         "Made from columns")
+        with self.assertRaises(TypeError):
+            files.extend([File(4, "wav", 40), File(None, "wav", 50)])
+        self.assertEqual(3, len(files), "Unchanged by a row it can't store")
+        with self.assertRaises(ValueError):
+            FileBatch(fileID=[1, 2], type=["wav"], size=[1, 2])
+        with self.assertRaises(TypeError):
+            FileBatch(ramID=[1])
+        self.assertEqual(0, len(DiskBatch()), "Empty")
+
+    @unittest.skipIf(Columns.numpy is None, "numpy is not installed")
+    def test_Numpy(self) -> None:
+        Solution.addFiles([File(i, "wav", i * 2) for i in range(1, 11)])
+        files = FileBatch(**Solution.exportFiles())
+        self.assertEqual(Solution.getFilesByIDs(range(1, 11)), files, "From an export")
+        columns = files.to_numpy()
+        self.assertEqual("int64", columns["size"].dtype, "Should work")
+        self.assertEqual(110, columns["size"].sum(), "Should work")
+        self.assertEqual(files, FileBatch(**columns), "Should work")
+
+    def test_AddBatches(self) -> None:
+        files = FileBatch(fileID=[1, 2, 1, 3], type=["wav", "wav", "mp3", "wav"], size=[1, -1, 1, 2 ** 40])
+        self.assertListEqual([Status.OK, Status.BAD_PARAMS, Status.ALREADY_EXISTS, Status.ERROR],
+                             Solution.addFiles(files), "Same statuses as addFiles")
+        self.assertListEqual([Status.OK], Solution.addDisks(DiskBatch.of([Disk(1, "DELL", 10, 10, 10)])),
+                             "Should work")
+        self.assertListEqual([Status.OK, Status.OK], Solution.addRAMs(RAMBatch(ramID=[1, 2], company=["HP", "HP"],
+                                                                                size=[5, 6])), "Should work")
+        self.assertListEqual([Status.OK, Status.NOT_EXISTS],
+                             Solution.addFilesToDisk(FileBatch(fileID=[1, 2], type=["wav", "wav"], size=[1, 1]), 1),
+                             "Same statuses as addFileToDisk")
+        self.assertEqual(9, Solution.getDiskByID(1).getFreeSpace(), "Should work")
+
+    def test_GetByIDs(self) -> None:
+        Solution.addFiles([File(2, "mp3", 20), File(1, "wav", 10)])
+        Solution.addDisks([Disk(1, "DELL", 10, 100, 10)])
+        Solution.addRAMs([RAM(1, "DELL", 10)])
+        files = Solution.getFilesByIDs([2, 3, 1])
+        self.assertEqual(FileBatch(fileID=[1, 2], type=["wav", "mp3"], size=[10, 20]), files,
+                         "In ID order, without missing IDs")
+        self.assertEqual(DiskBatch.of([Disk(1, "DELL", 10, 100, 10)]), Solution.getDisksByIDs([1]), "Should work")
+        self.assertEqual(RAMBatch.of([RAM(1, "DELL", 10)]), Solution.getRAMsByIDs([1, 2]), "Should work")
+        self.assertEqual(0, len(Solution.getFilesByIDs([])), "No IDs")
+        Solution.dropTables()
+        self.assertEqual(FileBatch(), Solution.getFilesByIDs([1]), "Empty in case of a database error")
+        Solution.createTables()
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
@@ -0,0 +1,125 @@
+import unittest
+import Solution
+from Utility.Status import Status
+from Tests.abstractTest import AbstractTest
+from Business.File import File
+from Business.RAM import RAM
+from Business.Disk import Disk
+from Utility import Columns
+
+
+class Test(AbstractTest):
+    def test_addFiles(self) -> None:
+        self.assertEqual(Status.OK, Solution.addFile(File(3, "wav", 10)), "Should work")
+        statuses = Solution.addFiles([File(1, "wav", 10),
+                                      File(2, "tab\tand\\backslash", 0),
+                                      File(3, "wav", 10),
+                                      File(4, "wav", -1),
+                                      File(5, None, 10),
+                                      File(1, "mp3", 10),
+                                      File(6, "wav", 1)], chunk_size=4)
+        self.assertListEqual([Status.OK, Status.OK, Status.ALREADY_EXISTS, Status.BAD_PARAMS,
+                              Status.BAD_PARAMS, Status.ALREADY_EXISTS, Status.OK], statuses,
+                             "Statuses as if the files were added one by one")
+        self.assertEqual("wav", Solution.getFileByID(1).getType(), "First occurrence wins")
+        self.assertEqual("tab\tand\\backslash", Solution.getFileByID(2).getType(), "Special chars survive COPY")
+        self.assertEqual(None, Solution.getFileByID(4).getFileID(), "Bad file not added")
+        self.assertListEqual([], Solution.addFiles([]), "Empty batch")
+
+    def test_addFilesValues(self) -> None:
+        Solution.BULK_INSERT_METHOD = "values"
+        try:
+            self.test_addFiles()
+        finally:
+            Solution.BULK_INSERT_METHOD = "copy"
+
+    def test_addFilesRepeated(self) -> None:
+        self.assertListEqual([Status.OK] * 2, Solution.addFiles([File(1, "wav", 10), File(2, "wav", 10)]),
+                             "Should work")
+        statuses = Solution.addFiles([File(1, "wav", 10),
+                                      File(3, "wav", -1),
+                                      File(3, "mp3", 3),
+                                      File(3, "wav", 30),
+                                      File(2, "wav", -1),
+                                      File(2, "wav", 10),
+                                      File(4, "wav", 4),
+                                      File(4, "wav", 2 ** 31)])
+        self.assertListEqual([Status.ALREADY_EXISTS, Status.BAD_PARAMS, Status.OK, Status.ALREADY_EXISTS,
+                              Status.BAD_PARAMS, Status.ALREADY_EXISTS, Status.OK, Status.ERROR], statuses,
+                             "Statuses as if the files were added one by one")
+        self.assertEqual("mp3", Solution.getFileByID(3).getType(), "First accepted occurrence wins")
+        self.assertListEqual([Status.ALREADY_EXISTS] * 4, Solution.addFiles([File(i, "wav", 1) for i in range(1, 5)]),
+                             "Existing files")
+
+    def test_addDisksAndRAMs(self) -> None:
+        self.assertListEqual([Status.OK, Status.BAD_PARAMS, Status.ALREADY_EXISTS],
+                             Solution.addDisks([Disk(1, "DELL", 10, 10, 10),
+                                                Disk(2, "DELL", 0, 10, 10),
+                                                Disk(1, "DELL", 10, 10, 10)]), "Should work")
+        self.assertListEqual([Status.OK, Status.OK, Status.BAD_PARAMS],
+                             Solution.addRAMs(RAM(i, "Kingston", 15 - 5 * i) for i in range(1, 4)),
+                             "Generators are accepted")
+        self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Should work")
+        self.assertEqual(10, Solution.getRAMByID(1).getSize(), "Should work")
+
+    def test_placeFiles(self) -> None:
+        self.assertListEqual([Status.OK, Status.OK], Solution.addDisks([Disk(1, "DELL", 10, 10, 10),
+                                                                        Disk(2, "DELL", 10, 5, 10)]), "Should work")
+        self.assertListEqual([Status.OK] * 4, Solution.addFiles([File(i, "wav", i) for i in range(1, 5)]),
+                             "Should work")
+        self.assertEqual(Status.OK, Solution.addFileToDisk(File(1, "wav", 1), 1), "Should work")
+        statuses = Solution.placeFiles([(File(1, "wav", 1), 1),
+                                        (File(2, "wav", 2), 1),
+                                        (File(2, "wav", 2), 1),
+                                        (File(3, "wav", 3), 2),
+                                        (File(4, "wav", 4), 2),
+                                        (File(9, "wav", 1), 1),
+                                        (File(4, "wav", 4), 9),
+                                        (File(4, "wav", 4), 1),
+                                        (File(3, "wav", 3), 1),
+                                        (File(4, "wav", 0), 1)])
+        self.assertListEqual([Status.ALREADY_EXISTS, Status.OK, Status.ALREADY_EXISTS, Status.OK, Status.BAD_PARAMS,
+                              Status.NOT_EXISTS, Status.NOT_EXISTS, Status.OK, Status.OK,
+                              Status.ALREADY_EXISTS], statuses,
+                             "Statuses as if the files were added one by one")
+        self.assertEqual(10 - 1 - 2 - 4 - 3, Solution.getDiskByID(1).getFreeSpace(), "One decrement per disk")
+        self.assertEqual(5 - 3, Solution.getDiskByID(2).getFreeSpace(), "One decrement per disk")
+        self.assertListEqual([Status.OK, Status.OK], Solution.addFilesToDisk([File(4, "wav", 0), File(2, "wav", 0)], 2),
+                             "Should work")
+        self.assertListEqual([1, 2], Solution.getConflictingDisks(), "Files 2, 3 and 4 are on both disks")
+
+    @unittest.skipIf(Columns.numpy is None, "numpy is not installed")
+    def test_exports(self) -> None:
+        self.assertListEqual([], Solution.exportFiles()["fileID"].tolist(), "No files")
+        Solution.addFiles([File(2, "mp3", 20), File(1, "wav", 10), File(3, "wav", 30)])
+        Solution.addDisks([Disk(1, "DELL", 10, 100, 10), Disk(2, "HP", 20, 100, 5)])
+        self.assertListEqual([Status.OK, Status.OK], Solution.placeFiles([(File(1, "wav", 10), 1),
+                                                                          (File(3, "wav", 30), 2)]), "Should work")
+        files = Solution.exportFiles()
+        self.assertListEqual(["fileID", "type", "size"], list(files), "Attributes of File")
+        self.assertListEqual([1, 2, 3], files["fileID"].tolist(), "Ordered by ID")
+        self.assertListEqual(["wav", "mp3", "wav"], files["type"].tolist(), "Should work")
+        self.assertListEqual([10, 20, 30], files["size"].tolist(), "Should work")
+        for binary in (False, True):
+            disks = Solution.exportDisks(binary=binary)
+            self.assertListEqual(["DELL", "HP"], disks["company"].tolist(), "Should work")
+            self.assertListEqual([90, 70], disks["free_space"].tolist(), "After the placements")
+            self.assertListEqual([10, 5], disks["cost"].tolist(), "Should work")
+        placements = Solution.exportPlacements()
+        self.assertListEqual([1, 3], placements["fileID"].tolist(), "Should work")
+        self.assertListEqual([1, 2], placements["diskID"].tolist(), "Should work")
+        Solution.dropTables()
+        self.assertDictEqual({}, Solution.exportFiles(), "{} in case of a database error")
+        Solution.createTables()
+
+    def test_addFilesWithoutTables(self) -> None:
+        Solution.dropTables()
+        self.assertListEqual([Status.ERROR, Status.ERROR],
+                             Solution.addFiles([File(1, "wav", 10), File(2, "wav", 10)]),
+                             "ERROR in case of a database error")
+        Solution.createTables()
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
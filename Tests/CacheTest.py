@@ -0,0 +1,85 @@
+import time
+import unittest
+import Solution
+import Utility.DBConnector as Connector
+from Utility.Status import Status
+from Tests.abstractTest import AbstractTest
+from Business.File import File
+from Business.RAM import RAM
+from Business.Disk import Disk
+
+
+class Test(AbstractTest):
+    def setUp(self) -> None:
+        super().setUp()
+        Solution.configureEntityCache(maxsize=2, ttl=None)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        Solution.configureEntityCache(maxsize=0)
+
+    def test_FreeSpaceNeverStale(self) -> None:
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(1, "wav", 3)), "Should work")
+        self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Should work")
+        self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Served from the cache")
+        self.assertEqual(1, Solution.entityCacheStats()["disk"]["hits"], "Second read is a hit")
+
+        self.assertEqual(Status.OK, Solution.addFileToDisk(File(1, "wav", 3), 1), "Should work")
+        self.assertEqual(7, Solution.getDiskByID(1).getFreeSpace(), "addFileToDisk invalidates the disk")
+        self.assertEqual(Status.OK, Solution.removeFileFromDisk(File(1, "wav", 3), 1), "Should work")
+        self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "removeFileFromDisk invalidates the disk")
+        self.assertListEqual([Status.OK], Solution.addFilesToDisk([File(1, "wav", 3)], 1), "Should work")
+        self.assertEqual(7, Solution.getDiskByID(1).getFreeSpace(), "addFilesToDisk invalidates the disk")
+        self.assertEqual(Status.OK, Solution.deleteFile(File(1, "wav", 3)), "Should work")
+        self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "deleteFile invalidates its disks")
+        self.assertEqual(None, Solution.getFileByID(1).getFileID(), "deleteFile invalidates the file")
+
+        self.assertEqual(Status.OK, Solution.deleteDisk(1), "Should work")
+        self.assertEqual(None, Solution.getDiskByID(1).getDiskID(), "deleteDisk invalidates the disk")
+
+    def test_EvictionAndCopies(self) -> None:
+        for ramID in range(1, 4):
+            self.assertEqual(Status.OK, Solution.addRAM(RAM(ramID, "Kingston", 10)), "Should work")
+            Solution.getRAMByID(ramID)
+        self.assertEqual(1, Solution.entityCacheStats()["ram"]["evictions"], "maxsize is 2")
+
+        ram = Solution.getRAMByID(3)
+        ram.setSize(20)
+        self.assertEqual(10, Solution.getRAMByID(3).getSize(), "Callers get their own object")
+        self.assertEqual(Status.OK, Solution.deleteRAM(3), "Should work")
+        self.assertEqual(None, Solution.getRAMByID(3).getRamID(), "deleteRAM invalidates the RAM")
+
+    def test_InvalidationFromAnotherProcess(self) -> None:
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+        self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Should work")
+        listener = Solution.startInvalidationListener()
+        try:
+            time.sleep(0.5)  # let it LISTEN
+            # a write that doesn't go through this process's Solution, like another worker's would
+            conn = Connector.DBConnector()
+            conn.execute("UPDATE public.disk SET free_space=3 WHERE diskID=1")
+            conn.commit()
+            conn.close()
+            deadline = time.monotonic() + 5
+            while Solution.getDiskByID(1).getFreeSpace() != 3 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(3, Solution.getDiskByID(1).getFreeSpace(), "NOTIFY invalidated the cached disk")
+        finally:
+            listener.stop()
+
+    def test_Disabled(self) -> None:
+        Solution.configureEntityCache(maxsize=0)  # as it is until configured
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+        self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Should work")
+        conn = Connector.DBConnector()
+        conn.execute("UPDATE public.disk SET free_space=3 WHERE diskID=1")
+        conn.commit()
+        conn.close()
+        self.assertEqual(3, Solution.getDiskByID(1).getFreeSpace(), "Another process's write is seen at once")
+        self.assertEqual(0, Solution.entityCacheStats()["disk"]["hits"], "Nothing is cached")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import Utility.DBConnector as Connector
+from Utility.Exceptions import DatabaseException
+
+DBConnector = Connector.DBConnector
+
+CONFIG = """[postgresql]
+host=localhost
+database={database}
+user=kiv
+password=qwe123
+port=5432
+"""
+
+
+class Test(unittest.TestCase):
+    # the tests change the environment and database.ini, the parameters are resolved again after each of them
+    def setUp(self) -> None:
+        self.addCleanup(DBConnector.reload_config)
+        environ = mock.patch.dict(os.environ)
+        environ.start()
+        self.addCleanup(environ.stop)
+        for name in (DBConnector.DSN_ENV_VAR, DBConnector.CONFIG_ENV_VAR, DBConnector.REPLICA_DSNS_ENV_VAR):
+            os.environ.pop(name, None)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, "database.ini")
+
+    def write_config(self, text) -> None:
+        with open(self.filename, "w") as file:
+            file.write(text)
+
+    def test_DsnOverride(self) -> None:
+        self.write_config(CONFIG.format(database="from_file"))
+        os.environ[DBConnector.CONFIG_ENV_VAR] = self.filename
+        os.environ[DBConnector.DSN_ENV_VAR] = "host=localhost dbname=from_env"
+        self.assertDictEqual({"dsn": "host=localhost dbname=from_env"}, DBConnector.reload_config(),
+                             "The DSN overrides database.ini")
+        self.assertEqual(None, DBConnector.get_replicas(), "No replicas from database.ini either")
+
+    def test_ConfigOverride(self) -> None:
+        self.write_config(CONFIG.format(database="from_file"))
+        os.environ[DBConnector.CONFIG_ENV_VAR] = self.filename
+        params = DBConnector.reload_config()
+        self.assertEqual("from_file", params["database"], "FILEZDB_CONFIG names the file")
+        self.assertEqual("5432", params["port"], "Should work")
+        self.assertIsNotNone(DBConnector.config_load_seconds, "Should work")
+
+    def test_ReloadConfig(self) -> None:
+        self.write_config(CONFIG.format(database="before"))
+        os.environ[DBConnector.CONFIG_ENV_VAR] = self.filename
+        self.assertEqual("before", DBConnector.reload_config()["database"], "Should work")
+        self.write_config(CONFIG.format(database="after"))
+        self.assertEqual("before", DBConnector.connection_params()["database"], "Resolved once")
+        self.assertEqual("after", DBConnector.reload_config()["database"], "The changed file is read again")
+        self.assertEqual("after", DBConnector.connection_params()["database"], "Should work")
+
+    def test_MissingConfig(self) -> None:
+        os.environ[DBConnector.CONFIG_ENV_VAR] = self.filename
+        with self.assertRaises(DatabaseException.database_ini_ERROR):
+            DBConnector.reload_config()
+        self.write_config("[mysql]\nhost=localhost\n")
+        with self.assertRaises(DatabaseException.database_ini_ERROR):
+            DBConnector.reload_config()
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
@@ -0,0 +1,176 @@
+import random
+import unittest
+import Solution
+from Tests import SimpleTestSharon
+from Utility.Status import Status
+from Utility import Columns
+from Tests.abstractTest import AbstractTest
+from Business.File import File
+from Business.RAM import RAM
+from Business.Disk import Disk
+from Business.Batch import Batch
+
+IDS = (1, 2, 3, 4, 5, 6, None, 0, 2 ** 31)  # the last three are rejected
+SIZES = (0, 1, 2, 5, 10, 20, None, -1, 2 ** 31)
+COMPANIES = ("DELL", "HP", None)
+TYPES = ("wav", "mp3", None)
+
+
+def comparable(result):
+    # a result of a Solution function, with entities and batches as their attributes
+    if isinstance(result, File):
+        return "File", result.getFileID(), result.getType(), result.getSize()
+    if isinstance(result, Disk):
+        return ("Disk", result.getDiskID(), result.getCompany(), result.getSpeed(), result.getFreeSpace(),
+                result.getCost())
+    if isinstance(result, RAM):
+        return "RAM", result.getRamID(), result.getCompany(), result.getSize()
+    if isinstance(result, Batch):
+        return type(result).__name__, list(result.rows())
+    if isinstance(result, dict):
+        return {key: comparable(value) for key, value in result.items()}
+    if hasattr(result, "tolist"):
+        return result.dtype.kind, [None if value != value else value for value in result.tolist()]  # NaN for NULL
+    return result
+
+
+def random_calls(rng, count):
+    # (function name, arguments) of a random workload over a few IDs, with some illegal values
+    def file():
+        return File(rng.choice(IDS), rng.choice(TYPES), rng.choice(SIZES))
+
+    def disk():
+        return Disk(rng.choice(IDS), rng.choice(COMPANIES), rng.choice(SIZES), rng.choice(SIZES + (50, 100)),
+                    rng.choice(SIZES))
+
+    calls = (
+        (8, lambda: ("addFile", file())),
+        (6, lambda: ("addDisk", disk())),
+        (4, lambda: ("addRAM", RAM(rng.choice(IDS), rng.choice(COMPANIES), rng.choice(SIZES)))),
+        (10, lambda: ("addFileToDisk", file(), rng.choice(IDS))),
+        (5, lambda: ("addRAMToDisk", rng.choice(IDS), rng.choice(IDS))),
+        (3, lambda: ("removeFileFromDisk", file(), rng.choice(IDS))),
+        (2, lambda: ("removeRAMFromDisk", rng.choice(IDS), rng.choice(IDS))),
+        (2, lambda: ("deleteFile", file())),
+        (1, lambda: ("deleteDisk", rng.choice(IDS))),
+        (1, lambda: ("deleteRAM", rng.choice(IDS))),
+        (1, lambda: ("addDiskAndFile", disk(), file())),
+        (2, lambda: ("addFiles", [file() for _ in range(3)])),
+        (2, lambda: ("placeFiles", [(file(), rng.choice(IDS)) for _ in range(3)])),
+        (1, lambda: ("addFilesToDisk", [file() for _ in range(3)], rng.choice(IDS))),
+        (2, lambda: ("getFileByID", rng.choice(IDS))),
+        (2, lambda: ("getDiskByID", rng.choice(IDS))),
+        (1, lambda: ("getRAMByID", rng.choice(IDS))),
+        (2, lambda: ("averageFileSizeOnDisk", rng.choice(IDS))),
+        (2, lambda: ("diskTotalRAM", rng.choice(IDS))),
+        (2, lambda: ("getCostForType", rng.choice(TYPES))),
+        (1, lambda: ("getCostForTypes", list(TYPES))),
+        (2, lambda: ("getFilesCanBeAddedToDisk", rng.choice(IDS))),
+        (2, lambda: ("getFilesCanBeAddedToDiskAndRAM", rng.choice(IDS))),
+        (2, lambda: ("isCompanyExclusive", rng.choice(IDS))),
+        (1, lambda: ("isCompanyExclusiveMany", list(IDS[:6]))),
+        (2, lambda: ("getConflictingDisks",)),
+        (2, lambda: ("mostAvailableDisks",)),
+        (3, lambda: ("getCloseFiles", rng.choice(IDS))),
+        (1, lambda: ("getCloseFilesMany", list(IDS[:7]))),
+        (1, lambda: ("getFilesByIDs", list(IDS[:7]))),
+        (1, lambda: ("getDisksByIDs", list(IDS[:7]))),
+    )
+    weights = [weight for weight, _ in calls]
+    return [rng.choices(calls, weights)[0][1]() for _ in range(count)]
+
+
+class Test(SimpleTestSharon.Test):
+    # SimpleTestSharon's tests, on the in-memory backend
+    backend = "memory"
+
+    def setUp(self) -> None:
+        Solution.useBackend(self.backend)
+        super().setUp()
+
+    def tearDown(self) -> None:
+        try:
+            super().tearDown()
+        finally:
+            Solution.useBackend("postgres")
+
+
+class ConformanceTest(AbstractTest):
+    # the same random calls on PostgreSQL and on the backend under test give the same results
+    backend = "memory"
+
+    def run_calls(self, backend, calls) -> list:
+        Solution.useBackend(backend)
+        try:
+            Solution.clearTables()
+            results = [comparable(getattr(Solution, name)(*args)) for name, *args in calls]
+            if Columns.numpy is not None:
+                results += [comparable(Solution.exportDisks()), comparable(Solution.exportPlacements())]
+            return results
+        finally:
+            Solution.useBackend("postgres")
+
+    def test_SameResults(self) -> None:
+        Solution.useBackend(self.backend)
+        Solution.createTables()
+        try:
+            for seed in range(3):
+                calls = random_calls(random.Random(seed), 300)
+                expected = self.run_calls("postgres", calls)
+                for (name, *args), postgres, actual in zip(calls, expected, self.run_calls(self.backend, calls)):
+                    self.assertEqual(postgres, actual, f"seed {seed}: {name}")
+        finally:
+            Solution.useBackend(self.backend)
+            Solution.dropTables()
+            Solution.useBackend("postgres")
+
+
+class SessionTest(unittest.TestCase):
+    backend = "memory"
+
+    def setUp(self) -> None:
+        Solution.useBackend(self.backend)
+        Solution.createTables()
+
+    def tearDown(self) -> None:
+        Solution.dropTables()
+        Solution.useBackend("postgres")
+
+    def test_Backend(self) -> None:
+        self.assertEqual(self.backend, Solution.currentBackend(), "Should work")
+        with self.assertRaises(ValueError):
+            Solution.useBackend("oracle")
+
+    def test_Session(self) -> None:
+        with Solution.session() as s:
+            self.assertEqual(Status.OK, s.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+            self.assertEqual(Status.OK, Solution.addFile(File(1, "wav", 4)), "Inside the block too")
+            self.assertEqual(Status.NOT_EXISTS, s.addFileToDisk(File(2, "wav", 4), 1), "Failed calls are undone")
+            self.assertEqual(Status.OK, s.addFileToDisk(File(1, "wav", 4), 1), "The session goes on")
+        self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "Committed")
+
+        with self.assertRaises(RuntimeError):
+            with Solution.session() as s:
+                s.deleteDisk(1)
+                with Solution.session() as inner:
+                    inner.addRAM(RAM(1, "HP", 10))
+                raise RuntimeError()
+        self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "Rolled back, cascades included")
+        self.assertEqual(4.0, Solution.averageFileSizeOnDisk(1), "Should work")
+        self.assertEqual(40, Solution.getCostForType("wav"), "Should work")
+        self.assertIsNone(Solution.getRAMByID(1).getRamID(), "The inner session is rolled back with it")
+
+        with Solution.session():
+            Solution.dropTables()
+            self.assertEqual(Status.ERROR, Solution.addFile(File(2, "wav", 1)), "Should work")
+            with self.assertRaises(RuntimeError):
+                with Solution.session():
+                    Solution.createTables()
+                    raise RuntimeError()
+            self.assertEqual(Status.OK, Solution.createTables(), "Should work")
+        self.assertIsNone(Solution.getFileByID(1).getFileID(), "Recreated empty")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
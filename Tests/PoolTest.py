@@ -0,0 +1,260 @@
+import threading
+import time
+import unittest
+from psycopg2 import extensions
+from Utility.ConnectionPool import ConnectionPool
+from Utility.Exceptions import DatabaseException
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        self.connection.pings += 1
+        if self.connection.ping_gate is not None:
+            self.connection.ping_gate.wait()
+        if self.connection.dead:
+            raise Exception("server closed the connection unexpectedly")
+
+
+class FakeConnection:
+    # just enough of a psycopg2 connection for the pool
+    def __init__(self):
+        self.closed = False
+        self.dead = False
+        self.autocommit = False
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+        self.pings = 0
+        self.ping_gate = None
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        if self.dead:
+            raise Exception("server closed the connection unexpectedly")
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = True
+
+
+class Connect:
+    def __init__(self):
+        self.connections = []
+        self.gate = None
+        self.fail = False
+
+    def __call__(self):
+        if self.gate is not None:
+            self.gate.wait()
+        if self.fail:
+            raise Exception("could not connect to server")
+        self.connections.append(FakeConnection())
+        return self.connections[-1]
+
+
+def in_thread(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+class Test(unittest.TestCase):
+    def setUp(self) -> None:
+        self.connect = Connect()
+
+    def pool(self, **settings) -> ConnectionPool:
+        settings.setdefault("minconn", 0)
+        settings.setdefault("maxconn", 2)
+        settings.setdefault("checkout_timeout", 0.05)
+        return ConnectionPool(self.connect, **settings)
+
+    def assertStats(self, pool, **expected):
+        stats = pool.stats()
+        self.assertDictEqual(expected, {key: stats[key] for key in expected})
+
+    def test_Sizes(self) -> None:
+        for minconn, maxconn in [(-1, 1), (0, 0), (2, 1)]:
+            with self.assertRaises(ValueError):
+                self.pool(minconn=minconn, maxconn=maxconn)
+        pool = self.pool(minconn=2, maxconn=3)
+        self.assertEqual(2, len(self.connect.connections), "minconn connections are opened up front")
+        self.assertStats(pool, size=2, idle=2, in_use=0, created=2)
+        checked_out = [pool.getconn() for _ in range(3)]
+        self.assertEqual(3, len({id(pooled) for pooled in checked_out}), "Every checkout gets its own connection")
+        self.assertStats(pool, size=3, idle=0, in_use=3, created=3)
+        with self.assertRaises(DatabaseException.ConnectionInvalid):
+            pool.getconn()
+        self.assertEqual(3, len(self.connect.connections), "maxconn is never exceeded")
+
+    def test_ReuseIdle(self) -> None:
+        pool = self.pool()
+        first = pool.getconn()
+        pool.putconn(first)
+        self.assertIs(first, pool.getconn(), "An idle connection is reused")
+        self.assertEqual(1, len(self.connect.connections), "An idle connection is reused")
+
+    def test_CheckoutTimeout(self) -> None:
+        pool = self.pool(maxconn=1)
+        pool.getconn()
+        start = time.monotonic()
+        with self.assertRaises(DatabaseException.ConnectionInvalid):
+            pool.getconn()
+        self.assertGreaterEqual(time.monotonic() - start, 0.05, "The checkout waits before failing")
+        self.assertEqual(1, pool.stats()["timeouts"])
+
+    def test_CheckoutWaits(self) -> None:
+        pool = self.pool(maxconn=1, checkout_timeout=5)
+        first = pool.getconn()
+        timer = threading.Timer(0.05, pool.putconn, [first])
+        timer.start()
+        self.assertIs(first, pool.getconn(), "The returned connection goes to the waiting checkout")
+        timer.join()
+        stats = pool.stats()
+        self.assertEqual(1, stats["waits"])
+        self.assertGreater(stats["wait_time"], 0)
+        self.assertEqual(0, stats["timeouts"])
+
+    def test_HealthCheck(self) -> None:
+        pool = self.pool(health_check_interval=0)
+        first = pool.getconn()
+        pool.putconn(first)
+        self.assertIs(first, pool.getconn(), "A healthy connection is reused")
+        self.assertEqual(1, first.connection.pings, "Idle connections are pinged on checkout")
+        pool.putconn(first)
+        first.connection.dead = True
+        second = pool.getconn()
+        self.assertIsNot(first, second, "A connection that doesn't answer is replaced")
+        self.assertTrue(first.connection.closed, "A connection that doesn't answer is closed")
+        pool.putconn(second)
+        second.connection.close()
+        self.assertIsNot(second, pool.getconn(), "A closed connection is replaced")
+        stats = pool.stats()
+        self.assertEqual(2, stats["health_check_failures"])
+        self.assertEqual(3, stats["created"])
+        self.assertEqual(1, stats["size"])
+
+    def test_HealthCheckInterval(self) -> None:
+        pool = self.pool(health_check_interval=60)
+        first = pool.getconn()
+        pool.putconn(first)
+        pool.putconn(pool.getconn())
+        self.assertEqual(0, first.connection.pings, "Recently used connections aren't pinged")
+
+    def test_IdleReaping(self) -> None:
+        pool = self.pool(minconn=1, maxconn=3, idle_timeout=0)
+        checked_out = [pool.getconn() for _ in range(3)]
+        for pooled in checked_out:
+            pool.putconn(pooled)
+        time.sleep(0.01)
+        self.assertIs(checked_out[-1], pool.getconn(), "The most recently used connection is kept")
+        self.assertEqual([True, True, False], [pooled.connection.closed for pooled in checked_out],
+                         "Stale connections above minconn are closed")
+        stats = pool.stats()
+        self.assertEqual(2, stats["reaped"])
+        self.assertEqual(1, stats["size"])
+
+    def test_IdleReapingKeepsMinconn(self) -> None:
+        pool = self.pool(minconn=2, maxconn=3, idle_timeout=0)
+        time.sleep(0.01)
+        pool.putconn(pool.getconn())
+        self.assertEqual(0, pool.stats()["reaped"], "minconn connections are never reaped")
+        self.assertEqual(2, pool.stats()["size"])
+
+    def test_ResetOnReturn(self) -> None:
+        pool = self.pool()
+        first = pool.getconn()
+        first.connection.status = extensions.TRANSACTION_STATUS_INTRANS
+        first.connection.autocommit = True
+        pool.putconn(first)
+        self.assertEqual(1, first.connection.rollbacks, "An open transaction is rolled back")
+        self.assertFalse(first.connection.autocommit, "Autocommit is turned back off")
+        self.assertIs(first, pool.getconn(), "A reset connection is reused")
+        pool.putconn(first)
+        self.assertEqual(1, first.connection.rollbacks, "An idle connection isn't rolled back")
+
+    def test_DiscardOnReturn(self) -> None:
+        pool = self.pool()
+        first, second = pool.getconn(), pool.getconn()
+        pool.putconn(first, discard=True)
+        self.assertTrue(first.connection.closed, "A discarded connection is closed")
+        second.connection.status = extensions.TRANSACTION_STATUS_INERROR
+        second.connection.dead = True
+        pool.putconn(second)
+        self.assertTrue(second.connection.closed, "A connection that can't be reset is closed")
+        pool.putconn(second)
+        self.assertStats(pool, size=0, discarded=2)
+
+    def test_Stats(self) -> None:
+        pool = self.pool(minconn=1, maxconn=4)
+        pooled = [pool.getconn() for _ in range(3)]
+        pool.putconn(pooled[0])
+        self.assertDictEqual({"created": 3, "discarded": 0, "reaped": 0, "checkouts": 3, "waits": 0,
+                              "wait_time": 0.0, "timeouts": 0, "health_check_failures": 0, "minconn": 1,
+                              "maxconn": 4, "size": 3, "idle": 1, "in_use": 2}, pool.stats())
+
+    def test_ConnectFailure(self) -> None:
+        pool = self.pool(maxconn=1)
+        self.connect.fail = True
+        with self.assertRaises(DatabaseException.ConnectionInvalid):
+            pool.getconn()
+        self.connect.fail = False
+        self.assertEqual(0, pool.stats()["size"], "A failed connect gives its slot back")
+        pool.getconn()
+
+    def test_ConnectOutsideLock(self) -> None:
+        pool = self.pool(checkout_timeout=5)
+        first = pool.getconn()
+        self.connect.gate = threading.Event()
+        connecting = in_thread(pool.getconn)
+        time.sleep(0.05)
+        pool.putconn(first)
+        self.assertIs(first, pool.getconn(), "Checkouts aren't held up by a slow connect")
+        self.assertEqual(2, pool.stats()["size"], "The connecting checkout holds its slot")
+        self.connect.gate.set()
+        connecting.join(5)
+        self.assertFalse(connecting.is_alive())
+        self.assertEqual(2, pool.stats()["in_use"])
+
+    def test_PingOutsideLock(self) -> None:
+        pool = self.pool(health_check_interval=0, checkout_timeout=5)
+        first, second = pool.getconn(), pool.getconn()
+        pool.putconn(first)
+        first.connection.ping_gate = threading.Event()
+        pinging = in_thread(pool.getconn)
+        time.sleep(0.05)
+        pool.putconn(second)
+        self.assertStats(pool, in_use=1, idle=1)
+        first.connection.ping_gate.set()
+        pinging.join(5)
+        self.assertFalse(pinging.is_alive())
+        self.assertEqual(1, first.connection.pings)
+
+    def test_CloseAll(self) -> None:
+        pool = self.pool()
+        first, second = pool.getconn(), pool.getconn()
+        pool.putconn(first)
+        pool.closeall()
+        self.assertTrue(first.connection.closed, "Idle connections are closed")
+        self.assertFalse(second.connection.closed, "Checked out connections are left alone")
+        pool.putconn(second)
+        self.assertTrue(second.connection.closed, "Connections returned after closing are closed")
+        with self.assertRaises(DatabaseException.ConnectionInvalid):
+            pool.getconn()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
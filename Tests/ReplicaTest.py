@@ -0,0 +1,94 @@
+import unittest
+import Solution
+import Utility.DBConnector as Connector
+from psycopg2 import extensions
+from Utility.Status import Status
+from Tests.abstractTest import AbstractTest
+from Business.Disk import Disk
+from Business.File import File
+
+
+def replica_dsn(name):
+    # the test server stands in for the replicas, application_name tells them apart
+    return extensions.make_dsn(application_name=name, **Connector.DBConnector.connection_params())
+
+
+DOWN_DSN = "host=127.0.0.1 port=1 dbname=filez connect_timeout=1"
+
+
+class Test(AbstractTest):
+    def setUp(self) -> None:
+        super().setUp()
+        self.replica_settings = dict(Connector.DBConnector.replica_settings)
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+
+    def tearDown(self) -> None:
+        Connector.DBConnector.configure_replicas(**self.replica_settings)
+        super().tearDown()
+
+    def checkouts(self):
+        return [replica["checkouts"] for replica in Connector.DBConnector.replica_stats()]
+
+    def test_RoundRobin(self) -> None:
+        Connector.DBConnector.configure_replicas(dsns=[replica_dsn("replica1"), replica_dsn("replica2")])
+        for _ in range(4):
+            self.assertListEqual([1], Solution.mostAvailableDisks(), "Analytic reads go to the replicas")
+        self.assertListEqual([2, 2], self.checkouts(), "Reads take turns")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(2, "DELL", 10, 10, 10)), "Writes go to the primary")
+        self.assertListEqual([2, 2], self.checkouts(), "Writes go to the primary")
+        conn = Connector.connect("postgres", read_only=True, replica=True)
+        try:
+            self.assertIn("application_name=replica", conn.replica, "Should work")
+        finally:
+            conn.close()
+
+    def test_LeastLoaded(self) -> None:
+        Connector.DBConnector.configure_replicas(dsns=[replica_dsn("replica1"), replica_dsn("replica2")],
+                                                 strategy="least_loaded")
+        busy = Connector.DBConnector(replica=True)
+        try:
+            self.assertListEqual([1, 0], self.checkouts(), "Should work")
+            self.assertListEqual([], Solution.getConflictingDisks(), "Should work")
+            self.assertListEqual([1, 1], self.checkouts(), "The idle replica is chosen")
+        finally:
+            busy.close()
+
+    def test_FallBackToPrimary(self) -> None:
+        Connector.DBConnector.configure_replicas(dsns=[DOWN_DSN, replica_dsn("replica")], retry_interval=60.0)
+        self.assertListEqual([1], Solution.mostAvailableDisks(), "Should work")
+        self.assertListEqual([1], Solution.mostAvailableDisks(), "Should work")
+        stats = Connector.DBConnector.replica_stats()
+        self.assertListEqual([False, True], [replica["up"] for replica in stats], "The replica that is down is skipped")
+        self.assertListEqual([0, 2], self.checkouts(), "Should work")
+
+        Connector.DBConnector.configure_replicas(dsns=[DOWN_DSN])
+        self.assertListEqual([1], Solution.mostAvailableDisks(), "The primary answers when no replica can")
+        self.assertEqual(1, Connector.DBConnector.replica_stats()[0]["failures"], "Should work")
+
+    def test_StalenessBound(self) -> None:
+        Connector.DBConnector.configure_replicas(dsns=[replica_dsn("replica")], max_lag=0.0)
+        self.assertListEqual([], Solution.getConflictingDisks(), "Should work")
+        self.assertListEqual([1], self.checkouts(), "Not a replica, so never behind")
+        self.assertEqual(0, Connector.DBConnector.replica_stats()[0]["lag"], "Should work")
+        Connector.DBConnector.configure_replicas(max_lag=-1.0)
+        self.assertListEqual([], Solution.getConflictingDisks(), "The primary answers")
+        self.assertListEqual([0], self.checkouts(), "Too far behind")
+
+    def test_PointLookupsOnPrimary(self) -> None:
+        Solution.configureEntityCache()
+        self.addCleanup(Solution.configureEntityCache, maxsize=0)
+        Connector.DBConnector.configure_replicas(dsns=[replica_dsn("replica")])
+        self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Cached from the primary")
+        self.assertEqual(Status.OK, Solution.addFile(File(1, "wav", 4)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFileToDisk(File(1, "wav", 4), 1), "Should work")
+        self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "Reloaded from the primary after the write")
+        self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "Served from the cache")
+        self.assertEqual("wav", Solution.getFileByID(1).getType(), "Should work")
+        self.assertListEqual([0], self.checkouts(), "Point lookups and cache loads stay on the primary")
+        self.assertEqual(40, Solution.getCostForType("wav"), "Should work")
+        self.assertListEqual([1], self.checkouts(), "Analytic reads go to the replica")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
@@ -0,0 +1,112 @@
+import unittest
+import Solution
+import Utility.DBConnector as Connector
+from Utility.DBConnector import ResultSet
+from Tests.abstractTest import AbstractTest
+from Business.File import File
+from Utility import Columns
+
+SERIES = "SELECT g AS fileID, g * 2 AS size FROM generate_series(1, %s) g"
+MIXED = "SELECT g AS fileID, g::bigint * 3 AS size, g / 2.0 AS ratio, 'f' || g AS type, " \
+        "CASE WHEN g %% 2 = 0 THEN g END AS even, g > 1 AS big FROM generate_series(1, %s) g"
+
+
+class Test(AbstractTest):
+    def setUp(self) -> None:
+        super().setUp()
+        self.conn = Connector.DBConnector()
+
+    def tearDown(self) -> None:
+        self.conn.close()
+        super().tearDown()
+
+    def test_RowsAreNotCopied(self) -> None:
+        _, result = self.conn.execute(SERIES, params=(3,))
+        rows = result.rows
+        self.assertIs(rows, ResultSet(self.conn.cursor.description, rows).rows, "Kept as given")
+        self.assertEqual(3, result.size(), "Should work")
+        self.assertListEqual([2, 4, 6], [row["size"] for row in result], "Iterable")
+
+    def test_Rows(self) -> None:
+        _, result = self.conn.execute("SELECT 1 AS fileID, 'wav' AS type, NULL::integer AS size")
+        row = result[0]
+        self.assertEqual(1, row["FILEID"], "Column names are case insensitive")
+        self.assertIsNone(row[0], "Like a ResultSetDict")
+        self.assertDictEqual({"fileid": 1, "type": "wav", "size": None}, dict(row), "Should work")
+        self.assertListEqual([1, "wav", None], row.values(), "Should work")
+        self.assertTrue("fileID" in row and "ramID" not in row, "Should work")
+
+    def test_Column(self) -> None:
+        _, result = self.conn.execute(SERIES, params=(5,))
+        self.assertListEqual([1, 2, 3, 4, 5], result.column("fileID"), "Should work")
+        self.assertListEqual([2, 4, 6, 8, 10], result.column("size", "q").tolist(), "As an array")
+        _, result = self.conn.execute(SERIES, params=(0,))
+        self.assertListEqual([], result.column("fileID"), "No rows")
+        self.assertListEqual([2, 4], self.conn.stream(SERIES, params=(2,)).column("size"), "Streamed")
+
+    def test_Stream(self) -> None:
+        streamed = self.conn.stream(SERIES, params=(1005,), itersize=100)
+        self.assertListEqual(list(range(1, 1006)), [row["fileID"] for row in streamed], "Every row, in order")
+        with self.assertRaises(RuntimeError):
+            streamed.size()
+        with self.assertRaises(RuntimeError):
+            iter(streamed)
+
+        streamed = self.conn.stream(SERIES, params=(250,), itersize=100)
+        self.assertEqual(250, streamed.size(), "Fetches the rest")
+        self.assertEqual(500, streamed[249]["size"], "Should work")
+        self.assertEqual(250, len(list(streamed)), "Read by index, so kept")
+
+        self.assertTrue(self.conn.stream(SERIES, params=(0,)).isEmpty(), "No rows")
+
+    def test_StreamStatement(self) -> None:
+        Solution.addFiles([File(i, "wav", i) for i in range(1, 13)])
+        self.conn.set_autocommit(True)
+        streamed = self.conn.stream(Solution.CLOSE_FILES, params=(1,), itersize=3)
+        self.assertListEqual(list(range(2, 12)), [row["fileID"] for row in streamed], "Same rows as EXECUTE")
+
+    def test_Columns(self) -> None:
+        _, result = self.conn.execute("SELECT 1 AS fileID, 'wav' AS type UNION ALL SELECT 2, 'mp3'")
+        self.assertDictEqual({"fileid": [1, 2], "type": ["wav", "mp3"]}, result.to_columns(), "Should work")
+        self.assertDictEqual({}, ResultSet().to_columns(), "No description")
+
+    @unittest.skipIf(Columns.numpy is None, "numpy is not installed")
+    def test_Numpy(self) -> None:
+        columns = self.conn.stream(MIXED.replace("g / 2.0", "(g / 2.0)::float8"), params=(4,)).to_numpy()
+        self.assertEqual("int32", columns["fileid"].dtype, "Typed from the column")
+        self.assertEqual("int64", columns["size"].dtype, "Should work")
+        self.assertEqual("float64", columns["ratio"].dtype, "Should work")
+        self.assertEqual("bool", columns["big"].dtype, "Should work")
+        self.assertListEqual(["f1", "f2", "f3", "f4"], columns["type"].tolist(), "Other types are objects")
+        self.assertEqual("float64", columns["even"].dtype, "Integers with NULLs become floats")
+        self.assertListEqual([2.0, 4.0], columns["even"][1::2].tolist(), "Should work")
+        self.assertTrue(Columns.numpy.isnan(columns["even"][0::2]).all(), "NaN for NULL")
+
+    @unittest.skipIf(Columns.numpy is None, "numpy is not installed")
+    def test_FetchColumnsBinary(self) -> None:
+        query = MIXED.replace("g / 2.0", "(g / 2.0)::float8")
+        for rows in (0, 1, 1000):
+            streamed = self.conn.fetch_columns(query, params=(rows,), binary=False)
+            copied = self.conn.fetch_columns(query, params=(rows,), binary=True)
+            self.assertListEqual(list(streamed), list(copied), "Same columns")
+            for name in streamed:
+                self.assertEqual(streamed[name].dtype, copied[name].dtype, "Same types")
+                Columns.numpy.testing.assert_array_equal(streamed[name], copied[name])
+        fixed = self.conn.fetch_columns(SERIES, params=(1000,), binary=True)
+        Columns.numpy.testing.assert_array_equal(fixed["size"], 2 * Columns.numpy.arange(1, 1001))
+        self.assertListEqual([1, 2], self.conn.fetch_columns(SERIES, params=(2,))["fileid"].tolist(), "Should work")
+        with self.assertRaises(ValueError):
+            self.conn.fetch_columns("SELECT now() AS at", binary=True)
+
+    def test_StreamsCloseWithTheConnection(self) -> None:
+        streamed = self.conn.stream(SERIES, params=(1000,), itersize=10)
+        next(iter(streamed))
+        self.conn.close()
+        self.conn = Connector.DBConnector()
+        _, cursors = self.conn.execute("SELECT name FROM pg_cursors")
+        self.assertEqual(0, cursors.size(), "The server-side cursor is closed")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+from Tests import MemoryTest
+import Solution
+import Utility.DBConnector as Connector
+from Utility.Exceptions import DatabaseException
+from Utility.Status import Status
+from Business.File import File
+from Business.Disk import Disk
+
+
+class Test(MemoryTest.Test):
+    # SimpleTestSharon's tests, on an SQLite database
+    backend = "sqlite"
+
+
+class ConformanceTest(MemoryTest.ConformanceTest):
+    backend = "sqlite"
+
+
+class SessionTest(MemoryTest.SessionTest):
+    backend = "sqlite"
+
+
+class ConnectorTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.settings = dict(Connector.SQLiteConnector.settings)
+        self.conn = Connector.connect("sqlite")
+        self.conn.execute("CREATE TABLE parent(id integer PRIMARY KEY CHECK (id > 0)) STRICT; "
+                          "CREATE TABLE child(id integer NOT NULL UNIQUE REFERENCES parent (id)) STRICT; ")
+
+    def tearDown(self) -> None:
+        try:
+            self.conn.rollback()
+            self.conn.close()
+        finally:
+            Connector.SQLiteConnector.configure(**self.settings)
+
+    def test_ConstraintErrors(self) -> None:
+        self.conn.execute("INSERT INTO parent VALUES (1)")
+        self.conn.execute("INSERT INTO child VALUES (1)")
+        for query, params, exception in (
+                ("INSERT INTO parent VALUES (?)", (0,), DatabaseException.CHECK_VIOLATION),
+                ("INSERT INTO parent VALUES (?)", (1,), DatabaseException.UNIQUE_VIOLATION),
+                ("INSERT INTO child VALUES (?)", (None,), DatabaseException.NOT_NULL_VIOLATION),
+                ("INSERT INTO child VALUES (?)", (1,), DatabaseException.UNIQUE_VIOLATION),
+                ("INSERT INTO child VALUES (?)", (5,), DatabaseException.FOREIGN_KEY_VIOLATION),
+                ("INSERT INTO parent VALUES (?)", ("x",), DatabaseException.UNKNOWN_ERROR),
+                ("INSERT INTO parent VALUES (?)", (2 ** 70,), DatabaseException.UNKNOWN_ERROR),
+                ("SELECT * FROM missing", (), DatabaseException.UNKNOWN_ERROR)):
+            with self.assertRaises(exception, msg=query):
+                self.conn.execute(query, params=params)
+        self.assertEqual(1, self.conn.execute("SELECT * FROM child")[0], "Failed statements are undone")
+
+    def test_Execute(self) -> None:
+        self.assertEqual(3, self.conn.insert_rows("parent", ("id",), [(1,), (2,), (3,)]), "Should work")
+        with self.assertRaises(DatabaseException.CHECK_VIOLATION):
+            self.conn.insert_rows("parent", ("id",), [(4,), (0,)])
+        rows, result = self.conn.execute(Connector.Statement("filez_test", "SELECT id FROM parent WHERE id >= $1")
+                                         .sqlite_cmd, params=(2,))
+        self.assertEqual(2, rows, "Selected rows are counted")
+        self.assertListEqual([2, 3], result.column("id"), "All or none of insert_rows")
+        self.assertEqual(3, self.conn.execute("UPDATE parent SET id = id + 10")[0], "Should work")
+        streamed = self.conn.stream("SELECT id FROM parent ORDER BY id", itersize=2)
+        self.assertListEqual([11, 12, 13], [row["id"] for row in streamed], "Should work")
+
+    def test_Dialect(self) -> None:
+        self.conn.insert_rows("public.parent", ("id",), [(1,), (2,), (3,)])
+        statement = Connector.Statement("filez_test", "SELECT id FROM public.parent WHERE id = ANY($1::integer[]) "
+                                                      "ORDER BY id FOR UPDATE")
+        self.assertEqual("SELECT id FROM parent WHERE id IN (SELECT value FROM json_each(?1)) ORDER BY id",
+                         statement.sqlite_cmd, "Should work")
+        self.assertListEqual([1, 3], self.conn.execute(statement, params=([1, 3, 5],))[1].column("id"),
+                             "Arrays are bound as JSON")
+        with self.assertRaises(DatabaseException.DATA_EXCEPTION):
+            self.conn.execute(statement, params=([1, 2 ** 31],))
+        with self.assertRaises(DatabaseException.DATA_EXCEPTION):
+            self.conn.insert_rows("parent", ("id",), [(4,), (True,)])
+        self.assertIn("STRICT", Connector.Script("filez_create_tables", "").sqlite_cmd, "SQLite's own DDL")
+
+    def test_FileDatabase(self) -> None:
+        self.conn.close()
+        with tempfile.TemporaryDirectory() as directory:
+            Connector.SQLiteConnector.configure(database=os.path.join(directory, "filez.db"))
+            Solution.useBackend("sqlite")
+            try:
+                self.assertEqual(Status.OK, Solution.createTables(), "Should work")
+                self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+                writer = Connector.connect("sqlite")
+                try:
+                    self.assertEqual("wal", writer.execute("PRAGMA journal_mode")[1][0]["journal_mode"],
+                                     "Should work")
+                    writer.execute("DELETE FROM disk")
+                    self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Reads don't wait for a write")
+                finally:
+                    writer.rollback()
+                    writer.close()
+                self.assertEqual(Status.OK, Solution.addFile(File(1, "wav", 4)), "Should work")
+                self.assertEqual(Status.OK, Solution.dropTables(), "Should work")
+            finally:
+                Solution.useBackend("postgres")
+                Connector.SQLiteConnector.configure(**self.settings)
+        self.conn = Connector.connect("sqlite")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
@@ -0,0 +1,103 @@
+import threading
+import unittest
+import Solution
+import Utility.DBConnector as Connector
+from Utility.Status import Status
+from Tests.abstractTest import AbstractTest
+from Business.File import File
+from Business.RAM import RAM
+from Business.Disk import Disk
+
+
+def committed_disks():
+    # what another connection sees
+    conn = Connector.DBConnector()
+    try:
+        _, result = conn.execute("SELECT diskID FROM public.disk ORDER BY diskID")
+        return [result[i]["diskID"] for i in range(result.size())]
+    finally:
+        conn.close()
+
+
+class Test(AbstractTest):
+    def test_CommitOnce(self) -> None:
+        with Solution.session() as s:
+            self.assertEqual(Status.OK, s.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+            self.assertEqual(Status.OK, s.addRAM(RAM(1, "DELL", 10)), "Should work")
+            self.assertEqual(Status.OK, s.addRAMToDisk(1, 1), "Should work")
+            self.assertEqual(Status.OK, s.addFile(File(1, "wav", 4)), "Should work")
+            self.assertEqual(Status.OK, s.addFileToDisk(File(1, "wav", 4), 1), "Should work")
+            self.assertEqual(6, s.getDiskByID(1).getFreeSpace(), "The session sees its own writes")
+            self.assertListEqual([], committed_disks(), "Nothing is committed before the session ends")
+        self.assertListEqual([1], committed_disks(), "Committed when the session ends")
+        self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "Should work")
+        self.assertEqual(10, Solution.diskTotalRAM(1), "Should work")
+
+    def test_FailedCallsKeepTheirStatus(self) -> None:
+        with Solution.session():
+            self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+            self.assertEqual(Status.ALREADY_EXISTS, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Same ID")
+            self.assertEqual(Status.BAD_PARAMS, Solution.addFile(File(1, "wav", -1)), "Bad size")
+            self.assertEqual(Status.OK, Solution.addFile(File(1, "wav", 20)), "The session goes on")
+            self.assertEqual(Status.BAD_PARAMS, Solution.addFileToDisk(File(1, "wav", 20), 1), "No space")
+            self.assertEqual(Status.NOT_EXISTS, Solution.deleteDisk(2), "Should work")
+            self.assertListEqual([Status.OK, Status.ALREADY_EXISTS], Solution.addDisks([Disk(2, "HP", 10, 10, 10),
+                                                                                   Disk(1, "HP", 10, 10, 10)]),
+                                 "Should work")
+        self.assertListEqual([1, 2], committed_disks(), "Should work")
+        self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "The failed placement was undone")
+
+    def test_RollbackOnException(self) -> None:
+        with self.assertRaises(ValueError):
+            with Solution.session() as s:
+                self.assertEqual(Status.OK, s.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+                raise ValueError()
+        self.assertListEqual([], committed_disks(), "Rolled back")
+        self.assertEqual(None, Solution.getDiskByID(1).getDiskID(), "Rolled back")
+
+    def test_NestedSession(self) -> None:
+        with Solution.session() as s:
+            self.assertEqual(Status.OK, s.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+            with self.assertRaises(ValueError):
+                with Solution.session() as inner:
+                    self.assertEqual(Status.OK, inner.addDisk(Disk(2, "DELL", 10, 10, 10)), "Should work")
+                    raise ValueError()
+            with Solution.session() as inner:
+                self.assertEqual(Status.OK, inner.addDisk(Disk(3, "DELL", 10, 10, 10)), "Should work")
+        self.assertListEqual([1, 3], committed_disks(), "Only the failed inner session was undone")
+
+    def test_UncommittedRowsAreNotCached(self) -> None:
+        Solution.configureEntityCache()
+        self.addCleanup(Solution.configureEntityCache, maxsize=0)
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+        self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Cached")
+        seen = []
+        with Solution.session() as s:
+            self.assertEqual(Status.OK, s.addFile(File(1, "wav", 4)), "Should work")
+            self.assertEqual(Status.OK, s.addFileToDisk(File(1, "wav", 4), 1), "Should work")
+            self.assertEqual(6, s.getDiskByID(1).getFreeSpace(), "The session sees its own writes")
+            reader = threading.Thread(target=lambda: seen.append(Solution.getDiskByID(1).getFreeSpace()))
+            reader.start()
+            reader.join()
+        self.assertListEqual([10], seen, "Other threads don't see the session's writes")
+        self.assertEqual(6, Solution.getDiskByID(1).getFreeSpace(), "Not served from a stale cache")
+
+    def test_ReadOnlyFunctions(self) -> None:
+        for name in Solution.READ_ONLY_FUNCTIONS:
+            self.assertTrue(callable(getattr(Solution, name, None)), name)
+        self.assertNotIn("addFileToDisk", Solution.READ_ONLY_FUNCTIONS, "Writes aren't read-only")
+        for name in ("getDiskByID", "getDiskAttributesByID", "mostAvailableDisks", "exportPlacements"):
+            self.assertIn(name, Solution.READ_ONLY_FUNCTIONS, "Registered by perform_sql_read")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+        self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Reads run in autocommit mode")
+        self.assertEqual(0, Solution.averageFileSizeOnDisk(1), "Should work")
+        conn = Connector.DBConnector()
+        try:
+            self.assertFalse(conn.connection.autocommit, "Connections go back to the pool in transaction mode")
+        finally:
+            conn.close()
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
@@ -34,6 +34,30 @@ class Test(AbstractTest):
         self.assertEqual(Status.ALREADY_EXISTS, Solution.addFile(File(3, "wav", 10)),
                          "ID 3 already exists")
 
+    def test_MissingIDs(self) -> None:
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(1, "wav", 5)), "Should work")
+        self.assertEqual(Status.OK, Solution.addRAM(RAM(1, "Kingston", 10)), "Should work")
+        self.assertEqual(Status.ERROR, Solution.addFileToDisk(File(1, "wav", 5), None), "No disk")
+        self.assertEqual(Status.BAD_PARAMS, Solution.addFileToDisk(File(None, "wav", 5), 1), "No file")
+        self.assertEqual([Status.ERROR, Status.BAD_PARAMS],
+                         Solution.placeFiles([(File(1, "wav", 5), None), (File(None, "wav", 5), 1)]),
+                         "Same as addFileToDisk")
+        self.assertEqual(Status.ERROR, Solution.removeFileFromDisk(File(1, "wav", 5), None), "No disk")
+        self.assertEqual(Status.ERROR, Solution.addRAMToDisk(None, 1), "No RAM")
+        self.assertEqual(Status.ERROR, Solution.removeRAMFromDisk(1, None), "No disk")
+        self.assertEqual(Status.ERROR, Solution.deleteDisk(None), "No disk")
+        self.assertEqual(Status.ERROR, Solution.deleteRAM(None), "No RAM")
+        self.assertEqual(-1, Solution.averageFileSizeOnDisk(None), "No disk")
+        self.assertEqual(-1, Solution.diskTotalRAM(None), "No disk")
+        self.assertListEqual([], Solution.getFilesCanBeAddedToDisk(None), "No disk")
+        self.assertFalse(Solution.isCompanyExclusive(None), "No disk")
+        self.assertIsNone(Solution.getDiskByID(None).getDiskID(), "No disk")
+        self.assertEqual(10, Solution.getDiskByID(1).getFreeSpace(), "Nothing was written")
+        self.assertEqual(0, Solution.averageFileSizeOnDisk(1), "Nothing was written")
+        self.assertEqual(Status.OK, Solution.addFileToDisk(File(1, "wav", 5), 1), "Should work")
+        self.assertListEqual([], Solution.getCloseFiles(1), "No orphan placement counts as a disk")
+
 
 # *** DO NOT RUN EACH TEST MANUALLY ***
 if __name__ == '__main__':
@@ -3,7 +3,7 @@ import sys
 sys.path.insert(0,"..")
 import Solution
 from Utility.Status import Status
-from abstractTest import AbstractTest
+from Tests.abstractTest import AbstractTest
 from Business.File import File
 from Business.RAM import RAM
 from Business.Disk import Disk
@@ -675,6 +675,39 @@ class Test(AbstractTest):
         self.assertEqual(140, Solution.getCostForType("MP3"), "should calculate only from disk 2")
         self.assertEqual(120, Solution.getCostForType("MP4"), "Should work")
 
+    def test_getCostForTypes(self):
+        # check database error
+        Solution.dropTables()
+        self.assertDictEqual({"MP3": -1, "WAV": -1}, Solution.getCostForTypes(["MP3", "WAV"]),
+                             "-1 in case of other errors")
+        Solution.createTables()
+        # check empty input
+        self.assertDictEqual({}, Solution.getCostForTypes([]), "Empty batch")
+        # setup
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 100, 2)), "Should work")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(2, "DELL", 10, 100, 3)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(1, "WAV", 5)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(2, "WAV", 1)), "Should work")
+        self.assertEqual(Status.OK, Solution.addFile(File(3, "MP3", 4)), "Should work")
+        for fileID, type, size, diskID in ((1, "WAV", 5, 1), (1, "WAV", 5, 2), (2, "WAV", 1, 2), (3, "MP3", 4, 1)):
+            self.assertEqual(Status.OK, Solution.addFileToDisk(File(fileID, type, size), diskID), "Should work")
+        # basic test, the same costs as getCostForType, 0 for a type without files
+        costs = Solution.getCostForTypes(["WAV", "MP3", "TXT"])
+        self.assertDictEqual({"WAV": 5 * 2 + 5 * 3 + 1 * 3, "MP3": 4 * 2, "TXT": 0}, costs, "Should work")
+        for type, cost in costs.items():
+            self.assertEqual(Solution.getCostForType(type), cost, "Same cost as getCostForType")
+        # check duplicate types
+        self.assertDictEqual({"MP3": 8, "TXT": 0}, Solution.getCostForTypes(["MP3", "TXT", "MP3", "TXT"]),
+                             "Each type once")
+        self.assertListEqual(["TXT", "MP3"], list(Solution.getCostForTypes(iter(["TXT", "MP3"]))),
+                             "Keys in the given order")
+        # check if deleting disks and files works properly
+        self.assertEqual(Status.OK, Solution.deleteDisk(2), "Should work")
+        self.assertDictEqual({"WAV": 5 * 2, "MP3": 4 * 2}, Solution.getCostForTypes(["WAV", "MP3"]),
+                             "Placements on a deleted disk no longer cost anything")
+        self.assertEqual(Status.OK, Solution.deleteFile(File(1, "WAV", 5)), "Should work")
+        self.assertDictEqual({"WAV": 0, "MP3": 8}, Solution.getCostForTypes(["WAV", "MP3"]), "Should work")
+
     def test_getFilesCanBeAddedToDisk(self):
         # check database error
         Solution.dropTables()
@@ -869,6 +902,36 @@ class Test(AbstractTest):
         self.assertEqual(False, Solution.isCompanyExclusive(1), "Disk was deleted")
         self.assertEqual(False, Solution.isCompanyExclusive(2), "Shouldn't change")
 
+    def test_isCompanyExclusiveMany(self):
+        # check database error
+        Solution.dropTables()
+        self.assertDictEqual({1: False, 2: False}, Solution.isCompanyExclusiveMany([1, 2]),
+                             "False in case of an error or the disk does not exist")
+        Solution.createTables()
+        # check empty input
+        self.assertDictEqual({}, Solution.isCompanyExclusiveMany([]), "Empty batch")
+        # setup
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(2, "DELL", 10, 10, 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(3, "HP", 10, 10, 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addRAM(RAM(1, "DELL", 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addRAM(RAM(2, "HP", 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addRAMToDisk(1, 1), "Should work")
+        self.assertEqual(Status.OK, Solution.addRAMToDisk(1, 2), "Should work")
+        self.assertEqual(Status.OK, Solution.addRAMToDisk(2, 2), "Should work")
+        # basic test, the same answers as isCompanyExclusive, disk 3 has no RAM and disk 4 doesn't exist
+        exclusive = Solution.isCompanyExclusiveMany([1, 2, 3, 4])
+        self.assertDictEqual({1: True, 2: False, 3: True, 4: False}, exclusive, "Should work")
+        for diskID, answer in exclusive.items():
+            self.assertEqual(Solution.isCompanyExclusive(diskID), answer, "Same answer as isCompanyExclusive")
+        # check duplicate IDs
+        self.assertDictEqual({2: False, 1: True}, Solution.isCompanyExclusiveMany([2, 1, 2, 2]), "Each disk once")
+        self.assertListEqual([4, 1], list(Solution.isCompanyExclusiveMany(iter([4, 1]))), "Keys in the given order")
+        # check if deleting RAMs and disks works properly
+        self.assertEqual(Status.OK, Solution.deleteRAM(2), "Should work")
+        self.assertEqual(Status.OK, Solution.deleteDisk(1), "Should work")
+        self.assertDictEqual({1: False, 2: True}, Solution.isCompanyExclusiveMany([1, 2]), "Should work")
+
     def test_getConflictingDisks(self):
         # check database error
         Solution.dropTables()
@@ -1140,6 +1203,35 @@ class Test(AbstractTest):
         self.assertListEqual([2], Solution.getCloseFiles(3), "Should work")
         self.assertListEqual([2, 3], Solution.getCloseFiles(4), "Should work")
 
+    def test_getCloseFilesMany(self):
+        # check database error
+        Solution.dropTables()
+        self.assertDictEqual({1: [], 2: []}, Solution.getCloseFilesMany([1, 2]), "Empty lists in case of an error")
+        Solution.createTables()
+        # check empty input
+        self.assertDictEqual({}, Solution.getCloseFilesMany([]), "Empty batch")
+        # check files that don't exist
+        self.assertDictEqual({1: [], 2: []}, Solution.getCloseFilesMany([1, 2]), "No files at all")
+        # setup
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(1, "DELL", 10, 10, 10)), "Should work")
+        self.assertEqual(Status.OK, Solution.addDisk(Disk(2, "DELL", 10, 10, 10)), "Should work")
+        for fileID in range(1, 6):
+            self.assertEqual(Status.OK, Solution.addFile(File(fileID, "wav", 1)), "Should work")
+        for fileID, diskID in ((1, 1), (1, 2), (2, 1), (3, 2), (4, 1), (4, 2)):
+            self.assertEqual(Status.OK, Solution.addFileToDisk(File(fileID, "wav", 1), diskID), "Should work")
+        # basic test, the same lists as getCloseFiles
+        closest = Solution.getCloseFilesMany([1, 2, 5])
+        self.assertDictEqual({1: [2, 3, 4], 2: [1, 4], 5: [1, 2, 3, 4]}, closest, "Should work")
+        for fileID, files in closest.items():
+            self.assertListEqual(Solution.getCloseFiles(fileID), files, "Same lists as getCloseFiles")
+        # check duplicate IDs
+        self.assertDictEqual({1: [2, 3, 4], 2: [1, 4]}, Solution.getCloseFilesMany([1, 2, 1, 1, 2]),
+                             "Each file once, with its list once")
+        # check a file that doesn't exist next to ones that do
+        self.assertDictEqual({9: [1, 2, 3, 4, 5], 3: [1, 4]}, Solution.getCloseFilesMany([9, 3]),
+                             "Like getCloseFiles, a file on no disk is close to every file")
+        self.assertListEqual([9, 3], list(Solution.getCloseFilesMany(iter([9, 3]))), "Keys in the given order")
+
 
 # *** DO NOT RUN EACH TEST MANUALLY ***
 if __name__ == '__main__':
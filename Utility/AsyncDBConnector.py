@@ -0,0 +1,195 @@
+import asyncio
+import asyncpg
+from collections import namedtuple
+from contextlib import contextmanager
+from psycopg2 import extensions
+from Utility.DBConnector import DBConnector, ResultSet, Statement
+from Utility.Exceptions import DatabaseException
+from Utility import Columns
+import io
+from typing import Union
+
+
+@contextmanager
+def constraint_violations():
+    # translate PostgreSQL integrity errors into the matching DatabaseException, like DBConnector does
+    try:
+        yield
+    except asyncpg.NotNullViolationError:
+        raise DatabaseException.NOT_NULL_VIOLATION("NOT_NULL_VIOLATION")
+    except asyncpg.ForeignKeyViolationError:
+        raise DatabaseException.FOREIGN_KEY_VIOLATION("FOREIGN_KEY_VIOLATION")
+    except asyncpg.UniqueViolationError:
+        raise DatabaseException.UNIQUE_VIOLATION("UNIQUE_VIOLATION")
+    except asyncpg.CheckViolationError:
+        raise DatabaseException.CHECK_VIOLATION("CHECK_VIOLATION")
+
+
+# what ResultSet reads from a column of a cursor description
+Column = namedtuple("Column", ("name", "type_code"), defaults=(None,))
+
+
+def result_set(records) -> ResultSet:
+    if len(records) == 0:
+        return ResultSet()
+    return ResultSet([Column(name) for name in records[0].keys()], records)  # Records index like tuples
+
+
+def affected_rows(status: str) -> int:
+    # "INSERT 0 1", "UPDATE 3", "CREATE TABLE", ...
+    count = status.rsplit(" ", 1)[-1]
+    return int(count) if count.isdigit() else 0
+
+
+async def release_without_reset(connection):
+    # connections come back outside of any transaction, with no session state to reset (asyncpg's default
+    # reset would cost every checkout a round-trip)
+    if connection.is_in_transaction():
+        await connection.execute("ROLLBACK")
+
+
+class AsyncDBConnector:
+    # the asyncio counterpart of DBConnector, on an asyncpg pool. asyncpg connections belong to the event loop that
+    # opened them, so there is one pool per running loop. Connections are obtained with
+    #   conn = await AsyncDBConnector.connect()
+    # and given back with await conn.close(). Statements are prepared once per connection by asyncpg's statement cache
+    __pools = {}  # event loop -> task creating its pool
+    pool_settings = {
+        "minconn": 1,
+        "maxconn": 10,
+        "idle_timeout": 300.0,
+        "checkout_timeout": 30.0,
+    }
+
+    def __init__(self, pool, connection):
+        self.__pool = pool
+        self.connection = connection
+
+    @staticmethod
+    async def connect() -> "AsyncDBConnector":
+        try:
+            pool = await AsyncDBConnector.get_pool()
+            connection = await pool.acquire(timeout=AsyncDBConnector.pool_settings["checkout_timeout"])
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError,
+                DatabaseException.database_ini_ERROR):
+            raise DatabaseException.ConnectionInvalid("Could not connect to database")
+        return AsyncDBConnector(pool, connection)
+
+    # return the connection to the pool, safe to call more than once
+    async def close(self):
+        if self.connection is not None:
+            await self.__pool.release(self.connection)
+        self.connection = None
+
+    # the pool of the running event loop, created on first use from pool_settings
+    @staticmethod
+    async def get_pool() -> asyncpg.Pool:
+        loop = asyncio.get_running_loop()
+        pools = AsyncDBConnector.__pools
+        creating = pools.get(loop)
+        if creating is not None and creating.done() and not creating.cancelled() and creating.exception() is None:
+            return creating.result()
+        if creating is None:
+            for closed in [other for other in pools if other.is_closed()]:
+                del pools[closed]
+            creating = pools[loop] = loop.create_task(AsyncDBConnector.__create_pool())
+        try:
+            return await asyncio.shield(creating)
+        except Exception:
+            if pools.get(loop) is creating:
+                del pools[loop]
+            raise
+
+    # close the running loop's pool (await it before the loop ends), it is recreated on next use
+    @staticmethod
+    async def close_pool():
+        creating = AsyncDBConnector.__pools.pop(asyncio.get_running_loop(), None)
+        if creating is not None:
+            try:
+                pool = await creating
+            except Exception:
+                return
+            await pool.close()
+
+    # change pool sizing/timeouts, pools created from then on use the new settings
+    @staticmethod
+    def configure_pool(**settings):
+        unknown = set(settings) - set(AsyncDBConnector.pool_settings)
+        if unknown:
+            raise ValueError("unknown pool settings: " + ", ".join(sorted(unknown)))
+        AsyncDBConnector.pool_settings = dict(AsyncDBConnector.pool_settings, **settings)
+
+    @staticmethod
+    async def __create_pool() -> asyncpg.Pool:
+        settings = AsyncDBConnector.pool_settings
+        return await asyncpg.create_pool(min_size=settings["minconn"], max_size=settings["maxconn"],
+                                         max_inactive_connection_lifetime=settings["idle_timeout"],
+                                         reset=release_without_reset, **AsyncDBConnector.connect_kwargs())
+
+    # DBConnector's connection parameters, as asyncpg.connect arguments
+    @staticmethod
+    def connect_kwargs() -> dict:
+        params = DBConnector.connection_params()
+        if "dsn" in params:
+            params = extensions.parse_dsn(params["dsn"])
+        kwargs = {}
+        for key, value in params.items():
+            if key in ("dbname", "database"):
+                kwargs["database"] = value
+            elif key == "port":
+                kwargs["port"] = int(value)
+            elif key == "connect_timeout":
+                kwargs["timeout"] = float(value)
+            elif key == "sslmode":
+                kwargs["ssl"] = value
+            elif key in ("host", "user", "password", "passfile"):
+                kwargs[key] = value
+            else:  # run-time parameters such as application_name
+                kwargs.setdefault("server_settings", {})[key] = value
+        return kwargs
+
+    # an asyncpg transaction, to be used as "async with conn.transaction():". Nested ones are savepoints
+    def transaction(self):
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        return self.connection.transaction()
+
+    # executes the query, returns the number of rows effected and a ResultSet (for a query that selects)
+    # a Statement is executed with its params, raw SQL may hold several statements and takes no params
+    async def execute(self, query: Union[str, Statement], params=None) -> (int, ResultSet):
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        with constraint_violations():
+            if not isinstance(query, Statement):
+                return affected_rows(await self.connection.execute(query)), ResultSet()
+            if query.returns_rows:
+                records = await self.connection.fetch(query.text, *params)
+                return len(records), result_set(records)
+            return affected_rows(await self.connection.execute(query.text, *params)), ResultSet()
+
+    # DBConnector.fetch_columns for a Statement
+    async def fetch_columns(self, query: Statement, params=(), binary=None) -> dict:
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        Columns.require_numpy()
+        with constraint_violations():
+            prepared = await self.connection.prepare(query.text)
+            description = [Column(attribute.name, attribute.type.oid) for attribute in prepared.get_attributes()]
+            if binary is False or (binary is None and not Columns.fixed_width([c.type_code for c in description])):
+                return ResultSet(description, await prepared.fetch(*params)).to_numpy()
+            data = io.BytesIO()
+            await self.connection.copy_from_query(query.text, *params, output=data, format="binary")
+        columns = Columns.from_binary_copy(data.getbuffer(), [column.type_code for column in description])
+        return dict(zip([column.name for column in description], columns))
+
+    # inserts many rows with one binary COPY; constraint violations are raised like in execute
+    async def insert_rows(self, table: str, columns, rows) -> int:
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        if len(rows) == 0:
+            return 0
+        schema, _, name = table.rpartition(".")
+        with constraint_violations():
+            await self.connection.copy_records_to_table(name, schema_name=schema or None, records=rows,
+                                                        columns=[column.lower() for column in columns])
+        return len(rows)
@@ -0,0 +1,241 @@
+import inspect
+import threading
+from Utility.Exceptions import DatabaseException
+from Utility.Status import Status
+
+# What the Solution backends share: the decorators turning the results and the errors of their calls into
+# Statuses, and the unit of work of their Sessions. The decorators take coroutine functions (AsyncSolution) as well
+# as functions. A backend adds the errors of its database driver to DATABASE_ERRORS and passes them as
+# database_errors
+
+# the errors a call reports as Status.ERROR
+DATABASE_ERRORS = (DatabaseException.UNKNOWN_ERROR, DatabaseException.ConnectionInvalid)
+
+
+def guarded(func, errors, on_error, on_result):
+    # func, returning on_error(e) if it raises one of errors and on_result(its result) otherwise
+    if inspect.iscoroutinefunction(func):
+        async def inner(*args, **kwargs):
+            try:
+                result = await func(*args, **kwargs)
+            except errors as e:
+                return on_error(e)
+            return on_result(result)
+
+        return inner
+
+    def inner(*args, **kwargs):
+        try:
+            result = func(*args, **kwargs)
+        except errors as e:
+            return on_error(e)
+        return on_result(result)
+
+    return inner
+
+
+def assert_exists(sql_func):
+    # Ensures at least 1 tuple was returned from sql_func, else returns Status.NOT_EXISTS
+    def existing(result):
+        num_results, attributes = result
+        if num_results == 0 or (not attributes.isEmpty() and bool(attributes[0]) and all(elem is None for elem in attributes[0].values())):
+            return Status.NOT_EXISTS
+        return attributes
+
+    return guarded(sql_func, DatabaseException.FOREIGN_KEY_VIOLATION, lambda e: Status.NOT_EXISTS, existing)
+
+
+def assert_no_database_error(sql_func, database_errors=DATABASE_ERRORS):
+    # catches database and connection errors, returning Status.ERROR
+    return guarded(sql_func, database_errors, lambda e: Status.ERROR, lambda result: result)
+
+
+def return_status(sql_func, database_errors=DATABASE_ERRORS):
+    # Catch exceptions thrown by an SQL query and return the appropriate Status
+    def error_status(e):
+        if isinstance(e, (DatabaseException.CHECK_VIOLATION, DatabaseException.NOT_NULL_VIOLATION)):
+            return Status.BAD_PARAMS  # in case of illegal parameters.
+        if isinstance(e, DatabaseException.UNIQUE_VIOLATION):
+            return Status.ALREADY_EXISTS  # if a file/disk/ram with the same ID already exists. *
+        if isinstance(e, DatabaseException.FOREIGN_KEY_VIOLATION):
+            return Status.NOT_EXISTS
+        return Status.ERROR  # in case of a database error
+
+    def result_status(result):
+        if result == Status.NOT_EXISTS:  # output overriden by assert_exists decorator
+            return Status.NOT_EXISTS
+        return Status.OK
+
+    return guarded(sql_func, (DatabaseException.CHECK_VIOLATION, DatabaseException.NOT_NULL_VIOLATION,
+                              DatabaseException.UNIQUE_VIOLATION, DatabaseException.FOREIGN_KEY_VIOLATION)
+                   + database_errors, error_status, result_status)
+
+
+def invalidate_cache(invalidate, current_session):
+    # Drop the cache entries a write may have changed, once it is over (successful or not)
+    # Input to decorator: function taking the same arguments as the decorated write, and the backend's
+    # current_session
+    def decorator(write_func):
+        def after_write(*args, **kwargs):
+            invalidate_after_write(lambda: invalidate(*args, **kwargs), current_session())
+
+        if inspect.iscoroutinefunction(write_func):
+            async def inner(*args, **kwargs):
+                try:
+                    return await write_func(*args, **kwargs)
+                finally:
+                    after_write(*args, **kwargs)
+
+            return inner
+
+        def inner(*args, **kwargs):
+            try:
+                return write_func(*args, **kwargs)
+            finally:
+                after_write(*args, **kwargs)
+
+        return inner
+
+    return decorator
+
+
+def invalidate_after_write(invalidate, session):
+    invalidate()
+    if session is not None:
+        # other threads or tasks may cache the old rows until the session commits, drop them again then
+        session.on_end(invalidate)
+
+
+def required_ids(*ids):
+    # IDs passed on their own (not as attributes of a File/Disk/RAM) were written into the query text, so a
+    # missing one failed the query. Bound as NULL it would match no row instead, fail it the same way
+    if any(id is None for id in ids):
+        raise DatabaseException.UNKNOWN_ERROR("missing ID")
+    return ids
+
+
+def placement_statuses(placements, free_space: dict, existing_files, existing_placements):
+    # The Statuses of placeFiles' (fileID, size, diskID) rows, as if each was placed with addFileToDisk in order (a row
+    # without a diskID is ERROR, one without a fileID BAD_PARAMS), given the free space of the existing disks by
+    # diskID, the existing fileIDs and the existing (fileID, diskID) placements.
+    # Returns (statuses, the accepted (fileID, diskID) placements, the space they take by diskID)
+    free_space = dict(free_space)
+    existing_placements = set(existing_placements)
+    statuses = []
+    accepted = []
+    taken = {}
+    for fileID, size, diskID in placements:
+        if diskID is None:
+            statuses.append(Status.ERROR)
+        elif fileID is None:
+            statuses.append(Status.BAD_PARAMS)
+        elif (fileID, diskID) in existing_placements:
+            statuses.append(Status.ALREADY_EXISTS)
+        elif fileID not in existing_files or diskID not in free_space:
+            statuses.append(Status.NOT_EXISTS)
+        elif size is None or free_space[diskID] - size < 0:
+            statuses.append(Status.BAD_PARAMS)
+        else:
+            statuses.append(Status.OK)
+            free_space[diskID] -= size
+            taken[diskID] = taken.get(diskID, 0) + size
+            existing_placements.add((fileID, diskID))
+            accepted.append((fileID, diskID))
+    return statuses, accepted, taken
+
+
+# ----------------------------------------
+# Unit of work
+
+class UnitOfWork:
+    # What the Sessions of the backends share: functions called through the session (s.addDisk(...)), or inside its
+    # with block on the thread that opened it, run in the session, and the session ends with its block (undone if
+    # the block raises). A session opened inside another one is nested in the outer one.
+    # A subclass says how a session begins and ends (begin, end, and close for the outermost one), keeps the
+    # session of each thread in its own active, and finds the functions called through it in functions (the
+    # backend's globals). An asyncio backend keeps the session of each task instead, overriding current and
+    # set_current, and enters it with async with (see AsyncSolution.Session)
+    active = threading.local()
+    functions = {}
+
+    def __init__(self):
+        self.outer = None
+        self.__on_end = []
+
+    @classmethod
+    def current(cls):
+        # the session opened (or being used) by the calling thread, None outside of one
+        return getattr(cls.active, "session", None)
+
+    @classmethod
+    def set_current(cls, session):
+        cls.active.session = session
+
+    def __enter__(self):
+        self.outer = self.current()
+        self.begin()
+        self.set_current(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.end(commit=exc_type is None)
+        finally:
+            if self.leave():
+                self.close()
+                self.ended()
+        return False
+
+    def leave(self) -> bool:
+        # makes the outer session current again, which takes over the callbacks; True for the outermost session
+        self.set_current(self.outer)
+        if self.outer is not None:
+            self.outer.__on_end += self.__on_end
+            return False
+        return True
+
+    def ended(self):
+        # the outermost session has committed or rolled back
+        for callback in self.__on_end:
+            callback()
+
+    def begin(self):
+        raise NotImplementedError
+
+    def end(self, commit: bool):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    # callback() runs once the outermost session has committed or rolled back
+    def on_end(self, callback):
+        self.__on_end.append(callback)
+
+    # s.addDisk(...) calls the backend's addDisk(...) in this session, from whichever thread it is called on
+    # (await s.addDisk(...) for a coroutine function)
+    def __getattr__(self, name):
+        function = self.functions.get(name)
+        if name.startswith("_") or not callable(function) or isinstance(function, type):
+            raise AttributeError(name)
+
+        if inspect.iscoroutinefunction(function):
+            async def call(*args, **kwargs):
+                caller_session = self.current()
+                self.set_current(self)
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    self.set_current(caller_session)
+
+            return call
+
+        def call(*args, **kwargs):
+            caller_session = self.current()
+            self.set_current(self)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.set_current(caller_session)
+
+        return call
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    # thread-safe least-recently-used cache with an optional time-to-live per entry
+    #   maxsize: number of entries kept, 0 disables the cache
+    #   ttl:     seconds an entry may be served for, None to keep it until evicted or invalidated
+    def __init__(self, maxsize=4096, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.__entries = OrderedDict()  # key -> (value, expires at), least recently used first
+        self.__lock = threading.Lock()
+        # bumped by every invalidation, so a value loaded before a concurrent write is never stored after it
+        self.__generation = 0
+        self.__stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    # the cached value for key, or the result of loader() which is cached unless it is None
+    def get_or_load(self, key, loader):
+        hit, value, generation = self.__lookup(key)
+        if hit:
+            return value
+        value = loader()
+        self.__store(key, value, generation)
+        return value
+
+    # get_or_load for a loader returning an awaitable (the cache is never locked while it is awaited)
+    async def get_or_load_async(self, key, loader):
+        hit, value, generation = self.__lookup(key)
+        if hit:
+            return value
+        value = await loader()
+        self.__store(key, value, generation)
+        return value
+
+    def __lookup(self, key):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self.__entries.move_to_end(key)
+                    self.__stats["hits"] += 1
+                    return True, value, None
+                del self.__entries[key]
+                self.__stats["expirations"] += 1
+            self.__stats["misses"] += 1
+            return False, None, self.__generation
+
+    def __store(self, key, value, generation):
+        if value is not None and self.maxsize > 0:
+            with self.__lock:
+                if generation == self.__generation:
+                    expires = None if self.ttl is None else time.monotonic() + self.ttl
+                    self.__entries[key] = (value, expires)
+                    self.__entries.move_to_end(key)
+                    while len(self.__entries) > self.maxsize:
+                        self.__entries.popitem(last=False)
+                        self.__stats["evictions"] += 1
+
+    def invalidate(self, *keys):
+        with self.__lock:
+            self.__generation += 1
+            for key in keys:
+                if self.__entries.pop(key, None) is not None:
+                    self.__stats["invalidations"] += 1
+
+    def clear(self):
+        with self.__lock:
+            self.__generation += 1
+            self.__stats["invalidations"] += len(self.__entries)
+            self.__entries.clear()
+
+    # change the size/ttl; existing entries are dropped so they all follow the new ttl
+    def configure(self, maxsize, ttl):
+        with self.__lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self.__generation += 1
+            self.__entries.clear()
+
+    def stats(self) -> dict:
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats.update({"size": len(self.__entries), "maxsize": self.maxsize, "ttl": self.ttl})
+            return stats
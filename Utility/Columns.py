@@ -0,0 +1,131 @@
+import struct
+from array import array
+try:
+    import numpy
+except ImportError:  # optional, only needed for numpy exports
+    numpy = None
+
+# numpy types of the PostgreSQL types (by OID) that have one, the other columns are object arrays
+NUMPY_TYPES = {
+    16: "bool",
+    20: "int64",
+    21: "int16",
+    23: "int32",
+    700: "float32",
+    701: "float64",
+}
+# the big-endian layout of the fixed-width types in PostgreSQL's binary format
+BINARY_TYPES = {
+    16: "?",
+    20: ">i8",
+    21: ">i2",
+    23: ">i4",
+    700: ">f4",
+    701: ">f8",
+}
+TEXT_TYPES = (25, 1042, 1043)  # text, char(n), varchar(n)
+
+BINARY_COPY_SIGNATURE = b"PGCOPY\n\377\r\n\0"
+
+
+def fixed_width(type_codes) -> bool:
+    return all(type_code in BINARY_TYPES for type_code in type_codes)
+
+
+def require_numpy():
+    if numpy is None:
+        raise ImportError("numpy is needed for numpy exports")
+
+
+def numpy_column(values: list, type_code):
+    # an array of the values of a column of the given type. Integers and floats with NULLs become float64 with
+    # NaN for them, other columns with NULLs keep None in an object array
+    require_numpy()
+    dtype = NUMPY_TYPES.get(type_code)
+    if dtype is None:
+        column = numpy.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+    if any(value is None for value in values):
+        if dtype == "bool":
+            return numpy_column(values, None)
+        return numpy.array([numpy.nan if value is None else value for value in values], dtype="float64")
+    return numpy.array(values, dtype=dtype)
+
+
+def from_binary_copy(data: bytes, type_codes) -> list:
+    # the columns of the output of COPY ... TO STDOUT WITH (FORMAT binary), one array per type in type_codes.
+    # Rows of fixed-width columns without NULLs are decoded in one numpy pass, other rows field by field
+    require_numpy()
+    for type_code in type_codes:
+        if type_code not in BINARY_TYPES and type_code not in TEXT_TYPES:
+            raise ValueError(f"a column of type {type_code} can't be exported in binary, cast it to text")
+    if data[:len(BINARY_COPY_SIGNATURE)] != BINARY_COPY_SIGNATURE:
+        raise ValueError("not the output of a binary COPY")
+    offset = len(BINARY_COPY_SIGNATURE) + 4  # flags
+    offset += 4 + struct.unpack_from(">i", data, offset)[0]  # header extension
+    body = memoryview(data)[offset:-2]  # the rows, without the trailer
+
+    if fixed_width(type_codes):
+        columns = fixed_width_columns(body, type_codes)
+        if columns is not None:
+            return columns
+
+    data = bytes(data)
+    fields = binary_fields(data, offset, type_codes)
+    return [binary_column(data, values, type_code) for values, type_code in zip(fields, type_codes)]
+
+
+def fixed_width_columns(body: memoryview, type_codes):
+    # every row has the same layout (field count, then length and value of each field) unless there are NULLs
+    layout = [("count", ">i2")]
+    for i, type_code in enumerate(type_codes):
+        layout += [(f"length{i}", ">i4"), (f"value{i}", BINARY_TYPES[type_code])]
+    layout = numpy.dtype(layout)
+    if len(body) % layout.itemsize != 0:
+        return None
+    rows = numpy.frombuffer(body, dtype=layout)
+    if not (rows["count"] == len(type_codes)).all():
+        return None
+    for i, type_code in enumerate(type_codes):
+        if not (rows[f"length{i}"] == numpy.dtype(BINARY_TYPES[type_code]).itemsize).all():
+            return None
+    return [rows[f"value{i}"].astype(NUMPY_TYPES[type_code]) for i, type_code in enumerate(type_codes)]
+
+
+def binary_fields(data: bytes, offset, type_codes) -> list:
+    # for each column, the decoded strings of a text column (None for NULL) or the offsets in data of the values of
+    # a fixed-width one (-1 for NULL)
+    fields = [([], True) if type_code in TEXT_TYPES else (array("q"), False) for type_code in type_codes]
+    unpack_length = struct.Struct(">i").unpack_from
+    end = len(data) - 2  # the trailer
+    while offset < end:
+        offset += 2  # field count
+        for values, text in fields:
+            length = unpack_length(data, offset)[0]
+            offset += 4
+            if length == -1:
+                values.append(None if text else -1)
+            elif text:
+                values.append(data[offset:offset + length].decode())
+                offset += length
+            else:
+                values.append(offset)
+                offset += length
+    return [values for values, _ in fields]
+
+
+def binary_column(data: bytes, values, type_code):
+    if type_code in TEXT_TYPES:
+        return numpy_column(values, type_code)
+    layout = numpy.dtype(BINARY_TYPES[type_code])
+    offsets = numpy.frombuffer(values, dtype="int64") if len(values) > 0 else numpy.empty(0, dtype="int64")
+    nulls = offsets < 0
+    # gather the bytes of every value at once
+    starts = numpy.where(nulls, 0, offsets)
+    raw = numpy.frombuffer(data, dtype="uint8")[starts[:, None] + numpy.arange(layout.itemsize)]
+    column = raw.view(layout).ravel().astype(NUMPY_TYPES[type_code])
+    if nulls.any():
+        values = column.tolist()
+        return numpy_column([None if null else value for null, value in zip(nulls.tolist(), values)], type_code)
+    return column
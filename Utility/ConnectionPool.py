@@ -0,0 +1,214 @@
+import os
+import threading
+import time
+from collections import deque
+from psycopg2 import extensions
+from Utility.Exceptions import DatabaseException
+
+
+class PooledConnection:
+    # a raw psycopg2 connection plus the bookkeeping the pool needs to manage it
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.prepared = set()  # names of the statements already PREPAREd on this connection
+
+
+class ConnectionPool:
+    # bounded, thread-safe pool of psycopg2 connections
+    #   connect:               callable returning a new psycopg2 connection
+    #   minconn:               connections opened up front and never reaped for idleness
+    #   maxconn:               hard limit on open connections, checkouts block when reached
+    #   idle_timeout:          seconds an idle connection above minconn is kept before being closed
+    #   checkout_timeout:      seconds a checkout waits for a free connection before failing
+    #   health_check_interval: connections idle for longer than this are pinged on checkout
+    def __init__(self, connect, minconn=1, maxconn=10, idle_timeout=300.0, checkout_timeout=30.0,
+                 health_check_interval=30.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("pool sizes must satisfy 0 <= minconn <= maxconn and maxconn >= 1")
+        self.connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+
+        self.__lock = threading.Condition()
+        self.__idle = deque()  # most recently returned connection on the right
+        self.__in_use = set()
+        self.__opening = 0  # slots reserved by checkouts that are still connecting
+        self.__pid = os.getpid()
+        self.__closed = False
+        self.__stats = {
+            "created": 0,
+            "discarded": 0,
+            "reaped": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+        }
+
+        for _ in range(minconn):
+            pooled = self.__open()
+            with self.__lock:
+                self.__stats["created"] += 1
+                self.__idle.append(pooled)
+
+    # take a healthy connection out of the pool, opening a new one if none is idle and the pool isn't full
+    # a slot is reserved under the lock, connecting and pinging happen outside it so a slow server
+    # doesn't hold up checkouts and returns in other threads
+    def getconn(self) -> PooledConnection:
+        deadline = time.monotonic() + self.checkout_timeout
+        waited = False
+        wait_start = time.monotonic()
+        while True:
+            with self.__lock:
+                self.__check_fork()
+                while True:
+                    if self.__closed:
+                        raise DatabaseException.ConnectionInvalid("Connection pool is closed")
+                    self.__reap_idle()
+                    if self.__idle:
+                        pooled = self.__idle.pop()
+                        self.__in_use.add(pooled)
+                        break
+                    if len(self.__in_use) + self.__opening < self.maxconn:
+                        pooled = None
+                        self.__opening += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.__stats["timeouts"] += 1
+                        raise DatabaseException.ConnectionInvalid("Timed out waiting for a pooled connection")
+                    waited = True
+                    self.__lock.wait(remaining)
+
+            if pooled is None:
+                return self.__checkout_new(waited, wait_start)
+            if self.__is_healthy(pooled):
+                with self.__lock:
+                    return self.__checkout(pooled, waited, wait_start)
+            with self.__lock:
+                self.__stats["health_check_failures"] += 1
+                self.__in_use.discard(pooled)
+                self.__discard(pooled)
+                self.__lock.notify()
+
+    # give a connection back to the pool, resetting it so the next user starts from a clean session
+    def putconn(self, pooled: PooledConnection, discard=False):
+        with self.__lock:
+            if pooled not in self.__in_use:
+                return  # already returned, or handed out before a fork
+            self.__in_use.discard(pooled)
+            if discard or self.__closed or not self.__reset(pooled):
+                self.__discard(pooled)
+            else:
+                pooled.last_used = time.monotonic()
+                self.__idle.append(pooled)
+            self.__lock.notify()
+
+    # close every idle connection; connections still checked out are closed when they are returned
+    def closeall(self):
+        with self.__lock:
+            self.__closed = True
+            while self.__idle:
+                self.__discard(self.__idle.pop())
+            self.__lock.notify_all()
+
+    def stats(self) -> dict:
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats.update({
+                "minconn": self.minconn,
+                "maxconn": self.maxconn,
+                "size": len(self.__idle) + len(self.__in_use) + self.__opening,
+                "idle": len(self.__idle),
+                "in_use": len(self.__in_use),
+            })
+            return stats
+
+    def __open(self) -> PooledConnection:
+        try:
+            connection = self.connect()
+        except Exception:
+            raise DatabaseException.ConnectionInvalid("Could not connect to database")
+        return PooledConnection(connection)
+
+    # connect into the slot reserved by getconn, giving the slot back if that fails
+    def __checkout_new(self, waited, wait_start) -> PooledConnection:
+        try:
+            pooled = self.__open()
+        except DatabaseException.ConnectionInvalid:
+            with self.__lock:
+                self.__opening -= 1
+                self.__lock.notify()
+            raise
+        with self.__lock:
+            self.__opening -= 1
+            self.__stats["created"] += 1
+            if self.__closed:
+                self.__discard(pooled)
+                raise DatabaseException.ConnectionInvalid("Connection pool is closed")
+            return self.__checkout(pooled, waited, wait_start)
+
+    def __checkout(self, pooled, waited, wait_start) -> PooledConnection:
+        self.__in_use.add(pooled)
+        self.__stats["checkouts"] += 1
+        if waited:
+            self.__stats["waits"] += 1
+            self.__stats["wait_time"] += time.monotonic() - wait_start
+        return pooled
+
+    def __discard(self, pooled):
+        self.__stats["discarded"] += 1
+        try:
+            pooled.connection.close()
+        except Exception:
+            pass
+
+    def __is_healthy(self, pooled) -> bool:
+        connection = pooled.connection
+        if connection.closed:
+            return False
+        if time.monotonic() - pooled.last_used < self.health_check_interval:
+            return True
+        # the server may have dropped a long-idle connection, make sure it still answers
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def __reset(self, pooled) -> bool:
+        connection = pooled.connection
+        if connection.closed:
+            return False
+        try:
+            if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            if connection.autocommit:
+                connection.autocommit = False
+        except Exception:
+            return False
+        return True
+
+    def __reap_idle(self):
+        # the deque is ordered by last use, so stale connections are always on the left
+        now = time.monotonic()
+        while len(self.__idle) + len(self.__in_use) + self.__opening > self.minconn and self.__idle and \
+                now - self.__idle[0].last_used > self.idle_timeout:
+            self.__stats["reaped"] += 1
+            self.__discard(self.__idle.popleft())
+
+    def __check_fork(self):
+        # connections inherited from a parent process share its sockets, forget them without closing
+        if self.__pid != os.getpid():
+            self.__pid = os.getpid()
+            self.__idle.clear()
+            self.__in_use.clear()
+            self.__opening = 0
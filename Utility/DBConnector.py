@@ -1,156 +1,954 @@
-import psycopg2
-from psycopg2 import errors, sql
-from configparser import ConfigParser
-from Utility.Exceptions import DatabaseException
-import os
-from typing import Union
-
-
-class ResultSetDict(dict):
-    def __getitem__(self, item):
-        if type(item) is not str:
-            return None
-        return super().__getitem__(item.lower())
-
-
-class ResultSet:
-    # constructor
-    def __init__(self, description=None, results=None):
-        self.rows = []
-        self.cols_header = []
-        self.cols = ResultSetDict()
-        self.__fromQuery(description, results)
-
-    def __getitem__(self, row):
-        return self.__getRow(row)
-
-    # so you can use print(ResultSet)
-    def __str__(self):
-        string = ""
-        for col in self.cols_header:
-            string += str(col) + "   "
-        string += '\n'
-        for row in self.rows:
-            for val in row:
-                string += str(val) + "   "
-            string += '\n'
-        return string
-
-    # what is the size of the ResultSet?
-    def size(self):
-        return len(self.rows)
-
-    # is the ResultSet empty?
-    def isEmpty(self):
-        return self.size() == 0
-
-    def __getRow(self, row: int):
-        if len(self.rows) <= row:
-            print('Invalid row ' + str(row))
-            return ResultSetDict()
-        row_to_return = ResultSetDict()
-        for val, col in zip(self.rows[row], self.cols_header):
-            row_to_return[col] = val
-        return row_to_return
-
-    def __fromQuery(self, description, results: list):
-        if results is None or len(results) == 0:  # no results
-            self.cols = ResultSetDict()
-        else:
-            self.rows = results.copy()
-            self.cols_header = [d.name for d in description]
-            self.cols = ResultSetDict()
-            for col, index in zip(self.cols_header, range(len(results[0]))):
-                self.cols[col] = index
-
-
-class DBConnector:
-    # constructor
-    def __init__(self):
-        try:
-            # Obtain the configuration parameters
-            params = DBConnector.__config()
-            self.connection = psycopg2.connect(**params)
-            self.connection.autocommit = False
-            self.cursor = self.connection.cursor()
-        except Exception as e:
-            self.connection = None
-            self.cursor = None
-            raise DatabaseException.ConnectionInvalid("Could not connect to database")
-
-    # close connection
-    def close(self):
-        if self.cursor is not None:
-            self.cursor.close()
-        if self.connection is not None:
-            self.connection.close()
-
-    # commit connection's changes
-    def commit(self):
-        if self.connection is not None:
-            try:
-                self.connection.commit()
-            except Exception:
-                raise DatabaseException.ConnectionInvalid("Could not commit changes")
-
-    # rollback connection's changes
-    def rollback(self):
-        if self.connection is not None:
-            try:
-                self.connection.rollback()
-            except Exception:
-                raise DatabaseException.ConnectionInvalid("Could not rollback changes")
-
-    # executes the query, if it is SELECT you may ask to print the results with printSchema
-    # returns the number of rows effected and a ResultSet (for SELECT)
-    def execute(self, query: Union[str, sql.Composed], printSchema=False) -> (int, ResultSet):
-        if self.connection is None:
-            raise DatabaseException.ConnectionInvalid("Connection Invalid")
-
-        # try execute the query
-        try:
-            self.cursor.execute(query)
-            row_effected = max(self.cursor.rowcount, 0)
-        except errors.lookup("23502"):
-            raise DatabaseException.NOT_NULL_VIOLATION("NOT_NULL_VIOLATION")
-        except errors.lookup("23503"):
-            raise DatabaseException.FOREIGN_KEY_VIOLATION("FOREIGN_KEY_VIOLATION")
-        except errors.lookup("23505"):
-            raise DatabaseException.UNIQUE_VIOLATION("UNIQUE_VIOLATION")
-        except errors.lookup("23514"):
-            raise DatabaseException.CHECK_VIOLATION("CHECK_VIOLATION")
-
-        # get entries in case of SELECT
-        if self.cursor.description is not None:
-            entries = ResultSet(self.cursor.description, self.cursor.fetchall())
-        else:
-            entries = ResultSet()
-
-        # print SELECT entries
-        if printSchema:
-            print(entries)
-
-        return row_effected, entries
-
-    # grant credentials
-    @staticmethod
-    def __config(filename=os.path.join(os.path.join(os.getcwd(), "Utility"), 'database.ini'),
-                 section='postgresql'):
-        # create a parser
-        parser = ConfigParser()
-        # read config file
-        parser.read(filename)
-
-        # get section
-        db = {}
-        if parser.has_section(section):
-            params = parser.items(section)
-            for param in params:
-                db[param[0]] = param[1]
-        else:
-            # file not found
-            db = DBConnector.__config(
-                filename=os.path.join(os.path.join(os.path.dirname(os.getcwd()), 'Utility'), 'database.ini'))
-            if db is None:
-                raise DatabaseException.database_ini_ERROR("Please modify database.ini file under Utility")
-        return db
+import psycopg2
+from psycopg2 import errors, extensions, extras, sql
+from configparser import ConfigParser
+from contextlib import contextmanager
+from Utility.Exceptions import DatabaseException
+from Utility.ConnectionPool import ConnectionPool
+from Utility.Replicas import ReplicaSet
+from Utility import Columns, SQLiteDialect
+from array import array
+from collections import namedtuple
+from operator import itemgetter
+import io
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Union
+
+
+@contextmanager
+def constraint_violations():
+    # translate PostgreSQL integrity errors into the matching DatabaseException
+    try:
+        yield
+    except errors.lookup("23502"):
+        raise DatabaseException.NOT_NULL_VIOLATION("NOT_NULL_VIOLATION")
+    except errors.lookup("23503"):
+        raise DatabaseException.FOREIGN_KEY_VIOLATION("FOREIGN_KEY_VIOLATION")
+    except errors.lookup("23505"):
+        raise DatabaseException.UNIQUE_VIOLATION("UNIQUE_VIOLATION")
+    except errors.lookup("23514"):
+        raise DatabaseException.CHECK_VIOLATION("CHECK_VIOLATION")
+
+
+def copy_text(val) -> str:
+    # a single value in COPY's text format
+    if val is None:
+        return "\\N"
+    return str(val).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class ResultSetDict(dict):
+    def __getitem__(self, item):
+        if type(item) is not str:
+            return None
+        return super().__getitem__(item.lower())
+
+
+class ResultSetRow:
+    # a row of a ResultSet: its values, as fetched, and the column -> index map shared by the rows of the ResultSet.
+    # Reads like a ResultSetDict (row["fileID"], dict(row), row.values()) without building one per row
+    __slots__ = ("__values", "__cols")
+
+    def __init__(self, values, cols: ResultSetDict):
+        self.__values = values
+        self.__cols = cols
+
+    def __getitem__(self, item):
+        if type(item) is not str:
+            return None
+        return self.__values[self.__cols[item]]
+
+    def get(self, item, default=None):
+        return self[item] if item in self else default
+
+    def __contains__(self, item):
+        return type(item) is str and item.lower() in self.__cols
+
+    def __len__(self):
+        return len(self.__cols)
+
+    def __iter__(self):
+        return iter(self.__cols)
+
+    def keys(self):
+        return self.__cols.keys()
+
+    def values(self):
+        return [self.__values[index] for index in self.__cols.values()]
+
+    def items(self):
+        return [(col, self.__values[index]) for col, index in self.__cols.items()]
+
+    def __eq__(self, other):
+        if isinstance(other, (ResultSetRow, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class ResultSet:
+    # constructor
+    # results is kept as is, not copied. With a (server-side) cursor, results are the rows fetched so far and the
+    # rest are fetched from the cursor when they are needed (see DBConnector.stream)
+    def __init__(self, description=None, results=None, cursor=None):
+        self.rows = []
+        self.cols_header = []
+        self.cols = ResultSetDict()
+        self.__cursor = cursor
+        self.__streamed = False  # the rows were handed out by __iter__ or to_columns without being kept
+        self.__description = description
+        self.__fromQuery(description, results)
+
+    def __getitem__(self, row):
+        self.__fetchAll()
+        return self.__getRow(row)
+
+    # the rows, as returned by __getitem__. A ResultSet with a cursor that wasn't read by index yet hands its rows out
+    # as they are fetched without keeping them, so it can be iterated only once and not read by index afterwards
+    def __iter__(self):
+        if self.__cursor is None:
+            self.__fetchAll()
+            return (self.__getRow(row) for row in range(len(self.rows)))
+        if self.__streamed:
+            raise RuntimeError("a streamed ResultSet can only be iterated once")
+        self.__streamed = True
+        return self.__stream()
+
+    # {column: list of its values}. A ResultSet with a cursor that wasn't read by index yet is consumed batch by
+    # batch, without keeping its rows (like __iter__)
+    def to_columns(self) -> dict:
+        names = [d.name.lower() for d in self.__description or []]
+        columns = [[] for _ in names]
+        for batch in self.__batches():
+            for column, values in zip(columns, zip(*batch)):
+                column.extend(values)
+        return dict(zip(names, columns))
+
+    # to_columns with a numpy array per column, typed from the column's type (see Columns.numpy_column)
+    def to_numpy(self) -> dict:
+        Columns.require_numpy()
+        type_codes = [getattr(d, "type_code", None) for d in self.__description or []]
+        return {name: Columns.numpy_column(values, type_code)
+                for (name, values), type_code in zip(self.to_columns().items(), type_codes)}
+
+    # close the cursor the rows are fetched from, if any (the rows not fetched yet are dropped)
+    def close(self):
+        if self.__cursor is not None:
+            cursor, self.__cursor = self.__cursor, None
+            if not cursor.closed and not cursor.connection.closed:
+                cursor.close()
+
+    # so you can use print(ResultSet)
+    def __str__(self):
+        self.__fetchAll()
+        string = ""
+        for col in self.cols_header:
+            string += str(col) + "   "
+        string += '\n'
+        for row in self.rows:
+            for val in row:
+                string += str(val) + "   "
+            string += '\n'
+        return string
+
+    # what is the size of the ResultSet?
+    def size(self):
+        self.__fetchAll()
+        return len(self.rows)
+
+    # is the ResultSet empty?
+    def isEmpty(self):
+        return self.size() == 0
+
+    # the values of a column, in row order (an array.array of typecode instead of a list if one is given)
+    def column(self, name: str, typecode=None):
+        self.__fetchAll()
+        values = list(map(itemgetter(self.cols[name]), self.rows)) if len(self.rows) > 0 else []
+        return values if typecode is None else array(typecode, values)
+
+    def __getRow(self, row: int):
+        if len(self.rows) <= row:
+            print('Invalid row ' + str(row))
+            return ResultSetDict()
+        return ResultSetRow(self.rows[row], self.cols)
+
+    def __stream(self):
+        fetched, self.rows = self.rows, []
+        for values in fetched:
+            yield ResultSetRow(values, self.cols)
+        del fetched
+        for values in self.__cursor:
+            yield ResultSetRow(values, self.cols)
+        self.close()
+
+    def __batches(self):
+        if self.__cursor is None:
+            self.__fetchAll()
+            yield self.rows
+            return
+        if self.__streamed:
+            raise RuntimeError("a streamed ResultSet can only be iterated once")
+        self.__streamed = True
+        fetched, self.rows = self.rows, []
+        yield fetched
+        del fetched
+        for batch in iter(lambda: self.__cursor.fetchmany(self.__cursor.itersize), []):
+            yield batch
+        self.close()
+
+    def __fetchAll(self):
+        if self.__streamed:
+            raise RuntimeError("the rows of a streamed ResultSet can't be read once it was iterated")
+        if self.__cursor is not None:
+            self.rows += self.__cursor.fetchall()
+            self.close()
+
+    def __fromQuery(self, description, results: list):
+        if results is None or len(results) == 0:  # no results
+            self.cols = ResultSetDict()
+        else:
+            self.rows = results
+            self.cols_header = [d.name for d in description]
+            self.cols = ResultSetDict()
+            for col, index in zip(self.cols_header, range(len(results[0]))):
+                self.cols[col.lower()] = index
+
+
+class Statement:
+    # a named, parameterized query that is prepared server-side on each connection the first time it is used,
+    # so PostgreSQL parses and plans it once per connection instead of once per call
+    # parameters are written $1, $2, ... and bound in order by bind()
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text.strip().rstrip(";")
+        self.nparams = max((int(n) for n in re.findall(r"\$(\d+)", self.text)), default=0)
+        self.returns_rows = self.text.split(None, 1)[0].upper() in ("SELECT", "WITH")  # a query, not a write
+        self.prepare_cmd = f"PREPARE {name} AS {self.text}"
+        self.execute_cmd = f"EXECUTE {name}" + \
+                           (f" ({', '.join(['%s'] * self.nparams)})" if self.nparams > 0 else "")
+        # the query with psycopg2 placeholders, for cursors that can't EXECUTE a prepared statement (DBConnector.stream)
+        self.cursor_cmd = re.sub(r"\$(\d+)", r"%(p\1)s", self.text.replace("%", "%%"))
+        # the query in SQLite's SQL, for SQLiteConnector (sqlite3 caches it per connection), see SQLiteDialect
+        self.sqlite_cmd = SQLiteDialect.statement(name, self.text)
+        self.sqlite_types = SQLiteDialect.COLUMN_TYPES.get(name)
+
+    def cursor_params(self, params) -> dict:
+        return {f"p{i}": param for i, param in enumerate(params, start=1)}
+
+    def bind(self, *params) -> ("Statement", tuple):
+        if len(params) != self.nparams:
+            raise ValueError(f"{self.name} expects {self.nparams} parameters, got {len(params)}")
+        return self, params
+
+
+class Script:
+    # a named DDL script, run as it is by DBConnector and replaced by the engine's own version by the other
+    # connectors (see SQLiteDialect.SCRIPTS)
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+        self.sqlite_cmd = SQLiteDialect.script(name, text)
+
+
+class DBConnector:
+    # connections are borrowed from a process-wide pool instead of being opened per DBConnector
+    __pool = None
+    __pool_lock = threading.Lock()
+    pool_settings = {
+        "minconn": 1,
+        "maxconn": 10,
+        "idle_timeout": 300.0,
+        "checkout_timeout": 30.0,
+        "health_check_interval": 30.0,
+    }
+
+    # replica connections (DBConnector(replica=True)) go to a replica when any is configured and usable,
+    # otherwise to the primary. See ReplicaSet for the settings
+    __replicas = None
+    __replicas_resolved = False
+    replica_settings = {
+        "dsns": None,  # None for FILEZDB_REPLICA_DSNS, or else the [replica...] sections of database.ini
+        "strategy": "round_robin",
+        "max_lag": 5.0,
+        "lag_check_interval": 1.0,
+        "retry_interval": 5.0,
+    }
+
+    stream_itersize = 2000  # rows fetched per round-trip by stream()
+    __stream_ids = itertools.count()
+
+    # environment overrides for the connection parameters
+    DSN_ENV_VAR = "FILEZDB_DSN"
+    REPLICA_DSNS_ENV_VAR = "FILEZDB_REPLICA_DSNS"  # ";"-separated
+    CONFIG_ENV_VAR = "FILEZDB_CONFIG"
+    __params = None
+    __config_lock = threading.Lock()
+    config_load_seconds = None  # how long resolving the parameters took, None until first resolved
+
+    # constructor. read_only is accepted for the connectors' shared interface, a transaction here may always write
+    def __init__(self, read_only=False, replica=False):
+        self.__pooled = None
+        self.__owner = None  # the pool the connection goes back to
+        self.__streams = []  # ResultSets of stream(), closed with the connection
+        self.replica = None  # DSN of the replica the connection is to, None for the primary
+        try:
+            replicas = DBConnector.get_replicas() if replica else None
+            routed = replicas.getconn() if replicas is not None else None
+            if routed is not None:
+                replica, self.__pooled = routed
+                self.__owner = replica.pool
+                self.replica = replica.dsn
+            else:
+                self.__owner = DBConnector.get_pool()
+                self.__pooled = self.__owner.getconn()
+            self.connection = self.__pooled.connection
+            self.cursor = self.connection.cursor()
+        except Exception as e:
+            if self.__pooled is not None:
+                self.__owner.putconn(self.__pooled, discard=True)
+                self.__pooled = None
+            self.connection = None
+            self.cursor = None
+            raise DatabaseException.ConnectionInvalid("Could not connect to database")
+
+    # close connection (returns it to the pool), safe to call more than once
+    def close(self):
+        for streamed in self.__streams:
+            try:
+                streamed.close()
+            except Exception:
+                pass
+        self.__streams = []
+        if self.cursor is not None:
+            try:
+                self.cursor.close()
+            except Exception:
+                pass
+        if self.__pooled is not None:
+            self.__owner.putconn(self.__pooled)
+        self.__pooled = None
+        self.connection = None
+        self.cursor = None
+
+    # the shared pool, created on first use from pool_settings
+    @staticmethod
+    def get_pool() -> ConnectionPool:
+        with DBConnector.__pool_lock:
+            if DBConnector.__pool is None:
+                DBConnector.__pool = ConnectionPool(DBConnector.__connect, **DBConnector.pool_settings)
+            return DBConnector.__pool
+
+    # change pool sizing/timeouts, the current pool is closed and rebuilt lazily with the new settings
+    @staticmethod
+    def configure_pool(**settings):
+        unknown = set(settings) - set(DBConnector.pool_settings)
+        if unknown:
+            raise ValueError("unknown pool settings: " + ", ".join(sorted(unknown)))
+        with DBConnector.__pool_lock:
+            DBConnector.pool_settings = dict(DBConnector.pool_settings, **settings)
+            if DBConnector.__pool is not None:
+                DBConnector.__pool.closeall()
+                DBConnector.__pool = None
+            DBConnector.__reset_replicas()
+
+    # counters for sizing the pool (checkouts, waits, timeouts, idle/in-use connections...)
+    @staticmethod
+    def pool_stats() -> dict:
+        return DBConnector.get_pool().stats()
+
+    # the replicas read-only connections are routed to, None when none are configured
+    @staticmethod
+    def get_replicas() -> ReplicaSet:
+        with DBConnector.__pool_lock:
+            if not DBConnector.__replicas_resolved:
+                settings = dict(DBConnector.replica_settings)
+                dsns = settings.pop("dsns")
+                if dsns is None:
+                    dsns = DBConnector.__resolve_replica_dsns()
+                if len(dsns) > 0:
+                    DBConnector.__replicas = ReplicaSet(dsns, DBConnector.pool_settings, **settings)
+                DBConnector.__replicas_resolved = True
+            return DBConnector.__replicas
+
+    # change the replicas and how they are chosen, e.g. configure_replicas(dsns=[...], max_lag=5.0)
+    @staticmethod
+    def configure_replicas(**settings):
+        unknown = set(settings) - set(DBConnector.replica_settings)
+        if unknown:
+            raise ValueError("unknown replica settings: " + ", ".join(sorted(unknown)))
+        with DBConnector.__pool_lock:
+            DBConnector.replica_settings = dict(DBConnector.replica_settings, **settings)
+            DBConnector.__reset_replicas()
+
+    # per replica: whether it is up, its last measured lag, checkouts, failures and pool counters
+    @staticmethod
+    def replica_stats() -> list:
+        replicas = DBConnector.get_replicas()
+        return [] if replicas is None else replicas.stats()
+
+    @staticmethod
+    def __reset_replicas():
+        if DBConnector.__replicas is not None:
+            DBConnector.__replicas.closeall()
+        DBConnector.__replicas = None
+        DBConnector.__replicas_resolved = False
+
+    @staticmethod
+    def __connect():
+        # Obtain the configuration parameters
+        params = DBConnector.connection_params()
+        connection = psycopg2.connect(**params)
+        connection.autocommit = False
+        return connection
+
+    # commit connection's changes
+    def commit(self):
+        if self.connection is not None:
+            try:
+                self.connection.commit()
+            except Exception:
+                raise DatabaseException.ConnectionInvalid("Could not commit changes")
+
+    # run every statement in a transaction of its own, without BEGIN/COMMIT (reset when the connection is returned)
+    def set_autocommit(self, autocommit: bool):
+        if self.connection is not None:
+            self.connection.autocommit = autocommit
+
+    # rollback connection's changes
+    def rollback(self):
+        if self.connection is not None:
+            try:
+                self.connection.rollback()
+            except Exception:
+                raise DatabaseException.ConnectionInvalid("Could not rollback changes")
+
+    # executes the query, if it is SELECT you may ask to print the results with printSchema
+    # returns the number of rows effected and a ResultSet (for SELECT)
+    # params are bound by psycopg2 (%s placeholders) for plain queries, or passed to EXECUTE for a Statement
+    def execute(self, query: Union[str, sql.Composed, "Statement", "Script"], printSchema=False,
+                params=None) -> (int, ResultSet):
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+
+        # try execute the query
+        with constraint_violations():
+            if isinstance(query, Statement):
+                self.__execute_prepared(query, params)
+            elif isinstance(query, Script):
+                self.cursor.execute(query.text)
+            else:
+                self.cursor.execute(query, params)
+            row_effected = max(self.cursor.rowcount, 0)
+
+        # get entries in case of SELECT
+        if self.cursor.description is not None:
+            entries = ResultSet(self.cursor.description, self.cursor.fetchall())
+        else:
+            entries = ResultSet()
+
+        # print SELECT entries
+        if printSchema:
+            print(entries)
+
+        return row_effected, entries
+
+    # runs a query that selects on a server-side cursor, and returns a ResultSet that fetches the rows itersize
+    # (stream_itersize by default) at a time while it is iterated, instead of holding all of them in memory.
+    # The rows must be read before the connection is closed (and, outside of autocommit mode, before it is committed
+    # or rolled back)
+    def stream(self, query: Union[str, sql.Composed, "Statement"], params=None, itersize=None) -> ResultSet:
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        if isinstance(query, Statement):
+            query, params = query.cursor_cmd, query.cursor_params(params)
+        # a cursor outliving its transaction (WITH HOLD) is needed when every statement commits
+        cursor = self.connection.cursor(name=f"filez_stream_{next(DBConnector.__stream_ids)}",
+                                        withhold=self.connection.autocommit)
+        cursor.itersize = itersize or DBConnector.stream_itersize
+        try:
+            with constraint_violations():
+                cursor.execute(query, params)
+                fetched = cursor.fetchmany(cursor.itersize)
+        except Exception:
+            cursor.close()
+            raise
+        streamed = ResultSet(cursor.description, fetched, cursor=cursor)
+        self.__streams.append(streamed)
+        return streamed
+
+    # the columns of a query's result, {column: numpy array}. With binary, the rows are transferred with a binary
+    # COPY and decoded by numpy (for the types in Columns.BINARY_TYPES and Columns.TEXT_TYPES), otherwise they are
+    # streamed (see ResultSet.to_numpy). binary=None picks the binary COPY when every column is fixed-width: those
+    # are decoded without a Python object per value, while text values are no faster to decode from it
+    def fetch_columns(self, query: Union[str, sql.Composed, "Statement"], params=None, binary=None) -> dict:
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        Columns.require_numpy()
+        if binary is False:
+            return self.stream(query, params).to_numpy()
+        copied, copied_params = (query.cursor_cmd, query.cursor_params(params)) if isinstance(query, Statement) \
+            else (query, params)
+        with constraint_violations():
+            copied = self.cursor.mogrify(copied, copied_params).decode()
+            self.cursor.execute(f"SELECT * FROM ({copied}) AS fetched LIMIT 0")
+            description = self.cursor.description
+            type_codes = [d.type_code for d in description]
+            if binary is None and not Columns.fixed_width(type_codes):
+                return self.stream(query, params).to_numpy()
+            data = io.BytesIO()
+            self.cursor.copy_expert(f"COPY ({copied}) TO STDOUT WITH (FORMAT binary)", data)
+        columns = Columns.from_binary_copy(data.getbuffer(), type_codes)
+        return dict(zip([d.name.lower() for d in description], columns))
+
+    # inserts many rows in one round-trip, either streamed with COPY ... FROM STDIN or as one multi-row
+    # INSERT ... VALUES (method="values"); constraint violations are raised like in execute
+    # skip_existing skips the rows whose key is already taken (ON CONFLICT DO NOTHING, which COPY can't do),
+    # other constraint violations still raise
+    def insert_rows(self, table: str, columns, rows, method="copy", skip_existing=False) -> int:
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        if method not in ("copy", "values"):
+            raise ValueError("unknown insert method: " + str(method))
+        if len(rows) == 0:
+            return 0
+        with constraint_violations():
+            if method == "copy" and not skip_existing:
+                data = io.StringIO("".join("\t".join(copy_text(val) for val in row) + "\n" for row in rows))
+                self.cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", data)
+            else:
+                extras.execute_values(self.cursor, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s"
+                                      + (" ON CONFLICT DO NOTHING" if skip_existing else ""), rows,
+                                      page_size=len(rows))
+        return len(rows)
+
+    def __execute_prepared(self, statement: "Statement", params):
+        # PREPARE outlives transactions, so each pooled connection only has to prepare a statement once
+        prepared = self.__pooled.prepared
+        if statement.name not in prepared:
+            self.cursor.execute(statement.prepare_cmd)
+            prepared.add(statement.name)
+        self.cursor.execute(statement.execute_cmd, params)
+
+    # connection parameters, resolved once per process (see reload_config)
+    @staticmethod
+    def connection_params() -> dict:
+        with DBConnector.__config_lock:
+            if DBConnector.__params is None:
+                start = time.perf_counter()
+                DBConnector.__params = DBConnector.__resolve_params()
+                DBConnector.config_load_seconds = time.perf_counter() - start
+            return DBConnector.__params
+
+    # forget the cached parameters (re-reading the environment and database.ini on next use)
+    # and rebuild the pool so no connection keeps using the old parameters
+    @staticmethod
+    def reload_config() -> dict:
+        with DBConnector.__config_lock:
+            DBConnector.__params = None
+        DBConnector.configure_pool()  # also re-resolves the replicas
+        return DBConnector.connection_params()
+
+    @staticmethod
+    def __resolve_params() -> dict:
+        # a DSN in the environment ("host=... dbname=..." or "postgresql://...") overrides database.ini
+        dsn = os.environ.get(DBConnector.DSN_ENV_VAR)
+        if dsn:
+            return {"dsn": dsn}
+        filename = os.environ.get(DBConnector.CONFIG_ENV_VAR)
+        if filename:
+            return DBConnector.__config(filename)
+        return DBConnector.__config()
+
+    @staticmethod
+    def __resolve_replica_dsns() -> list:
+        dsns = os.environ.get(DBConnector.REPLICA_DSNS_ENV_VAR)
+        if dsns:
+            return [dsn.strip() for dsn in dsns.split(";") if dsn.strip()]
+        if os.environ.get(DBConnector.DSN_ENV_VAR):
+            return []
+        parser = DBConnector.__config_parser(os.environ.get(DBConnector.CONFIG_ENV_VAR))
+        return [extensions.make_dsn(**dict(parser.items(section)))
+                for section in parser.sections() if section.startswith("replica")]
+
+    # grant credentials
+    @staticmethod
+    def __config(filename=None, section='postgresql'):
+        parser = DBConnector.__config_parser(filename, section)
+        return {param[0]: param[1] for param in parser.items(section)}
+
+    # the parsed database.ini
+    @staticmethod
+    def __config_parser(filename=None, section='postgresql') -> ConfigParser:
+        candidates = [filename] if filename is not None else [
+            os.path.join(os.getcwd(), "Utility", "database.ini"),
+            os.path.join(os.path.dirname(os.getcwd()), "Utility", "database.ini"),
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.ini"),
+        ]
+        for candidate in candidates:
+            # create a parser
+            parser = ConfigParser()
+            # read config file
+            parser.read(candidate)
+
+            # get section
+            if parser.has_section(section):
+                return parser
+        # file not found
+        raise DatabaseException.database_ini_ERROR("Please modify database.ini file under Utility")
+
+
+# ----------------------------------------
+# SQLite
+
+# (start of the message, exception) of the SQLite integrity errors DatabaseException has a class for
+SQLITE_CONSTRAINT_ERRORS = (
+    ("NOT NULL constraint failed", DatabaseException.NOT_NULL_VIOLATION),
+    ("FOREIGN KEY constraint failed", DatabaseException.FOREIGN_KEY_VIOLATION),
+    ("UNIQUE constraint failed", DatabaseException.UNIQUE_VIOLATION),
+    ("CHECK constraint failed", DatabaseException.CHECK_VIOLATION),
+)
+
+# the PostgreSQL type codes of the values sqlite3 returns, so Columns converts the columns of both alike
+SQLITE_TYPE_CODES = {int: 20, float: 701, str: 25}
+
+SQLiteColumn = namedtuple("SQLiteColumn", ("name", "type_code"))
+
+
+@contextmanager
+def sqlite_constraint_violations():
+    # translate SQLite integrity errors into the matching DatabaseException, like constraint_violations. Any other
+    # error (a missing table, a value a STRICT column can't store, an integer too large to bind...) is UNKNOWN_ERROR,
+    # since there is no psycopg2.DatabaseError to raise
+    try:
+        yield
+    except (sqlite3.Error, OverflowError) as e:
+        message = str(e)
+        for prefix, exception in SQLITE_CONSTRAINT_ERRORS:
+            if message.startswith(prefix):
+                raise exception(exception.__name__) from e
+        raise DatabaseException.UNKNOWN_ERROR(message) from e
+
+
+def sqlite_statements(script: str) -> list:
+    # the statements of a script, which sqlite3 executes one at a time (a semicolon inside a string or a trigger's
+    # body doesn't end one)
+    statements = []
+    statement = ""
+    for part in script.split(";"):
+        statement += part + ";"
+        if sqlite3.complete_statement(statement):
+            if statement.strip(" \t\r\n;"):
+                statements.append(statement)
+            statement = ""
+    if statement.strip(" \t\r\n;"):
+        statements.append(statement)  # incomplete, SQLite reports the error
+    return statements
+
+
+def sqlite_description(description, rows, type_codes=None) -> list:
+    # the cursor's description as ResultSet reads it: each column's name and its type code in type_codes, or else the
+    # type code of its first non-NULL value (SQLite columns have no type of their own)
+    columns = []
+    for index, column in enumerate(description):
+        if type_codes is not None:
+            columns.append(SQLiteColumn(column[0], type_codes[index]))
+            continue
+        value = next((row[index] for row in rows if row[index] is not None), None)
+        columns.append(SQLiteColumn(column[0], SQLITE_TYPE_CODES.get(type(value))))
+    return columns
+
+
+class SQLiteCursor(sqlite3.Cursor):
+    # a sqlite3 cursor with what ResultSet and ConnectionPool use of a psycopg2 cursor
+    itersize = 2000
+    owner = None  # the SQLiteConnection
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self.__closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self.__closed or self.owner.closed
+
+    @property
+    def connection(self):
+        return self.owner
+
+    def close(self):
+        self.__closed = True
+        super().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class SQLiteConnection:
+    # a sqlite3 connection with what ConnectionPool and SQLiteConnector use of a psycopg2 connection. sqlite3 is left
+    # in autocommit mode (isolation_level=None) and the transactions are begun by SQLiteConnector, like psycopg2
+    # does before the first statement out of autocommit mode
+    def __init__(self, connection: sqlite3.Connection):
+        self.raw = connection
+        self.closed = False
+        self.autocommit = False
+
+    def cursor(self) -> SQLiteCursor:
+        cursor = self.raw.cursor(SQLiteCursor)
+        cursor.owner = self
+        return cursor
+
+    def get_transaction_status(self) -> int:
+        return extensions.TRANSACTION_STATUS_INTRANS if self.raw.in_transaction \
+            else extensions.TRANSACTION_STATUS_IDLE
+
+    def commit(self):
+        if self.raw.in_transaction:
+            self.raw.execute("COMMIT")
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.execute("ROLLBACK")
+
+    def close(self):
+        self.closed = True
+        self.raw.close()
+
+
+class SQLiteConnector:
+    # DBConnector's interface on an embedded SQLite database, so the system runs without a PostgreSQL server (edge
+    # nodes, CI). A database file is shared by the connections of the pool and kept in WAL mode, so reads don't wait
+    # for a write; ":memory:" lives in the only connection of the pool, which callers then take turns on.
+    # Foreign keys are enforced and integrity errors are raised as DBConnector raises them. Plain queries are
+    # SQLite's, with ? placeholders; Statements and Scripts are Solution's, run in SQLite's SQL (see SQLiteDialect)
+    # with a Statement's $1, $2... bound in order like in DBConnector.
+    # Connections that may write begin their transactions IMMEDIATE, taking the write lock up front instead of
+    # failing to upgrade a read lock when another connection writes
+    __pool = None
+    __pool_lock = threading.Lock()
+    settings = {
+        "database": None,  # None for FILEZDB_SQLITE, or else ":memory:"
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",  # durable at checkpoints, which is safe in WAL mode
+        "busy_timeout": 30.0,  # seconds a statement waits for another connection's lock
+        "maxconn": 4,  # 1 for ":memory:"
+        "idle_timeout": 300.0,
+        "checkout_timeout": 30.0,
+    }
+    DATABASE_ENV_VAR = "FILEZDB_SQLITE"
+    stream_itersize = 2000  # rows fetched at a time by stream()
+
+    def __init__(self, read_only=False, replica=False):
+        self.__pooled = None
+        self.__owner = None
+        self.__streams = []
+        self.__begin = "BEGIN" if read_only else "BEGIN IMMEDIATE"
+        self.replica = None  # there are no replicas
+        try:
+            self.__owner = SQLiteConnector.get_pool()
+            self.__pooled = self.__owner.getconn()
+            self.connection = self.__pooled.connection
+            self.cursor = self.connection.cursor()
+        except Exception:
+            if self.__pooled is not None:
+                self.__owner.putconn(self.__pooled, discard=True)
+                self.__pooled = None
+            self.connection = None
+            self.cursor = None
+            raise DatabaseException.ConnectionInvalid("Could not connect to database")
+
+    def close(self):
+        for streamed in self.__streams:
+            try:
+                streamed.close()
+            except Exception:
+                pass
+        self.__streams = []
+        if self.cursor is not None:
+            try:
+                self.cursor.close()
+            except Exception:
+                pass
+        if self.__pooled is not None:
+            self.__owner.putconn(self.__pooled)
+        self.__pooled = None
+        self.connection = None
+        self.cursor = None
+
+    # the path of the database file, or ":memory:"
+    @staticmethod
+    def database() -> str:
+        return SQLiteConnector.settings["database"] or os.environ.get(SQLiteConnector.DATABASE_ENV_VAR) or ":memory:"
+
+    @staticmethod
+    def get_pool() -> ConnectionPool:
+        with SQLiteConnector.__pool_lock:
+            if SQLiteConnector.__pool is None:
+                settings = SQLiteConnector.settings
+                in_memory = SQLiteConnector.database() == ":memory:"
+                # the database is local, a connection never needs a health check
+                SQLiteConnector.__pool = ConnectionPool(
+                    SQLiteConnector.__connect, minconn=1, maxconn=1 if in_memory else settings["maxconn"],
+                    idle_timeout=settings["idle_timeout"], checkout_timeout=settings["checkout_timeout"],
+                    health_check_interval=float("inf"))
+            return SQLiteConnector.__pool
+
+    # change the database or its settings, e.g. configure(database="filez.db"). The pool is closed and rebuilt
+    # lazily, which drops a ":memory:" database
+    @staticmethod
+    def configure(**settings):
+        unknown = set(settings) - set(SQLiteConnector.settings)
+        if unknown:
+            raise ValueError("unknown SQLite settings: " + ", ".join(sorted(unknown)))
+        with SQLiteConnector.__pool_lock:
+            SQLiteConnector.settings = dict(SQLiteConnector.settings, **settings)
+            if SQLiteConnector.__pool is not None:
+                SQLiteConnector.__pool.closeall()
+                SQLiteConnector.__pool = None
+
+    @staticmethod
+    def pool_stats() -> dict:
+        return SQLiteConnector.get_pool().stats()
+
+    @staticmethod
+    def __connect() -> SQLiteConnection:
+        settings = SQLiteConnector.settings
+        database = SQLiteConnector.database()
+        connection = sqlite3.connect(database, timeout=settings["busy_timeout"], isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute("PRAGMA foreign_keys = ON")
+        if database != ":memory:":
+            connection.execute(f"PRAGMA journal_mode = {settings['journal_mode']}")
+            connection.execute(f"PRAGMA synchronous = {settings['synchronous']}")
+        return SQLiteConnection(connection)
+
+    def commit(self):
+        if self.connection is not None:
+            try:
+                self.connection.commit()
+            except Exception:
+                raise DatabaseException.ConnectionInvalid("Could not commit changes")
+
+    def set_autocommit(self, autocommit: bool):
+        if self.connection is not None:
+            self.connection.autocommit = autocommit
+
+    def rollback(self):
+        if self.connection is not None:
+            try:
+                self.connection.rollback()
+            except Exception:
+                raise DatabaseException.ConnectionInvalid("Could not rollback changes")
+
+    # returns the number of rows effected (selected, for a query) and a ResultSet, like DBConnector.execute. A
+    # script of many statements (DDL) is run a statement at a time, and takes no params
+    def execute(self, query: Union[str, "Statement", "Script"], printSchema=False, params=None) -> (int, ResultSet):
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        type_codes = None
+        if isinstance(query, Statement):
+            statements, type_codes = [query.sqlite_cmd], query.sqlite_types
+            params = SQLiteDialect.bind_params(params or ())
+        else:
+            statements = sqlite_statements(query.sqlite_cmd if isinstance(query, Script) else query)
+
+        with sqlite_constraint_violations():
+            self.__begin_transaction()
+            for statement in statements:
+                self.cursor.execute(statement, params or ())
+            rows = self.cursor.fetchall() if self.cursor.description is not None else None
+
+        if rows is not None:
+            entries = ResultSet(sqlite_description(self.cursor.description, rows, type_codes), rows)
+            row_effected = len(rows)
+        else:
+            entries = ResultSet()
+            row_effected = max(self.cursor.rowcount, 0)
+
+        if printSchema:
+            print(entries)
+
+        return row_effected, entries
+
+    # like DBConnector.stream: sqlite3 steps through the rows as they are fetched
+    def stream(self, query: Union[str, "Statement"], params=None, itersize=None) -> ResultSet:
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        type_codes = None
+        if isinstance(query, Statement):
+            query, type_codes = query.sqlite_cmd, query.sqlite_types
+            params = SQLiteDialect.bind_params(params or ())
+        cursor = self.connection.cursor()
+        cursor.itersize = itersize or SQLiteConnector.stream_itersize
+        try:
+            with sqlite_constraint_violations():
+                self.__begin_transaction()
+                cursor.execute(query, params or ())
+                fetched = cursor.fetchmany(cursor.itersize)
+        except Exception:
+            cursor.close()
+            raise
+        streamed = ResultSet(sqlite_description(cursor.description, fetched, type_codes), fetched, cursor=cursor)
+        self.__streams.append(streamed)
+        return streamed
+
+    # like DBConnector.fetch_columns. SQLite has no binary transfer, so binary is ignored and the rows are streamed
+    def fetch_columns(self, query: Union[str, "Statement"], params=None, binary=None) -> dict:
+        Columns.require_numpy()
+        return self.stream(query, params).to_numpy()
+
+    # inserts many rows with one executemany, all or none of them like a COPY (method is accepted for
+    # DBConnector's interface, "copy" and "values" are the same here). A value PostgreSQL would refuse for an integer
+    # column raises DatabaseException.DATA_EXCEPTION, see SQLiteDialect.check_value
+    def insert_rows(self, table: str, columns, rows, method="copy", skip_existing=False) -> int:
+        if self.connection is None:
+            raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        if method not in ("copy", "values"):
+            raise ValueError("unknown insert method: " + str(method))
+        if len(rows) == 0:
+            return 0
+        SQLiteDialect.check_rows(rows)
+        table = SQLiteDialect.table_name(table)
+        with sqlite_constraint_violations():
+            self.__begin_transaction()
+            self.cursor.execute("SAVEPOINT filez_insert_rows")
+            try:
+                self.cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) "
+                                        f"VALUES ({', '.join(['?'] * len(columns))})"
+                                        + (" ON CONFLICT DO NOTHING" if skip_existing else ""), rows)
+            except Exception:
+                self.cursor.execute("ROLLBACK TO SAVEPOINT filez_insert_rows")
+                raise
+            finally:
+                self.cursor.execute("RELEASE SAVEPOINT filez_insert_rows")
+        return len(rows)
+
+    def __begin_transaction(self):
+        if not self.connection.autocommit and not self.connection.raw.in_transaction:
+            self.cursor.execute(self.__begin)
+
+
+# ----------------------------------------
+# Backends: the connector of each database engine. They share DBConnector's interface, so code that only uses it
+# (execute, stream, fetch_columns, insert_rows, commit, rollback, set_autocommit, close) runs on any of them,
+# given Statements and Scripts, or plain queries in the engine's SQL
+
+CONNECTORS = {
+    "postgres": DBConnector,
+    "sqlite": SQLiteConnector,
+}
+
+
+def connect(backend="postgres", read_only=False, replica=False):
+    if backend not in CONNECTORS:
+        raise ValueError("unknown backend: " + str(backend))
+    return CONNECTORS[backend](read_only=read_only, replica=replica)
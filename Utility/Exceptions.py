@@ -28,3 +28,7 @@ class DatabaseException(_Exceptions):
 
     class UNKNOWN_ERROR(_Exceptions):
         pass
+
+    # a value the column's type can't hold (psycopg2.DataError on PostgreSQL)
+    class DATA_EXCEPTION(UNKNOWN_ERROR):
+        pass
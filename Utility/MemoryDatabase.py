@@ -0,0 +1,276 @@
+import bisect
+from collections import Counter
+from contextlib import contextmanager
+from Utility.Exceptions import DatabaseException
+
+INTEGER_RANGE = (-2 ** 31, 2 ** 31 - 1)  # PostgreSQL's integer
+
+# (column, type, minimum allowed by its CHECK constraint) of each entity table, as created by Solution.createTables.
+# Every column is NOT NULL
+ENTITY_COLUMNS = {
+    "file": (("fileID", int, 1), ("type", str, None), ("size", int, 0)),
+    "disk": (("diskID", int, 1), ("company", str, None), ("speed", int, 1), ("free_space", int, 0), ("cost", int, 1)),
+    "ram": (("ramID", int, 1), ("company", str, None), ("size", int, 1)),
+}
+
+
+def check_value(value, kind):
+    # a value the server would refuse to bind to a parameter of the column's type: a database error, like the
+    # DataError psycopg2 raises (NULLs are left to the NOT NULL constraints)
+    if value is None:
+        return
+    if kind is int:
+        if isinstance(value, int) and not isinstance(value, bool) \
+                and INTEGER_RANGE[0] <= value <= INTEGER_RANGE[1]:
+            return
+    elif isinstance(value, kind):
+        return
+    raise DatabaseException.UNKNOWN_ERROR(f"invalid input value for {kind.__name__}: {value!r}")
+
+
+def check_row(table, row):
+    columns = ENTITY_COLUMNS[table]
+    for (_, kind, _), value in zip(columns, row):
+        check_value(value, kind)
+    if any(value is None for value in row):
+        raise DatabaseException.NOT_NULL_VIOLATION("NOT_NULL_VIOLATION")
+    if any(minimum is not None and value < minimum for (_, _, minimum), value in zip(columns, row)):
+        raise DatabaseException.CHECK_VIOLATION("CHECK_VIOLATION")
+
+
+class Tables:
+    # the rows of Solution's tables, the indexes the queries use and the aggregates its triggers maintain
+    __slots__ = ("files", "disks", "rams", "file_disks", "disk_files", "ram_disks", "disk_rams", "file_ids",
+                 "file_sizes", "disk_stats", "disk_ram_companies", "type_costs", "disk_conflicts")
+
+    def __init__(self):
+        self.files = {}  # fileID -> (type, size)
+        self.disks = {}  # diskID -> [company, speed, free_space, cost]
+        self.rams = {}  # ramID -> (company, size)
+        self.file_disks = {}  # file_on_disk by file: fileID -> {diskID}
+        self.disk_files = {}  # file_on_disk by disk: diskID -> {fileID}
+        self.ram_disks = {}  # ram_on_disk by RAM: ramID -> {diskID}
+        self.disk_rams = {}  # ram_on_disk by disk: diskID -> {ramID}
+        self.file_ids = []  # sorted
+        self.file_sizes = []  # sorted, with repeats
+        self.disk_stats = {}  # diskID -> [file_count, file_size_sum, ram_size_sum]
+        self.disk_ram_companies = {}  # diskID -> Counter of the companies of its RAMs
+        self.type_costs = {}  # type -> total cost (disk cost * file size over its placements)
+        self.disk_conflicts = {}  # diskID -> number of its files that are also on another disk
+
+
+class MemoryDatabase:
+    # Solution's schema held in Python objects: the same NOT NULL/CHECK/UNIQUE/FOREIGN KEY rules, raised as the
+    # DatabaseException DBConnector raises for them, and the same ON DELETE CASCADE. Values the server would not
+    # accept for a column's type and using the tables when they don't exist raise UNKNOWN_ERROR.
+    # Every change is undone by rollback(mark) back to the mark begin() returned, so transactions nest like
+    # savepoints. Not thread-safe, callers serialize access
+    def __init__(self):
+        self.__tables = None
+        self.__undo = []  # callables undoing each change, in order
+        self.__depth = 0  # transactions in progress
+
+    # ----------------------------------------
+    # Transactions
+
+    def begin(self) -> int:
+        self.__depth += 1
+        return len(self.__undo)
+
+    def commit(self, mark: int):
+        self.__depth -= 1
+        if self.__depth == 0:
+            self.__undo.clear()
+
+    def rollback(self, mark: int):
+        while len(self.__undo) > mark:
+            undo = self.__undo.pop()
+            logged = len(self.__undo)
+            undo()
+            del self.__undo[logged:]  # what undoing logged
+        self.commit(mark)
+
+    @contextmanager
+    def transaction(self):
+        mark = self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback(mark)
+            raise
+        self.commit(mark)
+
+    # ----------------------------------------
+    # Tables
+
+    @property
+    def tables(self) -> Tables:
+        self.__check_exist(True)
+        return self.__tables
+
+    def create(self):
+        self.__check_exist(False)
+        self.__replace_tables(Tables())
+
+    def clear(self):
+        self.__check_exist(True)
+        self.__replace_tables(Tables())
+
+    def drop(self):
+        self.__check_exist(True)
+        self.__replace_tables(None)
+
+    def __check_exist(self, exist: bool):
+        if (self.__tables is not None) != exist:
+            raise DatabaseException.UNKNOWN_ERROR("the tables " + ("don't exist" if exist else "already exist"))
+
+    def __replace_tables(self, tables):
+        previous, self.__tables = self.__tables, tables
+        self.__undo.append(lambda: self.__replace_tables(previous))
+
+    # ----------------------------------------
+    # Entities
+
+    def insert_file(self, fileID, type, size):
+        tables = self.tables
+        check_row("file", (fileID, type, size))
+        if fileID in tables.files:
+            raise DatabaseException.UNIQUE_VIOLATION("UNIQUE_VIOLATION")
+        tables.files[fileID] = (type, size)
+        bisect.insort(tables.file_ids, fileID)
+        bisect.insort(tables.file_sizes, size)
+        self.__undo.append(lambda: self.delete_file(fileID))
+
+    def delete_file(self, fileID):
+        tables = self.tables
+        for diskID in sorted(tables.file_disks.get(fileID, ())):
+            self.delete_placement(fileID, diskID)
+        type, size = tables.files.pop(fileID)
+        del tables.file_ids[bisect.bisect_left(tables.file_ids, fileID)]
+        del tables.file_sizes[bisect.bisect_left(tables.file_sizes, size)]
+        self.__undo.append(lambda: self.insert_file(fileID, type, size))
+
+    def insert_disk(self, diskID, company, speed, free_space, cost):
+        tables = self.tables
+        check_row("disk", (diskID, company, speed, free_space, cost))
+        if diskID in tables.disks:
+            raise DatabaseException.UNIQUE_VIOLATION("UNIQUE_VIOLATION")
+        tables.disks[diskID] = [company, speed, free_space, cost]
+        tables.disk_stats[diskID] = [0, 0, 0]
+        self.__undo.append(lambda: self.delete_disk(diskID))
+
+    def delete_disk(self, diskID):
+        tables = self.tables
+        for fileID in sorted(tables.disk_files.get(diskID, ())):
+            self.delete_placement(fileID, diskID)
+        for ramID in sorted(tables.disk_rams.get(diskID, ())):
+            self.delete_ram_placement(ramID, diskID)
+        disk = tables.disks.pop(diskID)
+        del tables.disk_stats[diskID]
+        self.__undo.append(lambda: self.insert_disk(diskID, *disk))
+
+    def set_free_space(self, diskID, free_space):
+        disk = self.tables.disks[diskID]
+        check_value(free_space, int)
+        if free_space is None:
+            raise DatabaseException.NOT_NULL_VIOLATION("NOT_NULL_VIOLATION")
+        if free_space < 0:
+            raise DatabaseException.CHECK_VIOLATION("CHECK_VIOLATION")
+        previous, disk[2] = disk[2], free_space
+        self.__undo.append(lambda: self.set_free_space(diskID, previous))
+
+    def insert_ram(self, ramID, company, size):
+        tables = self.tables
+        check_row("ram", (ramID, company, size))
+        if ramID in tables.rams:
+            raise DatabaseException.UNIQUE_VIOLATION("UNIQUE_VIOLATION")
+        tables.rams[ramID] = (company, size)
+        self.__undo.append(lambda: self.delete_ram(ramID))
+
+    def delete_ram(self, ramID):
+        tables = self.tables
+        for diskID in sorted(tables.ram_disks.get(ramID, ())):
+            self.delete_ram_placement(ramID, diskID)
+        ram = tables.rams.pop(ramID)
+        self.__undo.append(lambda: self.insert_ram(ramID, *ram))
+
+    # ----------------------------------------
+    # Relations. The columns of file_on_disk and ram_on_disk are NOT NULL
+
+    def insert_placement(self, fileID, diskID):
+        tables = self.tables
+        check_value(fileID, int)
+        check_value(diskID, int)
+        if fileID is None or diskID is None:
+            raise DatabaseException.NOT_NULL_VIOLATION("NOT_NULL_VIOLATION")
+        if diskID in tables.file_disks.get(fileID, ()):
+            raise DatabaseException.UNIQUE_VIOLATION("UNIQUE_VIOLATION")
+        if fileID not in tables.files or diskID not in tables.disks:
+            raise DatabaseException.FOREIGN_KEY_VIOLATION("FOREIGN_KEY_VIOLATION")
+        type, size = tables.files[fileID]
+        disks = tables.file_disks.setdefault(fileID, set())
+        disks.add(diskID)
+        tables.disk_files.setdefault(diskID, set()).add(fileID)
+        stats = tables.disk_stats[diskID]
+        stats[0] += 1
+        stats[1] += size
+        tables.type_costs[type] = tables.type_costs.get(type, 0) + tables.disks[diskID][3] * size
+        if len(disks) >= 2:
+            conflicting = disks if len(disks) == 2 else (diskID,)
+            for conflicting_disk in conflicting:
+                tables.disk_conflicts[conflicting_disk] = tables.disk_conflicts.get(conflicting_disk, 0) + 1
+        self.__undo.append(lambda: self.delete_placement(fileID, diskID))
+
+    def delete_placement(self, fileID, diskID):
+        tables = self.tables
+        disks = tables.file_disks[fileID]
+        disks.remove(diskID)
+        tables.disk_files[diskID].remove(fileID)
+        type, size = tables.files[fileID]
+        stats = tables.disk_stats[diskID]
+        stats[0] -= 1
+        stats[1] -= size
+        tables.type_costs[type] -= tables.disks[diskID][3] * size
+        if len(disks) >= 1:
+            conflicting = (diskID,) + tuple(disks) if len(disks) == 1 else (diskID,)
+            for conflicting_disk in conflicting:
+                tables.disk_conflicts[conflicting_disk] -= 1
+                if tables.disk_conflicts[conflicting_disk] == 0:
+                    del tables.disk_conflicts[conflicting_disk]
+        if len(disks) == 0:
+            del tables.file_disks[fileID]
+        if len(tables.disk_files[diskID]) == 0:
+            del tables.disk_files[diskID]
+        self.__undo.append(lambda: self.insert_placement(fileID, diskID))
+
+    def insert_ram_placement(self, ramID, diskID):
+        tables = self.tables
+        check_value(ramID, int)
+        check_value(diskID, int)
+        if diskID in tables.ram_disks.get(ramID, ()):
+            raise DatabaseException.UNIQUE_VIOLATION("UNIQUE_VIOLATION")
+        if ramID not in tables.rams or diskID not in tables.disks:
+            raise DatabaseException.FOREIGN_KEY_VIOLATION("FOREIGN_KEY_VIOLATION")
+        company, size = tables.rams[ramID]
+        tables.ram_disks.setdefault(ramID, set()).add(diskID)
+        tables.disk_rams.setdefault(diskID, set()).add(ramID)
+        tables.disk_stats[diskID][2] += size
+        tables.disk_ram_companies.setdefault(diskID, Counter())[company] += 1
+        self.__undo.append(lambda: self.delete_ram_placement(ramID, diskID))
+
+    def delete_ram_placement(self, ramID, diskID):
+        tables = self.tables
+        tables.ram_disks[ramID].remove(diskID)
+        tables.disk_rams[diskID].remove(ramID)
+        company, size = tables.rams[ramID]
+        tables.disk_stats[diskID][2] -= size
+        companies = tables.disk_ram_companies[diskID]
+        companies[company] -= 1
+        if companies[company] == 0:
+            del companies[company]
+        if len(tables.ram_disks[ramID]) == 0:
+            del tables.ram_disks[ramID]
+        if len(tables.disk_rams[diskID]) == 0:
+            del tables.disk_rams[diskID]
+            del tables.disk_ram_companies[diskID]
+        self.__undo.append(lambda: self.insert_ram_placement(ramID, diskID))
@@ -0,0 +1,82 @@
+import json
+import select
+import threading
+import psycopg2
+from Utility.DBConnector import DBConnector
+
+
+class InvalidationListener:
+    # Background thread that LISTENs on a channel and hands the IDs carried by each notification to the
+    # handlers registered for the notification's table.
+    # Payloads are JSON: {"table": <table>, "ids": {<column>: [IDs], ...} or null}. A null "ids" means
+    # "anything in the table may have changed", which handlers also receive after the listener reconnects,
+    # since notifications sent while it was disconnected are lost.
+    def __init__(self, channel, poll_interval=1.0, reconnect_delay=1.0):
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self.reconnect_delay = reconnect_delay
+        self.__handlers = {}
+        self.__stop = threading.Event()
+        self.__thread = None
+        self.notifications = 0
+        self.reconnects = 0
+
+    # handler(ids) is called from the listener thread with {column: [IDs]} or None
+    def register(self, table, handler):
+        self.__handlers.setdefault(table, []).append(handler)
+
+    def start(self):
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__run, name="filez-invalidation-listener", daemon=True)
+        self.__thread.start()
+
+    def stop(self, timeout=None):
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+            self.__thread = None
+
+    def __run(self):
+        first_connection = True
+        while not self.__stop.is_set():
+            connection = None
+            try:
+                # a dedicated connection: LISTEN has to stay registered, so it can't go back to the pool
+                connection = psycopg2.connect(**DBConnector.connection_params())
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                if not first_connection:
+                    self.reconnects += 1
+                    self.__dispatch_all(None)
+                first_connection = False
+                self.__listen(connection)
+            except psycopg2.Error:
+                self.__stop.wait(self.reconnect_delay)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    def __listen(self, connection):
+        while not self.__stop.is_set():
+            if select.select([connection], [], [], self.poll_interval) == ([], [], []):
+                continue
+            connection.poll()
+            while connection.notifies:
+                notify = connection.notifies.pop(0)
+                self.notifications += 1
+                try:
+                    payload = json.loads(notify.payload)
+                    table, ids = payload["table"], payload["ids"]
+                except (ValueError, KeyError, TypeError):
+                    self.__dispatch_all(None)  # unreadable, assume the worst
+                    continue
+                for handler in self.__handlers.get(table, []):
+                    handler(ids)
+
+    def __dispatch_all(self, ids):
+        for handlers in self.__handlers.values():
+            for handler in handlers:
+                handler(ids)
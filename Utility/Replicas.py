@@ -0,0 +1,121 @@
+import itertools
+import threading
+import time
+import psycopg2
+from Utility.ConnectionPool import ConnectionPool
+from Utility.Exceptions import DatabaseException
+
+# how far behind the primary a replica is, in seconds (0 for a server that isn't a replica, or has replayed
+# everything it received; infinity before it replays its first transaction)
+LAG_QUERY = " \
+    SELECT CASE \
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 \
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8, 'Infinity') \
+    END"
+
+STRATEGIES = ("round_robin", "least_loaded")
+
+
+class Replica:
+    # one replica server, with its own connection pool and the state the routing needs
+    def __init__(self, dsn, pool):
+        self.dsn = dsn
+        self.pool = pool
+        self.down_until = 0.0  # skipped until then after failing to give a connection
+        self.lag = None
+        self.lag_checked_at = None
+        self.checkouts = 0
+        self.failures = 0
+
+
+class ReplicaSet:
+    # hands out connections to read-only queries from a set of replicas
+    #   dsns:               one libpq connection string per replica
+    #   pool_settings:      ConnectionPool arguments used for each replica's pool
+    #   strategy:           "round_robin", or "least_loaded" (fewest connections checked out)
+    #   max_lag:            seconds a replica may lag behind the primary and still be used, None for no bound
+    #   lag_check_interval: seconds a measured lag is trusted for before it is measured again
+    #   retry_interval:     seconds a replica that failed to give a connection is skipped for
+    def __init__(self, dsns, pool_settings, strategy="round_robin", max_lag=None, lag_check_interval=1.0,
+                 retry_interval=5.0):
+        if strategy not in STRATEGIES:
+            raise ValueError("unknown replica strategy: " + str(strategy))
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self.retry_interval = retry_interval
+        # replica pools open their connections on demand, so a replica that is down doesn't fail the setup
+        pool_settings = dict(pool_settings, minconn=0)
+        self.replicas = [Replica(dsn, ConnectionPool(lambda dsn=dsn: psycopg2.connect(dsn), **pool_settings))
+                         for dsn in dsns]
+        self.__lock = threading.Lock()
+        self.__turn = itertools.count()
+
+    # (replica, pooled connection) from a usable replica, or None when every replica is down or too far behind
+    def getconn(self):
+        for replica in self.__candidates():
+            try:
+                pooled = replica.pool.getconn()
+            except DatabaseException.ConnectionInvalid:
+                self.__mark_down(replica)
+                continue
+            try:
+                fresh = self.__fresh_enough(replica, pooled)
+            except psycopg2.Error:
+                replica.pool.putconn(pooled, discard=True)
+                self.__mark_down(replica)
+                continue
+            if not fresh:
+                replica.pool.putconn(pooled)
+                continue
+            with self.__lock:
+                replica.checkouts += 1
+            return replica, pooled
+        return None
+
+    def closeall(self):
+        for replica in self.replicas:
+            replica.pool.closeall()
+
+    def stats(self) -> list:
+        now = time.monotonic()
+        with self.__lock:
+            return [{
+                "dsn": replica.dsn,
+                "up": replica.down_until <= now,
+                "lag": replica.lag,
+                "checkouts": replica.checkouts,
+                "failures": replica.failures,
+                "pool": replica.pool.stats(),
+            } for replica in self.replicas]
+
+    def __candidates(self):
+        now = time.monotonic()
+        with self.__lock:
+            up = [replica for replica in self.replicas if replica.down_until <= now]
+            if self.strategy == "least_loaded":
+                return sorted(up, key=lambda replica: replica.pool.stats()["in_use"])
+            if len(up) == 0:
+                return up
+            start = next(self.__turn) % len(up)
+            return up[start:] + up[:start]
+
+    def __mark_down(self, replica):
+        with self.__lock:
+            replica.failures += 1
+            replica.down_until = time.monotonic() + self.retry_interval
+
+    def __fresh_enough(self, replica, pooled) -> bool:
+        if self.max_lag is None:
+            return True
+        now = time.monotonic()
+        if replica.lag_checked_at is None or now - replica.lag_checked_at >= self.lag_check_interval:
+            connection = pooled.connection
+            with connection.cursor() as cursor:
+                cursor.execute(LAG_QUERY)
+                lag = cursor.fetchone()[0]
+            connection.rollback()
+            with self.__lock:
+                replica.lag = lag
+                replica.lag_checked_at = now
+        return replica.lag <= self.max_lag
@@ -0,0 +1,286 @@
+from Utility.Exceptions import DatabaseException
+from Utility.MemoryDatabase import INTEGER_RANGE
+import json
+import re
+
+# What Solution's SQL becomes on SQLite (see SQLiteConnector), so the Solution functions run unchanged on both
+# engines. A Statement's text is translated (no schema, arrays as JSON read with json_each, no row locks, $1 as ?1)
+# unless STATEMENTS has an SQLite version of it, and a Script (DDL) is replaced by its version in SCRIPTS.
+# The tables are STRICT, so a value of the wrong type is refused like PostgreSQL refuses it. There are no triggers:
+# the per-disk and per-type aggregates PostgreSQL keeps in disk_stats, type_cost and disk_conflicts are computed by
+# the queries from the indexes instead, which keeps the writes cheap and the queries that scan (getCostForType,
+# getConflictingDisks) slower than PostgreSQL's, see Benchmarks/backends.py
+
+# (pattern, replacement), applied in order to a Statement's text
+TRANSLATIONS = (
+    (r"\bpublic\.", ""),
+    (r"=\s*ANY\((\$\d+)::\w+\[\]\)", r"IN (SELECT value FROM json_each(\1))"),
+    (r"\s+FOR (UPDATE|KEY SHARE)$", ""),  # writes hold the database's write lock (BEGIN IMMEDIATE)
+    (r"\bNULL::(\w+)", r"CAST(NULL AS \1)"),
+    (r"\$(\d+)", r"?\1"),
+)
+
+
+def translate(text: str) -> str:
+    for pattern, replacement in TRANSLATIONS:
+        text = re.sub(pattern, replacement, text)
+    return text
+
+
+def statement(name: str, text: str) -> str:
+    # the SQLite query of the Statement name, whose PostgreSQL query is text
+    return translate(STATEMENTS.get(name, text))
+
+
+def script(name: str, text: str) -> str:
+    # the SQLite script of the Script name, whose PostgreSQL script is text
+    return SCRIPTS[name] if name in SCRIPTS else translate(text)
+
+
+def table_name(name: str) -> str:
+    return re.sub(r"^public\.", "", name)
+
+
+# ----------------------------------------
+# Values. SQLite binds any 64-bit integer and booleans (as 0 and 1) where PostgreSQL refuses them for an integer:
+# they are refused the same way, as a DATA_EXCEPTION
+
+def check_value(value):
+    if isinstance(value, bool) or (isinstance(value, int) and not INTEGER_RANGE[0] <= value <= INTEGER_RANGE[1]):
+        raise DatabaseException.DATA_EXCEPTION(f"invalid input value for integer: {value!r}")
+    return value
+
+
+def bind_params(params) -> tuple:
+    # a Statement's params as sqlite3 binds them, a list (a PostgreSQL array) as a JSON array
+    return tuple(json.dumps([check_value(value) for value in param]) if isinstance(param, (list, tuple))
+                 else check_value(param) for param in params)
+
+
+def check_rows(rows):
+    for row in rows:
+        for value in row:
+            check_value(value)
+
+
+# ----------------------------------------
+# Queries of their own, for the PostgreSQL ones reading the aggregate tables or using what SQLite lacks (unnest,
+# LEAST, a parenthesized member of a UNION). A row of NULLs (no files, no RAM, no placements) is NOT_EXISTS, as the
+# missing row of the aggregate table is
+
+STATEMENTS = {
+    "filez_existing_placements": " \
+        SELECT fileID, diskID FROM file_on_disk \
+        WHERE (fileID, diskID) IN ( \
+            SELECT files.value, disks.value FROM json_each($1) AS files \
+            INNER JOIN json_each($2) AS disks ON disks.key = files.key \
+        )",
+    "filez_take_disks_space": " \
+        UPDATE disk \
+        SET free_space=free_space - taken.size \
+        FROM ( \
+            SELECT disks.value AS diskID, sizes.value AS size FROM json_each($1) AS disks \
+            INNER JOIN json_each($2) AS sizes ON sizes.key = disks.key \
+        ) AS taken \
+        WHERE disk.diskID = taken.diskID",
+    "filez_average_file_size_on_disk": " \
+        SELECT CAST(SUM(size) AS REAL) / COUNT(*) AS avg FROM all_files_on_disk \
+        WHERE diskID = $1",
+    "filez_disk_total_ram": " \
+        SELECT NULLIF(SUM(size), 0) AS sum FROM all_rams_on_disk \
+        WHERE diskID = $1",
+    "filez_cost_for_type": " \
+        SELECT SUM(disk.cost * file.size) AS sum FROM file \
+        INNER JOIN file_on_disk ON file_on_disk.fileID = file.fileID \
+        INNER JOIN disk ON disk.diskID = file_on_disk.diskID \
+        WHERE file.type = $1",
+    "filez_costs_for_types": " \
+        SELECT file.type, SUM(disk.cost * file.size) AS total_cost FROM file \
+        INNER JOIN file_on_disk ON file_on_disk.fileID = file.fileID \
+        INNER JOIN disk ON disk.diskID = file_on_disk.diskID \
+        WHERE file.type IN (SELECT value FROM json_each($1)) \
+        GROUP BY file.type",
+    "filez_files_can_be_added_to_disk_and_ram": " \
+        SELECT fileID FROM file \
+        WHERE size <= ( \
+            SELECT MIN(free_space, (SELECT COALESCE(SUM(size), 0) FROM all_rams_on_disk WHERE diskID=$1)) \
+            FROM disk \
+            WHERE diskID=$1 \
+        ) \
+        ORDER BY fileID ASC \
+        LIMIT 5",
+    "filez_is_company_exclusive": " \
+        SELECT company FROM disk \
+        WHERE diskID=$1 AND NOT EXISTS ( \
+            SELECT * FROM all_rams_on_disk \
+            WHERE all_rams_on_disk.diskID=$1 AND all_rams_on_disk.company <> disk.company \
+        )",
+    "filez_is_company_exclusive_many": " \
+        SELECT disk.diskID, NOT EXISTS ( \
+            SELECT * FROM all_rams_on_disk \
+            WHERE all_rams_on_disk.diskID = disk.diskID AND all_rams_on_disk.company <> disk.company \
+        ) AS exclusive \
+        FROM disk \
+        WHERE disk.diskID IN (SELECT value FROM json_each($1))",
+    # the disks with a file that is also on another disk
+    "filez_conflicting_disks": " \
+        SELECT DISTINCT diskID FROM file_on_disk \
+        WHERE fileID IN ( \
+            SELECT fileID FROM file_on_disk \
+            GROUP BY fileID \
+            HAVING COUNT(*) >= 2 \
+        ) \
+        ORDER BY diskID ASC",
+    "filez_close_files": " \
+        WITH target_disks AS ( \
+            SELECT diskID FROM file_on_disk \
+            WHERE fileID = $1 \
+        ), colocated AS ( \
+            SELECT others.fileID, COUNT(*) AS count FROM target_disks \
+            INNER JOIN file_on_disk AS others ON others.diskID = target_disks.diskID \
+            WHERE others.fileID <> $1 \
+            GROUP BY others.fileID \
+            HAVING 2 * COUNT(*) >= (SELECT COUNT(*) FROM target_disks) \
+        ), lowest_files AS ( \
+            SELECT fileID, 0 AS count FROM file \
+            WHERE fileID <> $1 AND NOT EXISTS (SELECT * FROM target_disks) \
+            ORDER BY fileID ASC \
+            LIMIT 10 \
+        ), closest AS ( \
+            SELECT fileID, count FROM colocated \
+            UNION ALL \
+            SELECT fileID, count FROM lowest_files \
+            ORDER BY count DESC, fileID ASC \
+            LIMIT 10 \
+        ) \
+        SELECT fileID FROM closest \
+        ORDER BY fileID ASC",
+    "filez_close_files_many": " \
+        WITH targets AS ( \
+            SELECT DISTINCT value AS target FROM json_each($1) \
+        ), target_disks AS ( \
+            SELECT targets.target, file_on_disk.diskID FROM targets \
+            INNER JOIN file_on_disk ON file_on_disk.fileID = targets.target \
+        ), replicas AS ( \
+            SELECT target, COUNT(*) AS count FROM target_disks \
+            GROUP BY target \
+        ), colocated AS ( \
+            SELECT target_disks.target, others.fileID, COUNT(*) AS count FROM target_disks \
+            INNER JOIN file_on_disk AS others ON others.diskID = target_disks.diskID \
+            WHERE others.fileID <> target_disks.target \
+            GROUP BY target_disks.target, others.fileID \
+        ), lowest_files AS ( \
+            SELECT fileID FROM file \
+            ORDER BY fileID ASC \
+            LIMIT 11 \
+        ), ranked AS ( \
+            SELECT colocated.target, colocated.fileID, \
+                ROW_NUMBER() OVER (PARTITION BY colocated.target ORDER BY colocated.count DESC, colocated.fileID ASC) \
+                    AS rank \
+            FROM colocated INNER JOIN replicas ON replicas.target = colocated.target \
+            WHERE 2 * colocated.count >= replicas.count \
+            UNION ALL \
+            SELECT targets.target, lowest_files.fileID, \
+                ROW_NUMBER() OVER (PARTITION BY targets.target ORDER BY lowest_files.fileID ASC) AS rank \
+            FROM targets INNER JOIN lowest_files ON lowest_files.fileID <> targets.target \
+            WHERE targets.target NOT IN (SELECT target FROM replicas) \
+        ) \
+        SELECT target, fileID FROM ranked \
+        WHERE rank <= 10 \
+        ORDER BY target ASC, fileID ASC",
+}
+
+# the PostgreSQL type codes of the columns of a Statement's result, for the results that are typed by their columns
+# (the exports, see Columns.numpy_column) even when there are no rows to type them by
+INTEGER_TYPE, TEXT_TYPE = 23, 25
+
+COLUMN_TYPES = {
+    "filez_export_files": (INTEGER_TYPE, TEXT_TYPE, INTEGER_TYPE),
+    "filez_export_disks": (INTEGER_TYPE, TEXT_TYPE, INTEGER_TYPE, INTEGER_TYPE, INTEGER_TYPE),
+    "filez_export_placements": (INTEGER_TYPE, INTEGER_TYPE),
+}
+
+
+# ----------------------------------------
+# Schema: Solution's tables, views and indexes, without the aggregate tables. The entity tables are WITHOUT ROWID,
+# so their integer key is NOT NULL instead of an alias of the rowid
+
+def get_create_entity_cmd(name, attributes):
+    return f"CREATE TABLE {name}({', '.join(attributes)}, PRIMARY KEY({name}ID)) STRICT, WITHOUT ROWID; "
+
+
+def get_create_entities_cmd():
+    return get_create_entity_cmd("file", (
+        'fileID     integer     NOT NULL    CHECK (fileID > 0)',
+        'type       text        NOT NULL',
+        'size       integer     NOT NULL    CHECK (size >= 0)'
+    )) + \
+           get_create_entity_cmd("disk", (
+               'diskID     integer     NOT NULL    CHECK (diskID > 0)',
+               'company    text        NOT NULL',
+               'speed      integer     NOT NULL    CHECK (speed > 0)',
+               'free_space integer     NOT NULL    CHECK (free_space >= 0)',
+               'cost       integer     NOT NULL    CHECK (cost > 0)'
+           )) + \
+           get_create_entity_cmd("ram", (
+               'ramID      integer     NOT NULL    CHECK (ramID > 0)',
+               'company    text        NOT NULL',
+               'size       integer     NOT NULL    CHECK (size > 0)'
+           ))
+
+
+def get_create_many2many_relation_cmd(name, src, tgt):
+    return f" \
+            CREATE TABLE {name}( \
+                {src}ID integer NOT NULL, \
+                {tgt}ID integer NOT NULL, \
+                UNIQUE ({src}ID, {tgt}ID), \
+                FOREIGN KEY ({src}ID) \
+                    REFERENCES {src} ({src}ID) \
+                    ON UPDATE CASCADE \
+                    ON DELETE CASCADE, \
+                FOREIGN KEY ({tgt}ID) \
+                    REFERENCES {tgt} ({tgt}ID) \
+                    ON UPDATE CASCADE \
+                    ON DELETE CASCADE \
+            ) STRICT; "
+
+
+def get_create_relations_cmd():
+    return get_create_many2many_relation_cmd("file_on_disk", src='file', tgt='disk') + \
+           get_create_many2many_relation_cmd("ram_on_disk", src='ram', tgt='disk')
+
+
+def get_create_views_cmd():
+    return " \
+        CREATE VIEW all_files_on_disk AS \
+            SELECT diskID, file_on_disk.fileID, type, size \
+            FROM file INNER JOIN file_on_disk ON file.fileID = file_on_disk.fileID; \
+        CREATE VIEW all_rams_on_disk AS \
+            SELECT diskID, ram_on_disk.ramID, company, size \
+            FROM ram INNER JOIN ram_on_disk ON ram.ramID = ram_on_disk.ramID; "
+
+
+# (name, table, columns), see Solution.INDEXES. The primary key of a WITHOUT ROWID table holds the whole row, so
+# walking the files in ID order already reads their sizes; the sizes of a type are read from file_type_idx
+INDEXES = (
+    ("file_on_disk_disk_file_idx", "file_on_disk", "diskID, fileID"),
+    ("ram_on_disk_disk_ram_idx", "ram_on_disk", "diskID, ramID"),
+    ("file_type_idx", "file", "type, size"),
+    ("file_size_idx", "file", "size"),
+)
+
+
+def get_create_indexes_cmd():
+    return "".join(f"CREATE INDEX {name} ON {table} ({columns}); " for name, table, columns in INDEXES)
+
+
+TABLES = ("file", "ram", "disk", "file_on_disk", "ram_on_disk")
+
+SCRIPTS = {
+    "filez_create_tables":
+        get_create_entities_cmd() + get_create_relations_cmd() + get_create_views_cmd() + get_create_indexes_cmd(),
+    "filez_clear_tables": "".join(f"DELETE FROM {name}; " for name in TABLES),
+    "filez_drop_tables": "DROP VIEW all_files_on_disk; DROP VIEW all_rams_on_disk; " +
+                         "".join(f"DROP TABLE {name}; " for name in reversed(TABLES)),
+}